@@ -0,0 +1,147 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from bot import GreedyBot, RandomBot
+from score_ledger import ScoreLedger
+from simulation import Simulation
+from snapshot import Snapshot
+
+class AIOpponent:
+    """Computer-controlled opponent choosing its moves with Monte Carlo
+    rollouts. Rollouts run in worker processes during the turn, so the render
+    loop only sends a snapshot when the turn starts and reads the results
+    when it ends
+    """
+
+    NAME = "Ordinateur"  # Name displayed for the opponent
+    WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))  # Number of worker processes
+    BUDGET = 0.7  # Fraction of a turn spent on rollouts
+    DEPTH = 10  # Number of turns played by each rollout
+    POLICY = RandomBot  # Bot playing every player after the first turn of a rollout
+
+    simulation = None  # Simulation reused by rollouts in a worker process
+
+    def __init__(self, game, player, seed=None):
+        """Initializes an AIOpponent instance and starts its worker processes
+
+        Args:
+            game (Simulation): game instance
+            player (Player): player controlled by the AI
+            seed (int, optional): seed of the rollouts. Defaults to None.
+        """
+
+        self.game = game
+        self.player = player
+        self.rng = random.Random(seed)
+        self.pool = multiprocessing.get_context("spawn").Pool(self.WORKERS)
+        self.pending = []
+        self.actions = []
+
+    def stop(self):
+        """Stops the worker processes"""
+
+        self.pool.terminate()
+        self.pending = []
+
+    def get_actions(player):
+        """Lists the inputs a player can give this turn
+
+        Args:
+            player (Player): the player
+
+        Returns:
+            list[tuple[int, bool]]: (direction, dash) pairs
+        """
+
+        dashes = (False, True) if player.candash() else (False,)
+        return [(dir_, dash) for dash in dashes for dir_ in range(4)]
+
+    def start_turn(self):
+        """Sends the state of the new turn to the workers. Must be called
+        right after the game's start_turn
+        """
+
+        data = self.game.snapshot().to_bytes()
+        self.actions = AIOpponent.get_actions(self.player)
+        duration = self.game.TIMER * self.BUDGET
+        self.pending = [
+            self.pool.apply_async(
+                AIOpponent.rollouts,
+                (data, self.player.i, self.actions, duration, self.rng.getrandbits(64))
+            )
+            for _ in range(self.WORKERS)
+        ]
+
+    def play(self):
+        """Sets the AI's input for the current turn from the rollouts finished
+        so far. Never waits for the workers: if none has answered yet, a
+        GreedyBot move is played instead
+        """
+
+        totals = np.zeros(len(self.actions))
+        counts = np.zeros(len(self.actions))
+        for result in self.pending:
+            if result.ready() and result.successful():
+                values, n = result.get()
+                totals += values
+                counts += n
+        self.pending = []
+
+        if counts.sum() == 0:
+            dir_, dash = GreedyBot.play(self.game, self.player, self.rng)
+        else:
+            means = np.where(counts > 0, totals / np.maximum(counts, 1), -np.inf)
+            dir_, dash = self.actions[int(np.argmax(means))]
+        self.game.set_input(self.player, dir_, dash)
+
+    def rollouts(data, i, actions, duration, seed):
+        """Plays rollouts from a snapshot until the time runs out, trying each
+        action in turn. Runs in a worker process
+
+        Args:
+            data (bytes): serialized snapshot taken at the start of the turn
+            i (int): id of the player controlled by the AI
+            actions (list[tuple[int, bool]]): candidate (direction, dash) inputs
+            duration (float): time available in seconds
+            seed (int): seed of the rollouts
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: sum of the rollout values and number of rollouts for each action
+        """
+
+        end = time.perf_counter() + duration
+        snapshot = Snapshot.from_bytes(data)
+        header = snapshot.header
+        n, width, height = int(header["n_players"]), int(header["width"]), int(header["height"])
+
+        sim = AIOpponent.simulation
+        if sim is None or (sim.n_players, sim.WIDTH, sim.HEIGHT) != (n, width, height):
+            sim = AIOpponent.simulation = Simulation(n_players=n, width=width, height=height)
+        rng = random.Random(seed)
+        totals = np.zeros(len(actions))
+        counts = np.zeros(len(actions))
+
+        a = 0
+        while time.perf_counter() < end:
+            sim.restore(snapshot)
+            # Future bonuses are unknown to the players, don't follow the game's generator
+            sim.rng.seed(rng.getrandbits(64))
+            for depth in range(AIOpponent.DEPTH):
+                inputs = [AIOpponent.POLICY.play(sim, player, rng) for player in sim.players]
+                if depth == 0:
+                    inputs[i] = actions[a]
+                sim.step(inputs)
+
+            scores = sim.ledger.scores[ScoreLedger.TOTAL]
+            totals[a] += scores[i] - np.delete(scores, i).max()
+            counts[a] += 1
+            a = (a+1) % len(actions)
+
+        return totals, counts
@@ -0,0 +1,381 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import random
+
+import numpy as np
+
+from bonus import Bonus, Bomb, MagicalPotion
+from player import Player
+from score_ledger import ScoreLedger
+from simulation import Simulation
+
+class BatchSimulation:
+    """K independent 2-player matches stepped together with array operations.
+    Each match follows the rules of Simulation exactly: the match seeded with s
+    evolves like Simulation(seed=s) given the same inputs. Drool variants,
+    which do not affect the game, are not stored
+    """
+
+    N_PLAYERS = 2  # Number of players in each match
+    OFFSETS = np.array(Player.OFFSETS)
+    BOMB, ROW, COLUMN, POTION = range(4)  # Bonus ids, as in Simulation.bonus_list
+
+    def __init__(self, seeds, width=None, height=None):
+        """Initializes a BatchSimulation instance
+
+        Args:
+            seeds (list[int]): seed of each match's random number generator
+            width (int, optional): width of the grids. Defaults to Simulation.WIDTH.
+            height (int, optional): height of the grids. Defaults to Simulation.HEIGHT.
+        """
+
+        self.WIDTH = Simulation.WIDTH if width is None else width
+        self.HEIGHT = Simulation.HEIGHT if height is None else height
+        self.n_players = self.N_PLAYERS
+        self.K = len(seeds)
+        self.rngs = [random.Random(seed) for seed in seeds]
+        self.reset()
+
+    def reset(self):
+        """Resets all matches before a new game"""
+
+        K, n = self.K, self.N_PLAYERS
+        self.trails = np.full([K, self.HEIGHT, self.WIDTH], -1, dtype="int8")
+        self.bonuses = np.full([K, self.HEIGHT, self.WIDTH], -1, dtype="int8")
+        self.bonus_count = np.zeros(K, dtype="int64")
+
+        spawns = np.array([Simulation.get_spawn(self, i) for i in range(n)])
+        self.x = np.tile(spawns[:, 0], [K, 1])
+        self.y = np.tile(spawns[:, 1], [K, 1])
+        self.dir = np.tile(spawns[:, 2], [K, 1])
+        self.lx, self.ly = self.x.copy(), self.y.copy()
+        self.nx, self.ny = self.x.copy(), self.y.copy()
+        self.dashscore = np.zeros([K, n], dtype="int64")
+        self.reinforced = np.zeros([K, n], dtype="int64")
+        self.dash = np.zeros([K, n], dtype=bool)
+        self.scores = np.zeros([K, len(ScoreLedger.NAMES), n], dtype="int64")
+
+        self.collide_start = np.zeros(K)
+        self.collide_pos = np.zeros([K, 2], dtype="int64")
+        self.turn = 0
+        self.ops = []
+
+    def time(self):
+        """Returns the simulated time since game start
+
+        Returns:
+            float: time in seconds
+        """
+        return self.turn * Simulation.TIMER
+
+    def get_trail_count(self):
+        """Returns the number of cells covered in drool for each player
+
+        Returns:
+            np.ndarray: [K, N_PLAYERS] counts
+        """
+        return self.scores[:, ScoreLedger.COVERED]
+
+    def step(self, actions):
+        """Plays a whole turn in every match
+
+        Args:
+            actions (np.ndarray): [K, N_PLAYERS, 2] array of (direction, dash) inputs
+        """
+
+        actions = np.asarray(actions)
+        self.set_inputs(actions[..., 0].astype("int64"), actions[..., 1].astype(bool))
+        self.end_turn()
+        self.start_turn()
+
+    def set_inputs(self, dirs, dashes):
+        """Sets the players' inputs for the current turn, see Simulation.set_input
+
+        Args:
+            dirs (np.ndarray): [K, N_PLAYERS] directions (0, 1, 2, 3 -> right, down, left, up)
+            dashes (np.ndarray): [K, N_PLAYERS] whether each player wants to dash
+        """
+
+        dashing = (dashes & (self.dashscore >= Player.DASH_COST)) | self.dash
+        self.dashscore -= 2 * (dashing & ~self.dash)
+        self.dash = dashing
+        self.dir = dirs + 4*dashing
+
+    def start_turn(self):
+        """Starts a new turn in every match"""
+
+        self.lx, self.ly = self.x, self.y
+        self.x, self.y = self.nx.copy(), self.ny.copy()
+        self.dir %= 4
+        self.dash[...] = False
+        self.reinforced = np.maximum(self.reinforced-1, 0)
+
+    def end_turn(self):
+        """Resolves the current turn of every match, see Simulation.end_turn"""
+
+        ks = np.arange(self.K)
+        n = self.N_PLAYERS
+        self.ops = []
+
+        offsets = self.OFFSETS[self.dir]
+        self.nx = np.clip(self.x + offsets[..., 0], 0, self.WIDTH-1)
+        self.ny = np.clip(self.y + offsets[..., 1], 0, self.HEIGHT-1)
+        dashing = self.dir > 3
+        self.scores[:, ScoreLedger.DASHES] += dashing
+        self.scores[:, ScoreLedger.TOTAL] += dashing.astype("int64")
+
+        steps = np.arange(Player.DASH_SIZE)
+        for p in range(n):
+            t = p + n*(self.reinforced[:, p] > 0)
+            walk = ~dashing[:, p]
+            self.write(ks[walk], self.x[walk, p], self.y[walk, p], t[walk])
+
+            dk = ks[dashing[:, p]]
+            u = self.OFFSETS[self.dir[dk, p] % 4]
+            tx = self.x[dk, p, None] + u[:, 0, None]*steps
+            ty = self.y[dk, p, None] + u[:, 1, None]*steps
+            inside = (0 <= tx) & (tx < self.WIDTH) & (0 <= ty) & (ty < self.HEIGHT)
+            tk = np.broadcast_to(dk[:, None], tx.shape)
+            self.write(tk[inside], tx[inside], ty[inside], np.broadcast_to(t[dk, None], tx.shape)[inside])
+
+        self.check_collisions()
+
+        for p in range(n):
+            inside = (0 <= self.nx[:, p]) & (self.nx[:, p] < self.WIDTH) & (0 <= self.ny[:, p]) & (self.ny[:, p] < self.HEIGHT)
+            ik = ks[inside]
+            t = self.trails[ik, self.ny[ik, p], self.nx[ik, p]]
+            own = ik[(t != -1) & (t % n == p)]
+            self.dashscore[own, p] = np.minimum(self.dashscore[own, p] + 1, Player.MAX_DASHSCORE)
+            self.take_bonus(ik, p, self.nx[ik, p], self.ny[ik, p])
+
+        self.apply_ops()
+        self.try_spawn()
+        self.turn += 1
+
+    def check_collisions(self):
+        """Resolves collisions in every match, see Simulation.check_collsion"""
+
+        ks = np.arange(self.K)
+        x, y, nx, ny = self.x, self.y, self.nx, self.ny
+        walk = self.dir <= 3
+        dirs = self.dir.copy()
+        collided = np.zeros([self.K, self.N_PLAYERS], dtype=bool)
+        everyone = lambda m: np.ones([len(m), self.N_PLAYERS], dtype=bool)
+
+        # Walkers heading to the same cell
+        both = walk[:, 0] & walk[:, 1]
+        same = both & (nx[:, 0] == nx[:, 1]) & (ny[:, 0] == ny[:, 1])
+        m = ks[same]
+        if len(m) != 0:
+            cx, cy = nx[m, 0].astype(float), ny[m, 0].astype(float)
+            nx[m], ny[m] = x[m], y[m]
+            collided[m] = True
+            self.collide(m, cx, cy, everyone(m))
+
+        # Walkers swapping cells
+        swap = both & ~same & (nx[:, 0] == x[:, 1]) & (ny[:, 0] == y[:, 1]) & (nx[:, 1] == x[:, 0]) & (ny[:, 1] == y[:, 0])
+        m = ks[swap]
+        if len(m) != 0:
+            # Vertical swaps collide on the first player's destination, as in Simulation
+            vertical = x[m, 0] == x[m, 1]
+            cx = np.where(vertical, nx[m, 0], (x[m, 0] + x[m, 1])/2)
+            cy = np.where(vertical, ny[m, 0], (y[m, 0] + y[m, 1])/2)
+            nx[m], ny[m] = x[m], y[m]
+            collided[m] = True
+            self.collide(m, cx, cy, everyone(m))
+
+        # Dash paths, excluding the start
+        u = self.OFFSETS[dirs % 4]
+        steps = np.arange(1, Player.DASH_SIZE+1)
+        px = x[..., None] + u[..., 0, None]*steps
+        py = y[..., None] + u[..., 1, None]*steps
+
+        # Walker standing in a dash's way
+        m = ks[walk[:, 0] ^ walk[:, 1]]
+        if len(m) != 0:
+            d = np.where(walk[m, 0], 1, 0)
+            w = 1-d
+            hit = (px[m, d] == nx[m, w, None]) & (py[m, d] == ny[m, w, None])
+            found = hit.any(axis=1)
+            m, d, w = m[found], d[found], w[found]
+            first = hit[found].argmax(axis=1)
+            if len(m) != 0:
+                cx, cy = px[m, d, first], py[m, d, first]
+                nx[m, d], ny[m, d] = cx - u[m, d, 0], cy - u[m, d, 1]
+                nx[m, w], ny[m, w] = x[m, w], y[m, w]
+                collided[m] = True
+                self.collide(m, cx.astype(float), cy.astype(float), everyone(m))
+
+        # Dashes crossing each other on the same step
+        dashers = ~walk
+        limits = np.full([self.K, self.N_PLAYERS], Player.DASH_SIZE)
+        for k in range(Player.DASH_SIZE):
+            for p in range(self.N_PLAYERS):
+                bx, by = px[:, p, k], py[:, p, k]
+                inside = (0 <= bx) & (bx < self.WIDTH) & (0 <= by) & (by < self.HEIGHT)
+                m = ks[dashers[:, p] & (k < limits[:, p]) & inside]
+                self.take_bonus(m, p, bx[m], by[m])
+
+            if k == Player.DASH_SIZE-1:
+                break
+            cross = dashers.all(axis=1) & ~collided.any(axis=1)
+            cross &= (px[:, 0, k] == px[:, 1, k]) & (py[:, 0, k] == py[:, 1, k])
+            m = ks[cross]
+            if len(m) != 0:
+                cx, cy = px[m, 0, k], py[m, 0, k]
+                nx[m] = cx[:, None] - u[m, :, 0]
+                ny[m] = cy[:, None] - u[m, :, 1]
+                limits[m] = k+1
+                collided[m] = True
+                self.collide(m, cx.astype(float), cy.astype(float), everyone(m))
+
+    def collide(self, ks, ox, oy, involved):
+        """Processes collisions, see Simulation.collide
+
+        Args:
+            ks (np.ndarray): matches where a collision happens
+            ox (np.ndarray): x position in tiles of each collision's center
+            oy (np.ndarray): y position in tiles of each collision's center
+            involved (np.ndarray): [len(ks), N_PLAYERS] players involved in each collision
+        """
+
+        x, y, d = self.x[ks], self.y[ks], self.dir[ks]
+        wall = ((d == 0) & (x == self.WIDTH-1)) | ((d == 1) & (y == self.HEIGHT-1)) | ((d == 2) & (x == 0)) | ((d == 3) & (y == 0))
+        self.dir[ks] = np.where(involved & ~wall, (d%4+2)%4, d)
+
+        self.collide_start[ks] = self.time()
+        self.collide_pos[ks, 0] = np.trunc(ox)
+        self.collide_pos[ks, 1] = np.trunc(oy)
+
+        x1 = np.clip(np.floor(ox-2), 0, self.WIDTH-1).astype("int64")
+        y1 = np.clip(np.floor(oy-2), 0, self.HEIGHT-1).astype("int64")
+        x2 = np.clip(np.ceil(ox+2), 0, self.WIDTH-1).astype("int64")
+        y2 = np.clip(np.ceil(oy+2), 0, self.HEIGHT-1).astype("int64")
+        self.write_region(ks, x1, y1, x2, y2, 255)
+
+    def take_bonus(self, ks, p, xs, ys):
+        """Applies and removes the bonuses under a player, see Simulation.take_bonus
+
+        Args:
+            ks (np.ndarray): matches
+            p (int): player id
+            xs (np.ndarray): x coordinate in each match
+            ys (np.ndarray): y coordinate in each match
+        """
+
+        b = self.bonuses[ks, ys, xs]
+        found = b != -1
+        ks, xs, ys, b = ks[found], xs[found], ys[found], b[found]
+        if len(ks) == 0:
+            return
+
+        self.bonuses[ks, ys, xs] = -1
+        self.bonus_count[ks] -= 1
+        self.scores[ks, ScoreLedger.BONUSES, p] += 1
+        self.scores[ks, ScoreLedger.TOTAL, p] += 1
+        t = p + self.N_PLAYERS*(self.reinforced[ks, p] > 0)
+
+        r = Bomb.BOMB_SIZE//2
+        m = b == self.BOMB
+        self.write_region(
+            ks[m],
+            np.maximum(xs[m]-r, 0), np.maximum(ys[m]-r, 0),
+            np.minimum(xs[m]+r, self.WIDTH-1), np.minimum(ys[m]+r, self.HEIGHT-1),
+            t[m]
+        )
+        m = b == self.ROW
+        self.write_region(ks[m], 0*xs[m], ys[m], 0*xs[m] + self.WIDTH-1, ys[m], t[m])
+        m = b == self.COLUMN
+        self.write_region(ks[m], xs[m], 0*ys[m], xs[m], 0*ys[m] + self.HEIGHT-1, t[m])
+        m = b == self.POTION
+        self.reinforced[ks[m], p] += MagicalPotion.REINFORCED_TIME
+
+    def write(self, ks, xs, ys, ids):
+        """Records drool changes following the priority rules of
+        Simulation.set_trail, evaluated against the boards as they were at the
+        start of the turn
+
+        Args:
+            ks (np.ndarray): match of each cell
+            xs (np.ndarray): x coordinates
+            ys (np.ndarray): y coordinates
+            ids (np.ndarray or int): drool ids (player id, + N_PLAYERS if reinforced, 255: none)
+        """
+
+        if len(ks) == 0:
+            return
+        n = self.N_PLAYERS
+        cur = self.trails[ks, ys, xs].astype("int64")
+        ids = np.broadcast_to(ids, ks.shape).astype("int64")
+        erase = ids == 255
+        same = cur%n == ids%n
+        keep = erase | ((cur != ids) & ~(same & (ids < cur)))
+        values = np.where(~erase & ~same & (cur >= n), cur-n, ids)
+        ks, xs, ys, values = ks[keep], xs[keep], ys[keep], values[keep]
+
+        strong = (values >= n) & (values != 255)
+        np.add.at(self.scores, (ks[strong], ScoreLedger.REINFORCED, values[strong]%n), 1)
+        np.add.at(self.scores, (ks[strong], ScoreLedger.TOTAL, values[strong]%n), 1)
+        self.ops.append((ks, ys*self.WIDTH + xs, values))
+
+    def write_region(self, ks, x1, y1, x2, y2, ids):
+        """Records drool changes on one rectangle per match (end coordinates included)
+
+        Args:
+            ks (np.ndarray): matches
+            x1 (np.ndarray): left coordinates
+            y1 (np.ndarray): top coordinates
+            x2 (np.ndarray): right coordinates
+            y2 (np.ndarray): bottom coordinates
+            ids (np.ndarray or int): drool ids (player id, + N_PLAYERS if reinforced, 255: none)
+        """
+
+        if len(ks) == 0:
+            return
+        oy, ox = np.mgrid[0:int((y2-y1).max())+1, 0:int((x2-x1).max())+1]
+        xs = x1[:, None] + ox.ravel()
+        ys = y1[:, None] + oy.ravel()
+        valid = (xs <= x2[:, None]) & (ys <= y2[:, None])
+        cells_k = np.broadcast_to(ks[:, None], xs.shape)
+        ids = np.broadcast_to(np.broadcast_to(ids, ks.shape)[:, None], xs.shape)
+        self.write(cells_k[valid], xs[valid], ys[valid], ids[valid])
+
+    def apply_ops(self):
+        """Writes the recorded changes on the boards and updates covered cell
+        counts. When a cell changes several times, the last change wins"""
+
+        if len(self.ops) == 0:
+            return
+        ks, cells, values = (np.concatenate(a) for a in zip(*self.ops))
+        self.ops = []
+
+        size = self.WIDTH*self.HEIGHT
+        _, last = np.unique((ks*size + cells)[::-1], return_index=True)
+        last = len(ks)-1-last
+        ks, cells, values = ks[last], cells[last], values[last]
+        values = np.where(values == 255, -1, values)
+
+        n = self.N_PLAYERS
+        flat = self.trails.reshape([self.K, size])
+        old = flat[ks, cells].astype("int64")
+        for ids, sign in ((old, -1), (values, 1)):
+            m = ids >= 0
+            np.add.at(self.scores, (ks[m], ScoreLedger.COVERED, ids[m]%n), sign)
+            np.add.at(self.scores, (ks[m], ScoreLedger.TOTAL, ids[m]%n), sign)
+        flat[ks, cells] = values
+
+    def try_spawn(self):
+        """Tries to generate a new bonus in every match, see Bonus.try_spawn"""
+
+        for k in np.flatnonzero(self.bonus_count < Bonus.MAX_BONUS).tolist():
+            rng = self.rngs[k]
+            if rng.random() >= Bonus.BONUS_CHANCE:
+                continue
+            positions = list(zip(self.x[k].tolist(), self.y[k].tolist()))
+            excluded = Bonus.get_excluded_cells(np.flatnonzero(self.bonuses[k] != -1), positions, self.WIDTH, self.HEIGHT)
+            drawn = Bonus.draw(rng, excluded, self.WIDTH, self.HEIGHT, 4)
+            if drawn is not None:
+                x, y, i = drawn
+                self.bonuses[k, y, x] = i
+                self.bonus_count[k] += 1
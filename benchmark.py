@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from bonus import Bomb, Row, Column, MagicalPotion
+from simulation import Simulation
+
+class Benchmark:
+    """Times the game rules on boards of several sizes and bonus densities"""
+
+    SIZES = [15, 64, 256]  # Default board sizes
+    DENSITIES = [0, 0.02, 0.1]  # Default fractions of cells holding a bonus
+    COVERAGE = 0.5  # Fraction of cells covered in drool before timing
+    REPEAT = 200  # Default number of timed calls per case
+    WARMUP = 10  # Number of untimed calls before timing a case
+    DASH_CHANCE = 0.3  # Likelihood of a dash input during end_turn timings
+    CHANGES = [2, 100, 500]  # Numbers of trail changes per turn in codec timings
+
+    def __init__(self, repeat=REPEAT, seed=0):
+        """Initializes a Benchmark instance
+
+        Args:
+            repeat (int, optional): number of timed calls per case. Defaults to REPEAT.
+            seed (int, optional): seed of the boards and inputs. Defaults to 0.
+        """
+
+        self.repeat = repeat
+        self.seed = seed
+        self.results = []
+
+    def make_simulation(self, size, density):
+        """Creates a simulation with a partly covered board
+
+        Args:
+            size (int): width and height of the board
+            density (float): fraction of cells holding a bonus
+
+        Returns:
+            Simulation: the simulation
+        """
+
+        sim = Simulation(seed=self.seed, width=size, height=size)
+        rng = np.random.default_rng(self.seed)
+
+        cells = np.flatnonzero(rng.random(size*size) < self.COVERAGE)
+        changes = np.empty([len(cells), 3], dtype=Simulation.CHANGE_DTYPE)
+        changes[:, 0], changes[:, 1] = cells % size, cells // size
+        changes[:, 2] = rng.integers(0, 2*sim.n_players, len(cells))
+        sim.apply_trail_changes(changes)
+
+        cells = rng.choice(size*size, int(density*size*size), replace=False)
+        for cell, i in zip(cells.tolist(), rng.integers(0, len(sim.bonus_list), len(cells)).tolist()):
+            sim.place_bonus(cell % size, cell // size, i)
+
+        sim.start_turn()
+        return sim
+
+    def measure(self, name, params, func, setup=None):
+        """Times a function and records the result
+
+        Args:
+            name (str): name of the case
+            params (dict): parameters of the case
+            func (callable): function to time
+            setup (callable, optional): untimed function called before each call. Defaults to None.
+        """
+
+        times = []
+        for j in range(self.WARMUP + self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            if j >= self.WARMUP:
+                times.append((time.perf_counter() - start) * 1e6)
+
+        self.results.append({
+            "name": name,
+            "params": params,
+            "repeat": self.repeat,
+            "mean_us": statistics.mean(times),
+            "median_us": statistics.median(times),
+            "min_us": min(times),
+            "max_us": max(times),
+            "stdev_us": statistics.stdev(times) if len(times) > 1 else 0
+        })
+
+    def run_board(self, size, density):
+        """Times every case on one board configuration
+
+        Args:
+            size (int): width and height of the board
+            density (float): fraction of cells holding a bonus
+        """
+
+        params = {"size": size, "bonus_density": density}
+        rng = np.random.default_rng(self.seed)
+        sim = self.make_simulation(size, density)
+        def play_inputs():
+            sim.start_turn()
+            for player in sim.players:
+                sim.set_input(player, int(rng.integers(4)), rng.random() < self.DASH_CHANCE)
+        self.measure("end_turn", params, sim.end_turn, play_inputs)
+
+        sim = self.make_simulation(size, density)
+        calls = self.WARMUP + self.repeat
+        xs, ys = rng.integers(0, size, [2, calls]).tolist()
+        ids = rng.integers(0, 2*sim.n_players, calls).tolist()
+        calls = iter(zip(xs, ys, ids))
+        def clear_changes():
+            sim.trail_changes = []
+        self.measure("set_trail", params, lambda: sim.set_trail(*next(calls)), clear_changes)
+
+        for bonus in (Bomb, Row, Column, MagicalPotion):
+            cells = iter(rng.integers(0, size, [self.WARMUP + self.repeat, 2]).tolist())
+            self.measure(
+                f"bonus_apply.{bonus.__name__}", params,
+                lambda: bonus.apply(*next(cells), sim, sim.players[0]),
+                clear_changes
+            )
+
+        c = size // 2
+        collisions = {
+            "walk": [(c-1, c, 0), (c+1, c, 2)],
+            "dash": [(c-3, c, 4), (c, c+1, 3)],
+            "double_dash": [(c-2, c, 4), (c+2, c, 6)]
+        }
+        for case, states in collisions.items():
+            sim = self.make_simulation(size, density)
+            def place_players():
+                sim.trail_changes = []
+                sim.bonus_changes = []
+                for player, (x, y, dir_) in zip(sim.players, states):
+                    dx, dy = player.OFFSETS[dir_]
+                    player.x, player.y, player.dir = x, y, dir_
+                    player.nx, player.ny = x+dx, y+dy
+            self.measure(f"check_collsion.{case}", params, sim.check_collsion, place_players)
+
+        sim = self.make_simulation(size, density)
+        self.measure("get_trail_count", params, sim.get_trail_count)
+
+        for player in sim.players:
+            sim.set_input(player, int(rng.integers(4)), True)
+        sim.end_turn()
+        msg = sim.encode_sync()
+        self.measure("encode_sync.turnEndHost", params, sim.encode_sync)
+        self.measure("decode_sync.turnEndHost", params, lambda: sim.decode_sync(msg))
+
+    def run_codec(self, size):
+        """Times the encoding and decoding of end of turn messages carrying
+        CHANGES trail changes, scattered or in runs as left by Row and Bomb
+
+        Args:
+            size (int): width and height of the board
+        """
+
+        rng = np.random.default_rng(self.seed)
+        sim = self.make_simulation(size, 0)
+        for n in self.CHANGES:
+            for layout in ("scattered", "runs"):
+                if layout == "scattered":
+                    cells = rng.integers(0, size*size, n)
+                else:
+                    cells = (rng.integers(0, size*size) + np.arange(n)) % (size*size)
+                changes = np.empty([n, 3], dtype=Simulation.CHANGE_DTYPE)
+                changes[:, 0], changes[:, 1] = cells % size, cells // size
+                changes[:, 2] = rng.integers(0, 2*sim.n_players) if layout == "runs" else rng.integers(0, 2*sim.n_players, n)
+                params = {"size": size, "changes": n, "layout": layout}
+
+                def start():
+                    sim.trail_changes = [changes]
+                    sim.bonus_changes = [(1, 1, 0), (2, 2, 255)]
+                    sim.ledger.add(1, 0)
+                start()
+                msg = sim.encode_sync()
+                self.measure("codec.encode_sync", params, sim.encode_sync, start)
+                self.measure("codec.decode_sync", params, lambda: sim.decode_sync(msg))
+
+    def run(self, sizes=SIZES, densities=DENSITIES):
+        """Times every case on every board configuration
+
+        Args:
+            sizes (list[int], optional): board sizes. Defaults to SIZES.
+            densities (list[float], optional): bonus densities. Defaults to DENSITIES.
+
+        Returns:
+            dict: machine-readable report
+        """
+
+        for size in sizes:
+            for density in densities:
+                self.run_board(size, density)
+            self.run_codec(size)
+
+        return {
+            "meta": {
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "platform": platform.platform(),
+                "repeat": self.repeat,
+                "seed": self.seed
+            },
+            "results": self.results
+        }
+
+    def compare(report, baseline, tolerance):
+        """Compares the minimum timings of two reports, which are less
+        sensitive to other processes than the mean or median
+
+        Args:
+            report (dict): new report
+            baseline (dict): reference report
+            tolerance (float): allowed relative slowdown
+
+        Returns:
+            list[str]: descriptions of the cases slower than allowed
+        """
+
+        key = lambda r: (r["name"], json.dumps(r["params"], sort_keys=True))
+        reference = {key(r): r for r in baseline["results"]}
+        regressions = []
+        for result in report["results"]:
+            old = reference.get(key(result))
+            if old is None or old["min_us"] == 0:
+                continue
+            ratio = result["min_us"] / old["min_us"]
+            if ratio > 1 + tolerance:
+                regressions.append(f"{result['name']} {result['params']}: {old['min_us']:.1f}us -> {result['min_us']:.1f}us (x{ratio:.2f})")
+        return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times the Snaildash game rules and writes the results as JSON")
+    parser.add_argument("--sizes", type=int, nargs="+", default=Benchmark.SIZES, help="board sizes")
+    parser.add_argument("--densities", type=float, nargs="+", default=Benchmark.DENSITIES, help="fractions of cells holding a bonus")
+    parser.add_argument("--repeat", type=int, default=Benchmark.REPEAT, help="timed calls per case")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the boards and inputs")
+    parser.add_argument("--output", default="benchmark.json", help="JSON report path")
+    parser.add_argument("--baseline", help="JSON report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown against the baseline")
+    args = parser.parse_args()
+
+    report = Benchmark(args.repeat, args.seed).run(args.sizes, args.densities)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    print(f"{len(report['results'])} results written to {args.output}")
+
+    if args.baseline is not None:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = Benchmark.compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print("Slower:", regression)
+        if len(regressions) != 0:
+            sys.exit(1)
@@ -0,0 +1,300 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import struct
+import zlib
+
+import numpy as np
+
+class ChunkedBoard:
+    """Grid of small integers stored as square chunks allocated on first write,
+    so that memory and keyframes grow with the painted area, not the grid size
+    """
+
+    CHUNK_BITS = 4
+    CHUNK_SIZE = 1 << CHUNK_BITS  # Side of a chunk in cells
+    CHUNK_MASK = CHUNK_SIZE - 1
+    CHUNK_HEADER = struct.Struct(">HH")  # Chunk coordinates in keyframes
+
+    def __init__(self, width, height, fill=-1, dtype="int8"):
+        """Initializes a ChunkedBoard instance
+
+        Args:
+            width (int): width of the grid, up to 65536
+            height (int): height of the grid, up to 65536
+            fill (int, optional): value of unwritten cells. Defaults to -1.
+            dtype (str, optional): numpy type of the cells. Defaults to "int8".
+        """
+
+        self.width = width
+        self.height = height
+        self.shape = (height, width)
+        self.fill = fill
+        self.dtype = np.dtype(dtype)
+        self.chunks_x = -(-width // self.CHUNK_SIZE)
+        self.single = width <= self.CHUNK_SIZE and height <= self.CHUNK_SIZE  # Whole grid in chunk 0
+        ys, xs = np.mgrid[0:self.CHUNK_SIZE, 0:self.CHUNK_SIZE]
+        self.chunk_cells = ys.astype("int64") * width + xs  # Flat indices of chunk 0's cells
+        self.chunks = {}
+        self.dirty = set()
+
+    def clear(self):
+        """Resets every cell to the fill value and frees all chunks"""
+
+        self.chunks.clear()
+        self.dirty.clear()
+
+    def get_chunk(self, key):
+        """Returns a chunk, allocating it if needed
+
+        Args:
+            key (int): chunk index (cy*chunks_x + cx)
+
+        Returns:
+            np.ndarray: the CHUNK_SIZE x CHUNK_SIZE chunk
+        """
+
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = np.full([self.CHUNK_SIZE, self.CHUNK_SIZE], self.fill, dtype=self.dtype)
+            self.chunks[key] = chunk
+        return chunk
+
+    def get_keys(self, ys, xs):
+        """Returns the chunk index of each cell
+
+        Args:
+            ys (np.ndarray): y coordinates
+            xs (np.ndarray): x coordinates
+
+        Returns:
+            np.ndarray: chunk indices
+        """
+        return (ys >> self.CHUNK_BITS) * self.chunks_x + (xs >> self.CHUNK_BITS)
+
+    def __getitem__(self, pos):
+        """Reads one cell, board[y, x], or several cells, board[ys, xs]
+
+        Args:
+            pos (tuple): y and x coordinates, as ints or arrays
+
+        Returns:
+            int or np.ndarray: the cell values
+        """
+
+        y, x = pos
+        if not isinstance(y, np.ndarray) and not isinstance(x, np.ndarray):
+            chunk = self.chunks.get((y >> self.CHUNK_BITS) * self.chunks_x + (x >> self.CHUNK_BITS))
+            if chunk is None:
+                return self.fill
+            return chunk[y & self.CHUNK_MASK, x & self.CHUNK_MASK]
+
+        if self.single:
+            chunk = self.chunks.get(0)
+            if chunk is None:
+                return np.full(np.broadcast(y, x).shape, self.fill, dtype=self.dtype)
+            return chunk[y, x]
+
+        ys, xs = np.broadcast_arrays(y, x)
+        out = np.full(ys.shape, self.fill, dtype=self.dtype)
+        if ys.size == 0:
+            return out
+
+        keys = self.get_keys(ys, xs)
+        first = keys.flat[0]
+        if (keys == first).all():
+            chunk = self.chunks.get(int(first))
+            if chunk is not None:
+                out[...] = chunk[ys & self.CHUNK_MASK, xs & self.CHUNK_MASK]
+            return out
+
+        for key in np.unique(keys).tolist():
+            chunk = self.chunks.get(key)
+            if chunk is not None:
+                sel = keys == key
+                out[sel] = chunk[ys[sel] & self.CHUNK_MASK, xs[sel] & self.CHUNK_MASK]
+        return out
+
+    def __setitem__(self, pos, values):
+        """Writes one cell, board[y, x] = v, or several cells, board[ys, xs] = vs
+
+        Args:
+            pos (tuple): y and x coordinates, as ints or arrays
+            values (int or np.ndarray): new values
+        """
+
+        y, x = pos
+        if not isinstance(y, np.ndarray) and not isinstance(x, np.ndarray):
+            key = (y >> self.CHUNK_BITS) * self.chunks_x + (x >> self.CHUNK_BITS)
+            self.get_chunk(key)[y & self.CHUNK_MASK, x & self.CHUNK_MASK] = values
+            self.dirty.add(key)
+            return
+
+        if self.single:
+            self.get_chunk(0)[y, x] = values
+            self.dirty.add(0)
+            return
+
+        ys, xs, values = np.broadcast_arrays(y, x, values)
+        if ys.size == 0:
+            return
+
+        keys = self.get_keys(ys, xs)
+        first = keys.flat[0]
+        if (keys == first).all():
+            key = int(first)
+            self.get_chunk(key)[ys & self.CHUNK_MASK, xs & self.CHUNK_MASK] = values
+            self.dirty.add(key)
+            return
+
+        for key in np.unique(keys).tolist():
+            sel = keys == key
+            self.get_chunk(key)[ys[sel] & self.CHUNK_MASK, xs[sel] & self.CHUNK_MASK] = values[sel]
+            self.dirty.add(key)
+
+    def window(self, x0, y0, x1, y1):
+        """Copies a rectangular region of the grid (end coordinates excluded)
+
+        Args:
+            x0 (int): left coordinate
+            y0 (int): top coordinate
+            x1 (int): right coordinate (excluded)
+            y1 (int): bottom coordinate (excluded)
+
+        Returns:
+            np.ndarray: dense copy of the region
+        """
+
+        c = self.CHUNK_SIZE
+        out = np.full([max(0, y1-y0), max(0, x1-x0)], self.fill, dtype=self.dtype)
+        if out.size == 0:
+            return out
+
+        for cy in range(y0 >> self.CHUNK_BITS, ((y1-1) >> self.CHUNK_BITS) + 1):
+            for cx in range(x0 >> self.CHUNK_BITS, ((x1-1) >> self.CHUNK_BITS) + 1):
+                chunk = self.chunks.get(cy*self.chunks_x + cx)
+                if chunk is None:
+                    continue
+                ay0, ay1 = max(y0, cy*c), min(y1, cy*c + c)
+                ax0, ax1 = max(x0, cx*c), min(x1, cx*c + c)
+                out[ay0-y0:ay1-y0, ax0-x0:ax1-x0] = chunk[ay0-cy*c:ay1-cy*c, ax0-cx*c:ax1-cx*c]
+        return out
+
+    def get_chunk_cells(self, key):
+        """Returns the flat indices of a chunk's cells. Cells past the edge of
+        the grid get meaningless indices and always hold the fill value
+
+        Args:
+            key (int): chunk index
+
+        Returns:
+            np.ndarray: [CHUNK_SIZE, CHUNK_SIZE] flat indices (y*width + x)
+        """
+
+        cy, cx = divmod(key, self.chunks_x)
+        return self.chunk_cells + (cy*self.width + cx) * self.CHUNK_SIZE
+
+    def find(self):
+        """Lists the cells which differ from the fill value
+
+        Returns:
+            np.ndarray: flat indices (y*width + x) of the cells
+        """
+
+        cells = [np.empty(0, dtype="int64")]
+        for key, chunk in self.chunks.items():
+            cy, cx = divmod(key, self.chunks_x)
+            ys, xs = np.nonzero(chunk != self.fill)
+            cells.append((ys + cy*self.CHUNK_SIZE).astype("int64") * self.width + xs + cx*self.CHUNK_SIZE)
+        return np.concatenate(cells)
+
+    def take_dirty(self):
+        """Returns the chunks written since the last call and forgets them
+
+        Returns:
+            set[int]: chunk indices
+        """
+
+        dirty = self.dirty
+        self.dirty = set()
+        return dirty
+
+    def encode(self, keys=None):
+        """Serializes chunks in a compressed form. Chunks which were never
+        written are left out
+
+        Args:
+            keys (iterable[int], optional): chunks to encode. Defaults to all allocated chunks.
+
+        Returns:
+            bytes: encoded chunks
+        """
+
+        keys = sorted(self.chunks if keys is None else keys)
+        parts = []
+        for key in keys:
+            cy, cx = divmod(key, self.chunks_x)
+            parts.append(self.CHUNK_HEADER.pack(cx, cy))
+            parts.append(self.get_chunk(key).tobytes())
+        return zlib.compress(b"".join(parts))
+
+    def decode(self, data):
+        """Parses chunks serialized by encode
+
+        Args:
+            data (bytes): encoded chunks
+
+        Returns:
+            list[tuple[int, np.ndarray]]: (chunk index, chunk) pairs
+        """
+
+        data = zlib.decompress(data)
+        size = self.CHUNK_HEADER.size + self.CHUNK_SIZE*self.CHUNK_SIZE*self.dtype.itemsize
+        chunks = []
+        for offset in range(0, len(data), size):
+            cx, cy = self.CHUNK_HEADER.unpack_from(data, offset)
+            chunk = np.frombuffer(data, dtype=self.dtype, count=self.CHUNK_SIZE*self.CHUNK_SIZE, offset=offset+self.CHUNK_HEADER.size)
+            chunks.append((cy*self.chunks_x + cx, chunk.reshape([self.CHUNK_SIZE, self.CHUNK_SIZE]).copy()))
+        return chunks
+
+    def set_chunk(self, key, chunk):
+        """Replaces a whole chunk
+
+        Args:
+            key (int): chunk index
+            chunk (np.ndarray): new CHUNK_SIZE x CHUNK_SIZE chunk
+
+        Returns:
+            np.ndarray: the previous chunk (filled with the fill value if it did not exist)
+        """
+
+        old = self.get_chunk(key)
+        self.chunks[key] = chunk
+        self.dirty.add(key)
+        return old
+
+    def copy_chunks(self):
+        """Copies all allocated chunks into one contiguous array
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: chunk indices and [n, CHUNK_SIZE, CHUNK_SIZE] chunk data
+        """
+
+        keys = np.fromiter(self.chunks.keys(), dtype="int64", count=len(self.chunks))
+        if len(keys) == 0:
+            return keys, np.empty([0, self.CHUNK_SIZE, self.CHUNK_SIZE], dtype=self.dtype)
+        return keys, np.stack(list(self.chunks.values()))
+
+    def restore_chunks(self, keys, data):
+        """Replaces all chunks with copies made by copy_chunks. Chunks which
+        change are marked as dirty
+
+        Args:
+            keys (np.ndarray): chunk indices
+            data (np.ndarray): [n, CHUNK_SIZE, CHUNK_SIZE] chunk data
+        """
+
+        self.dirty.update(self.chunks)
+        data = data.copy()
+        self.chunks = dict(zip(keys.tolist(), data))
+        self.dirty.update(self.chunks)
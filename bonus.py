@@ -2,7 +2,8 @@
 #Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
 
 from math import floor, ceil
-from random import randint, random
+
+import numpy as np
 
 class Bonus:
     """Static superclass for bonuses"""
@@ -22,23 +23,82 @@ class Bonus:
         """
         pass
     
+    def excluded_cells(game):
+        """Lists the cells where no new bonus may appear: cells already holding
+        a bonus and cells closer than DISTANCE_MIN to a player
+
+        Args:
+            game (Game): Game instance
+
+        Returns:
+            np.ndarray: sorted flat indices (y*WIDTH + x) of the excluded cells
+        """
+
+        positions = [(player.x, player.y) for player in game.players]
+        return Bonus.get_excluded_cells(game.bonuses.find(), positions, game.WIDTH, game.HEIGHT)
+    
+    def get_excluded_cells(bonus_cells, positions, width, height):
+        """Lists the excluded cells of a grid, see excluded_cells
+
+        Args:
+            bonus_cells (np.ndarray): flat indices of the cells holding a bonus
+            positions (list[tuple[int, int]]): positions of the players
+            width (int): width of the grid
+            height (int): height of the grid
+
+        Returns:
+            np.ndarray: sorted flat indices (y*width + x) of the excluded cells
+        """
+
+        d = Bonus.DISTANCE_MIN-1
+        cells = [bonus_cells]
+        for x, y in positions:
+            ys, xs = np.mgrid[
+                max(0, y-d):min(height, y+d+1),
+                max(0, x-d):min(width, x+d+1)
+            ]
+            cells.append((ys*width + xs).ravel())
+        return np.unique(np.concatenate(cells))
+    
+    def draw(rng, excluded, width, height, n_bonuses):
+        """Draws a bonus and a cell uniformly among the eligible ones
+
+        Args:
+            rng (random.Random): random number generator
+            excluded (np.ndarray): sorted flat indices of the excluded cells
+            width (int): width of the grid
+            height (int): height of the grid
+            n_bonuses (int): number of bonus types
+
+        Returns:
+            tuple[int, int, int]: x, y and bonus id, or None if no cell is eligible
+        """
+
+        free = width*height - len(excluded)
+        if free <= 0:
+            return None
+
+        # The r-th free cell is r shifted by the number of excluded cells before it
+        r = rng.randrange(free)
+        cell = r + int(np.searchsorted(excluded - np.arange(len(excluded)), r, side="right"))
+        id = rng.randint(0, n_bonuses-1)
+        return cell % width, cell // width, id
+    
     def new_bonus(game):
-        """Generates a new bonus
+        """Generates a new bonus on a cell drawn uniformly among the eligible ones
 
         Args:
             game (Game): Game instance
+
+        Returns:
+            bool: True if a bonus was placed, False if no cell is eligible
         """
 
-        x, y = randint(0,game.WIDTH-1), randint(0,game.HEIGHT-1)
-        id = randint(0,len(game.bonus_list)-1)
-        if (x, y) in game.bonus_dict:
-            Bonus.new_bonus(game)
-            return
-        for player in game.players:
-            if abs(player.x-x) < Bonus.DISTANCE_MIN and abs(player.y-y) < Bonus.DISTANCE_MIN:
-                Bonus.new_bonus(game)
-                return
-        game.bonus_dict[(x, y)] = id
+        drawn = Bonus.draw(game.rng, Bonus.excluded_cells(game), game.WIDTH, game.HEIGHT, len(game.bonus_list))
+        if drawn is None:
+            return False
+        game.place_bonus(*drawn)
+        return True
     
     def try_spawn(game):
         """Tries to generate a new bonus. Called on every turn
@@ -47,7 +107,7 @@ class Bonus:
             game (Game): Game instance
         """
 
-        if len(game.bonus_dict) < Bonus.MAX_BONUS and random() < Bonus.BONUS_CHANCE:
+        if game.bonus_count < Bonus.MAX_BONUS and game.rng.random() < Bonus.BONUS_CHANCE:
             Bonus.new_bonus(game)
 
 class Bomb:
@@ -60,10 +120,8 @@ class Bomb:
         player.use_bonus()
         sx, sy = max(ceil(x-(Bomb.BOMB_SIZE/2)),0), max(ceil(y-(Bomb.BOMB_SIZE/2)), 0)
         ex, ey = min(floor(x + Bomb.BOMB_SIZE/2), game.WIDTH-1)+1, min(floor(y + Bomb.BOMB_SIZE/2), game.HEIGHT-1)+1
-        t = player.i if player.reinforced <= 0 else player.i + 2
-        for by in range(sy, ey):
-            for bx in range(sx, ex):
-                game.set_trail(bx, by, t)
+        t = game.get_trail_id(player)
+        game.set_trail_region(sx, sy, ex, ey, t)
 
 class Row:
     """Bonus which places drool on the player's current row"""
@@ -71,9 +129,8 @@ class Row:
     TEXTURE = "row.png"
     def apply(x, y, game, player):
         player.use_bonus()
-        t = player.i if player.reinforced <= 0 else player.i + 2
-        for rx in range(0,game.WIDTH):
-            game.set_trail(rx, y, t)
+        t = game.get_trail_id(player)
+        game.set_trail_region(0, y, game.WIDTH, y+1, t)
 
 class Column:
     """Bonus which places drool on the player's current column"""
@@ -81,9 +138,8 @@ class Column:
     TEXTURE = "column.png"
     def apply(x, y, game, player):
         player.use_bonus()
-        t = player.i if player.reinforced <= 0 else player.i + 2
-        for ry in range(0,game.HEIGHT):
-            game.set_trail(x, ry, t)
+        t = game.get_trail_id(player)
+        game.set_trail_region(x, 0, x+1, game.HEIGHT, t)
 
 class MagicalPotion:
     """Bonus which places makes the player's drool stronger for the next REINFORCED_TIME turns"""
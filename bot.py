@@ -0,0 +1,101 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+from player import Player
+
+class Bot:
+    """Static superclass for computer-controlled players"""
+
+    def play(game, player, rng):
+        """Chooses a player's input for the current turn
+
+        Args:
+            game (Simulation): Simulation instance
+            player (Player): player to control
+            rng (random.Random): random number generator of the bot
+
+        Returns:
+            tuple[int, bool]: direction and whether to dash
+        """
+        return (player.dir % 4, False)
+
+class RandomBot:
+    """Bot which wanders randomly, rarely turning back"""
+
+    TURN_CHANCE = 0.3  # Likelihood of changing direction on each turn
+    DASH_CHANCE = 0.2  # Likelihood of dashing when possible
+
+    def play(game, player, rng):
+        dir_ = player.dir % 4
+        if rng.random() < RandomBot.TURN_CHANCE:
+            dir_ = (dir_ + rng.choice((-1, 1))) % 4
+        return (dir_, rng.random() < RandomBot.DASH_CHANCE)
+
+class GreedyBot:
+    """Bot which heads for the neighbouring cells worth the most: bonuses,
+    then the opponents' drool, then empty cells
+    """
+
+    BONUS_VALUE = 6  # Value of a cell holding a bonus
+    OPPONENT_VALUE = 2  # Value of a cell covered by an opponent
+    EMPTY_VALUE = 1  # Value of an empty cell
+    DASH_GAIN = 2  # Minimum value a dash must add over walking
+
+    def cell_value(game, player, x, y):
+        """Returns the value of stepping on a cell
+
+        Args:
+            game (Simulation): Simulation instance
+            player (Player): player to control
+            x (int): x coordinate
+            y (int): y coordinate
+
+        Returns:
+            int: the value, 0 if the cell already belongs to the player
+        """
+
+        value = GreedyBot.BONUS_VALUE if game.bonuses[y, x] != -1 else 0
+        t = game.trails[y, x]
+        if t == -1:
+            return value + GreedyBot.EMPTY_VALUE
+        if t % game.n_players != player.i:
+            return value + GreedyBot.OPPONENT_VALUE
+        return value
+
+    def path_value(game, player, dir_, length):
+        """Returns the value of the cells a move would step on
+
+        Args:
+            game (Simulation): Simulation instance
+            player (Player): player to control
+            dir_ (int): direction (0, 1, 2, 3 -> right, down, left, up)
+            length (int): number of cells of the move
+
+        Returns:
+            int: total value, or None if the move would leave the grid
+        """
+
+        dx, dy = Player.OFFSETS[dir_]
+        value = 0
+        for d in range(1, length+1):
+            x, y = player.x + dx*d, player.y + dy*d
+            if not (0 <= x < game.WIDTH and 0 <= y < game.HEIGHT):
+                return None
+            value += GreedyBot.cell_value(game, player, x, y)
+        return value
+
+    def play(game, player, rng):
+        best, best_value = player.dir % 4, -1
+        best_dash, best_dash_value = None, -1
+        for dir_ in rng.sample(range(4), 4):
+            value = GreedyBot.path_value(game, player, dir_, 1)
+            if value is not None and value > best_value:
+                best, best_value = dir_, value
+            if player.candash():
+                value = GreedyBot.path_value(game, player, dir_, Player.DASH_SIZE)
+                if value is not None and value > best_dash_value:
+                    best_dash, best_dash_value = dir_, value
+
+        if best_dash is not None and best_dash_value >= best_value + GreedyBot.DASH_GAIN:
+            return (best_dash, True)
+        return (best, False)
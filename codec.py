@@ -0,0 +1,255 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import numpy as np
+
+class Writer:
+    """Builds messages in a buffer kept from one message to the next, so that
+    encoding only allocates the final bytes. Fixed fields are written with
+    precompiled struct.Struct objects and pack_into, arrays through numpy
+    views of the buffer
+    """
+
+    INITIAL_SIZE = 4096  # Initial size of the buffer in bytes
+    MAX_VARINT = 5  # Maximum length of a varint, enough for 32-bit values
+    SMALL = 32  # Number of varints under which plain loops beat numpy
+
+    def __init__(self, size=INITIAL_SIZE):
+        """Initializes a Writer instance
+
+        Args:
+            size (int, optional): initial size of the buffer. Defaults to INITIAL_SIZE.
+        """
+
+        self.buffer = bytearray(size)
+        self.pos = 0
+
+    def reset(self):
+        """Starts a new message"""
+        self.pos = 0
+
+    def reserve(self, n):
+        """Grows the buffer so that n more bytes fit
+
+        Args:
+            n (int): number of bytes
+        """
+
+        if self.pos + n > len(self.buffer):
+            self.buffer.extend(bytes(max(n, len(self.buffer))))
+
+    def getvalue(self):
+        """Returns the message written since the last reset
+
+        Returns:
+            bytes: the message
+        """
+        return bytes(memoryview(self.buffer)[:self.pos])
+
+    def byte(self, value):
+        """Writes a byte
+
+        Args:
+            value (int): value between 0 and 255
+        """
+
+        self.reserve(1)
+        self.buffer[self.pos] = value
+        self.pos += 1
+
+    def pack(self, struct_, *values):
+        """Writes fixed-size fields
+
+        Args:
+            struct_ (struct.Struct): layout of the fields
+            *values: field values
+        """
+
+        self.reserve(struct_.size)
+        struct_.pack_into(self.buffer, self.pos, *values)
+        self.pos += struct_.size
+
+    def array(self, values, dtype=np.uint8):
+        """Writes the raw content of an array
+
+        Args:
+            values (np.ndarray): the values
+            dtype (type, optional): type of the written values. Defaults to np.uint8.
+        """
+
+        n = len(values) * np.dtype(dtype).itemsize
+        self.reserve(n)
+        np.frombuffer(self.buffer, dtype=dtype, count=len(values), offset=self.pos)[:] = values
+        self.pos += n
+
+    def varint(self, value):
+        """Writes a non-negative integer as a LEB128 varint
+
+        Args:
+            value (int): the integer
+        """
+
+        self.reserve(self.MAX_VARINT)
+        buffer, pos = self.buffer, self.pos
+        while value >= 0x80:
+            buffer[pos] = value & 0x7f | 0x80
+            value >>= 7
+            pos += 1
+        buffer[pos] = value
+        self.pos = pos + 1
+
+    def varints(self, values):
+        """Writes non-negative integers as LEB128 varints, one after the other
+
+        Args:
+            values (np.ndarray): integers below 2**35
+        """
+
+        if len(values) < self.SMALL:
+            self.reserve(len(values) * self.MAX_VARINT)
+            buffer, pos = self.buffer, self.pos
+            for value in (values.tolist() if isinstance(values, np.ndarray) else values):
+                while value >= 0x80:
+                    buffer[pos] = value & 0x7f | 0x80
+                    value >>= 7
+                    pos += 1
+                buffer[pos] = value
+                pos += 1
+            self.pos = pos
+            return
+
+        values = np.asarray(values)
+        if values.max() < 0x80:
+            # Gaps and run lengths usually fit in a single byte each
+            self.array(values)
+            return
+
+        values = values.astype(np.uint64)
+        sizes = np.ones(len(values), dtype=np.int64)
+        for k in range(1, self.MAX_VARINT):
+            sizes += values >= np.uint64(1 << (7*k))
+        starts = np.cumsum(sizes) - sizes
+        total = int(starts[-1] + sizes[-1])
+        self.reserve(total)
+        out = np.frombuffer(self.buffer, dtype=np.uint8, count=total, offset=self.pos)
+        for k in range(self.MAX_VARINT):
+            sel = sizes > k
+            if not sel.any():
+                break
+            byte = (values[sel] >> np.uint64(7*k)) & np.uint64(0x7f)
+            byte[sizes[sel] > k+1] |= np.uint64(0x80)
+            out[starts[sel] + k] = byte
+        self.pos += total
+
+class Reader:
+    """Parses a message through a memoryview, without copying it"""
+
+    def __init__(self, data, pos=0):
+        """Initializes a Reader instance
+
+        Args:
+            data (bytes): the message
+            pos (int, optional): position of the first byte to read. Defaults to 0.
+        """
+
+        self.data = memoryview(data)
+        self.pos = pos
+
+    def byte(self):
+        """Reads a byte
+
+        Returns:
+            int: the byte
+        """
+
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def unpack(self, struct_):
+        """Reads fixed-size fields
+
+        Args:
+            struct_ (struct.Struct): layout of the fields
+
+        Returns:
+            tuple: field values
+        """
+
+        values = struct_.unpack_from(self.data, self.pos)
+        self.pos += struct_.size
+        return values
+
+    def array(self, count, dtype=np.uint8):
+        """Reads an array, as a read-only view of the message
+
+        Args:
+            count (int): number of values
+            dtype (type, optional): type of the values. Defaults to np.uint8.
+
+        Returns:
+            np.ndarray: the values
+        """
+
+        values = np.frombuffer(self.data, dtype=dtype, count=count, offset=self.pos)
+        self.pos += values.nbytes
+        return values
+
+    def rest(self):
+        """Reads the end of the message
+
+        Returns:
+            memoryview: the remaining bytes
+        """
+
+        rest = self.data[self.pos:]
+        self.pos = len(self.data)
+        return rest
+
+    def varint(self):
+        """Reads a LEB128 varint
+
+        Returns:
+            int: the integer
+        """
+
+        data, pos = self.data, self.pos
+        value = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        self.pos = pos
+        return value
+
+    def varints(self, count):
+        """Reads LEB128 varints written by Writer.varints
+
+        Args:
+            count (int): number of varints
+
+        Returns:
+            np.ndarray: int64 values
+        """
+
+        if count < Writer.SMALL:
+            return np.array([self.varint() for _ in range(count)], dtype=np.int64)
+
+        if len(self.data) - self.pos >= count:
+            b = np.frombuffer(self.data, dtype=np.uint8, count=count, offset=self.pos)
+            if b.max() < 0x80:
+                self.pos += count
+                return b.astype(np.int64)
+
+        b = np.frombuffer(self.data, dtype=np.uint8, count=min(len(self.data)-self.pos, count*Writer.MAX_VARINT), offset=self.pos)
+        ends = np.flatnonzero(b < 0x80)[:count]
+        b = b[:ends[-1]+1]
+        starts = np.empty(count, dtype=np.int64)
+        starts[0] = 0
+        starts[1:] = ends[:-1] + 1
+        shifts = (np.arange(len(b)) - np.repeat(starts, ends-starts+1)) * 7
+        self.pos += len(b)
+        return np.bitwise_or.reduceat((b & 0x7f).astype(np.int64) << shifts, starts)
@@ -1,10 +1,11 @@
 #Snaildash is a small game created in the scope of a school project
 #Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
 
-from math import radians, sin, cos, pi
+from math import ceil, floor, radians, sin, cos, pi
 import random
 import time
 
+import numpy as np
 import pygame
 
 from font_manager import FontManager
@@ -19,6 +20,7 @@ class DisplayManager:
     PCT_COLOR = (255, 255, 255)
     END_STMT_COLOR = (255, 255, 255)
     BONUS_SCORE_COLOR = (255, 255, 255)
+    VIEW_SIZE = 15  # Maximum number of tiles shown along each axis, larger grids scroll
     
     def __init__(self, manager):
         """Initializes a DisplayManager instance
@@ -52,23 +54,32 @@ class DisplayManager:
     def resize(self):
         """Reloads and resizes textures according to the new tile size"""
 
+        n = self.manager.game.n_players
         self.drool_textures = []
         for i in range(16):
             normal = TextureManager.get(("drool", f"{i}.png"), self.ts*2)
             reinforced = TextureManager.get(("drool_reinforced", f"{i}.png"), self.ts*2)
-            red, blue = normal.copy(), normal.copy()
-            redr, bluer = reinforced.copy(), reinforced.copy()
-            red.fill(Player.TRAIL_COLORS[0]+(255,), None, pygame.BLEND_RGBA_MULT)
-            blue.fill(Player.TRAIL_COLORS[1]+(255,), None, pygame.BLEND_RGBA_MULT)
-            redr.fill(Player.TRAIL_COLORS[0]+(255,), None, pygame.BLEND_RGBA_MULT)
-            bluer.fill(Player.TRAIL_COLORS[1]+(255,), None, pygame.BLEND_RGBA_MULT)
-            self.drool_textures.append((red, blue, redr, bluer))
+            textures = []
+            
+            # Trail ids: player id, + n if reinforced
+            for t in range(2*n):
+                texture = (normal if t < n else reinforced).copy()
+                texture.fill(Player.TRAIL_COLORS[t%n]+(255,), None, pygame.BLEND_RGBA_MULT)
+                textures.append(texture)
+            self.drool_textures.append(textures)
         
         self.snail = []
         for i in range(5):
             red = TextureManager.get(("snail", "red", f"{i}.png"), self.ts*2)
             blue = TextureManager.get(("snail", "blue", f"{i}.png"), self.ts*2)
-            self.snail.append((red, blue))
+            textures = [red, blue]
+            
+            # Other players get a tinted grayscale snail
+            for j in range(2, n):
+                texture = pygame.transform.grayscale(red)
+                texture.fill(Player.COLORS[j]+(255,), None, pygame.BLEND_RGBA_MULT)
+                textures.append(texture)
+            self.snail.append(textures)
             
         self.bonus_textures = []
         for cls in self.manager.game.bonus_list:
@@ -94,8 +105,8 @@ class DisplayManager:
         
         w3, h3 = mgr.WIDTH/3, mgr.HEIGHT/3
         
-        tw = 2*w3/mgr.game.WIDTH
-        th = 2*h3/mgr.game.HEIGHT
+        tw = 2*w3/min(mgr.game.WIDTH, self.VIEW_SIZE)
+        th = 2*h3/min(mgr.game.HEIGHT, self.VIEW_SIZE)
         ts = min(tw, th)
         if self.ts != ts:
             self.ts = ts
@@ -115,7 +126,7 @@ class DisplayManager:
         if stage == Stage.COUNTDOWN:
             self.render_game(surf)
             
-            r = max(0, mgr.countdown_start+mgr.COUNTDOWN_DUR - time.time())
+            r = max(0, mgr.countdown_start+mgr.COUNTDOWN_DUR - time.perf_counter())
             rem_sec = round(r)
             rem_sec = "Go" if rem_sec == 0 else str(rem_sec)
             font = FontManager.get("arial", 50, True, True)
@@ -146,6 +157,37 @@ class DisplayManager:
         elif stage == Stage.TUTORIAL:
             mgr.tutorial.render(surf)
     
+    def get_view(self):
+        """Computes which part of the grid is shown on screen. Grids larger than
+        VIEW_SIZE are seen through a camera following the local player
+
+        Returns:
+            tuple: (ox, oy) screen position of the grid's top-left corner,
+            (x0, y0, x1, y1) range of visible tiles (end excluded),
+            [x, y, w, h] screen rectangle of the view
+        """
+
+        mgr = self.manager
+        game = mgr.game
+        vw, vh = min(game.WIDTH, self.VIEW_SIZE), min(game.HEIGHT, self.VIEW_SIZE)
+
+        # Camera center in tiles
+        r = 1-max(0,game.remaining)/game.TIMER
+        r = max(0, min(1, r))
+        player = game.player
+        cx = player.lx+(player.x-player.lx)*r + 0.5
+        cy = player.ly+(player.y-player.ly)*r + 0.5
+        cx = max(vw/2, min(game.WIDTH-vw/2, cx))
+        cy = max(vh/2, min(game.HEIGHT-vh/2, cy))
+
+        ox, oy = mgr.WIDTH/2 - cx*self.ts, mgr.HEIGHT/2 - cy*self.ts
+        rect = [mgr.WIDTH/2 - vw/2*self.ts, mgr.HEIGHT/2 - vh/2*self.ts, vw*self.ts, vh*self.ts]
+
+        # One more tile on each side for textures overflowing their cell
+        x0, x1 = max(0, floor(cx-vw/2)-1), min(game.WIDTH, ceil(cx+vw/2)+1)
+        y0, y1 = max(0, floor(cy-vh/2)-1), min(game.HEIGHT, ceil(cy+vh/2)+1)
+        return (ox, oy), (x0, y0, x1, y1), rect
+    
     def render_main_menu(self, surf):
         """Renders the main menu
 
@@ -190,7 +232,8 @@ class DisplayManager:
         mgr = self.manager
         game = mgr.game
         
-        ox, oy = mgr.WIDTH/2 - game.WIDTH/2*self.ts, mgr.HEIGHT/2 - game.HEIGHT/2*self.ts
+        (ox, oy), (x0, y0, x1, y1), rect = self.get_view()
+        scrolling = game.WIDTH > self.VIEW_SIZE or game.HEIGHT > self.VIEW_SIZE
 
         # Stars
         for i, [x, y, f] in enumerate(self.stars):
@@ -202,29 +245,30 @@ class DisplayManager:
             self.stars[i] = [x, y, f]
 
         # Black bg
-        pygame.draw.rect(surf, (0,0,0), [ox, oy, game.WIDTH*self.ts, game.HEIGHT*self.ts])
-        
-        # Grid
-        for y in range(game.HEIGHT+1):
-            pygame.draw.line(surf, (150,150,150), [ox, oy+y*self.ts], [ox+game.WIDTH*self.ts, oy+y*self.ts])
-        
-        for x in range(game.WIDTH+1):
-            pygame.draw.line(surf, (150,150,150), [ox+x*self.ts, oy], [ox+x*self.ts, oy+game.HEIGHT*self.ts])
+        pygame.draw.rect(surf, (0,0,0), rect)
+        if scrolling:
+            surf.set_clip(rect)
+        
+        # Grid (visible lines only)
+        left, right = max(ox, rect[0]), min(ox+game.WIDTH*self.ts, rect[0]+rect[2])
+        top, bottom = max(oy, rect[1]), min(oy+game.HEIGHT*self.ts, rect[1]+rect[3])
+        for y in range(y0, y1+1):
+            pygame.draw.line(surf, (150,150,150), [left, oy+y*self.ts], [right, oy+y*self.ts])
+        
+        for x in range(x0, x1+1):
+            pygame.draw.line(surf, (150,150,150), [ox+x*self.ts, top], [ox+x*self.ts, bottom])
 
-        # Drool
-        for y in range(game.HEIGHT):
-            for x in range(game.WIDTH):
-                t = game.trails[y, x]
-                if t != -1:
-                    drool_i = game.drool[y, x]
-                    texture = self.drool_textures[drool_i][t]
-                    
-                    surf.blit(texture, [ox+(x-0.5)*self.ts, oy+(y-0.5)*self.ts])
+        # Drool (visible cells only)
+        trails = game.trails.window(x0, y0, x1, y1)
+        drool = game.drool.window(x0, y0, x1, y1)
+        for y, x in zip(*np.nonzero(trails != -1)):
+            texture = self.drool_textures[drool[y, x]][trails[y, x]]
+            surf.blit(texture, [ox+(x0+x-0.5)*self.ts, oy+(y0+y-0.5)*self.ts])
         
         # Bonus
-        bonus_l = game.bonus_dict.copy()
-        for (x, y), i in bonus_l.items():
-            surf.blit(self.bonus_textures[i], [ox + (x-0.5)*self.ts, oy + (y-0.5)*self.ts])
+        bonuses = game.bonuses.window(x0, y0, x1, y1)
+        for y, x in zip(*np.nonzero(bonuses != -1)):
+            surf.blit(self.bonus_textures[bonuses[y, x]], [ox + (x0+x-0.5)*self.ts, oy + (y0+y-0.5)*self.ts])
         
         # Players
         r = 1-max(0,game.remaining)/game.TIMER
@@ -235,6 +279,8 @@ class DisplayManager:
                 x, y = player.x, player.y
                 lx, ly = player.lx, player.ly
                 X, Y = lx+(x-lx)*r, ly+(y-ly)*r
+                if not (x0 <= X < x1 and y0 <= Y < y1):
+                    continue
 
                 _ = 4 - abs(r-0.5)*8
                 texture = self.snail[int(_)][player.i]
@@ -242,6 +288,16 @@ class DisplayManager:
                     texture = pygame.transform.rotate(texture, -((player.dir+1)%4)*90)
                 surf.blit(texture, [ox+(X-0.5)*self.ts, oy+(Y-0.5)*self.ts])
         
+        # Collision shockwave
+        if game.collide_start != 0:
+            rem = game.collide_start+game.COLLIDE_DURATION-cur_time
+            if rem > 0:
+                r = 1-rem/game.COLLIDE_DURATION
+                r = game.COLLIDE_RADIUS*r*self.ts
+                pygame.draw.circle(surf, (255,255,255), [ox+(game.collide_pos[0]+0.5)*self.ts, oy+(game.collide_pos[1]+0.5)*self.ts], r, 3)
+        
+        surf.set_clip(None)
+        
         # Time bar
         remaining = game.start_time+game.DURATION - cur_time
         if game.start_time == 0: remaining = game.DURATION
@@ -251,17 +307,9 @@ class DisplayManager:
         w = W * max(0, min(1, remaining/game.DURATION))
         pygame.draw.rect(surf, (255,255,255), [w6, mgr.HEIGHT-10, w, 10])
         
-        # Collision shockwave
-        if game.collide_start != 0:
-            rem = game.collide_start+game.COLLIDE_DURATION-cur_time
-            if rem > 0:
-                r = 1-rem/game.COLLIDE_DURATION
-                r = game.COLLIDE_RADIUS*r*self.ts
-                pygame.draw.circle(surf, (255,255,255), [ox+(game.collide_pos[0]+0.5)*self.ts, oy+(game.collide_pos[1]+0.5)*self.ts], r, 3)
-        
         # Dash bar
         ds_texture = self.dashscore_textures[min(Player.MAX_DASHSCORE, game.player.dashscore)]
-        surf.blit(ds_texture, [ox-ds_texture.get_width()-self.ts, mgr.HEIGHT/2-ds_texture.get_height()/2])
+        surf.blit(ds_texture, [rect[0]-ds_texture.get_width()-self.ts, mgr.HEIGHT/2-ds_texture.get_height()/2])
 
         # player names
         font = FontManager.get("arial", 50, True, True)
@@ -270,14 +318,15 @@ class DisplayManager:
 
         vstext = font.render("VS", True, (255, 255, 255))
         
-        bluepos = [mgr.WIDTH/3-ousername.get_width()/2, oy/2 - ousername.get_height()/2]
-        redpos = [mgr.WIDTH*2/3-musername.get_width()/2, oy/2 - musername.get_height()/2]
+        top = rect[1]
+        bluepos = [mgr.WIDTH/3-ousername.get_width()/2, top/2 - ousername.get_height()/2]
+        redpos = [mgr.WIDTH*2/3-musername.get_width()/2, top/2 - musername.get_height()/2]
         
         mpos, opos = (redpos, bluepos) if game.player.i == 1 else (bluepos, redpos)
         
         surf.blit(musername, mpos)
         surf.blit(ousername, opos)
-        surf.blit(vstext, (mgr.WIDTH/2-vstext.get_width()/2, oy/2 - vstext.get_height()/2))
+        surf.blit(vstext, (mgr.WIDTH/2-vstext.get_width()/2, top/2 - vstext.get_height()/2))
         
     def render_breakdown_transition(self, surf):
         """Renders the transition between the game and breakdown phase
@@ -300,11 +349,11 @@ class DisplayManager:
         surf.blit(fade, [0,0])
         
         # Players animation
-        ox, oy = mgr.WIDTH/2 - game.WIDTH/2*self.ts, mgr.HEIGHT/2 - game.HEIGHT/2*self.ts
-        p1, p2 = game.players
+        (ox, oy), _, rect = self.get_view()
+        p1, p2 = game.players  # Games have Game.N_PLAYERS = 2 players
         p1Ps = [ox + (p1.x+0.5)*self.ts, oy + (p1.y+0.5)*self.ts]
         p2Ps = [ox + (p2.x+0.5)*self.ts, oy + (p2.y+0.5)*self.ts]
-        p1Pe, p2Pe = [ox, oy], [ox + game.WIDTH*self.ts, oy]
+        p1Pe, p2Pe = [rect[0], rect[1]], [rect[0] + rect[2], rect[1]]
         
         p1P = [
             (p1Pe[0]-p1Ps[0])*r + p1Ps[0],
@@ -351,8 +400,8 @@ class DisplayManager:
         pct_red = red/full*100
         pct_blue = blue/full*100
         
-        ox, oy = mgr.WIDTH/2 - game.WIDTH/2*self.ts, mgr.HEIGHT/2 - game.HEIGHT/2*self.ts
-        p1, p2 = [ox, oy], [ox + game.WIDTH*self.ts, oy]
+        rect = self.get_view()[2]
+        p1, p2 = [rect[0], rect[1]], [rect[0] + rect[2], rect[1]]
         mx, my = (p1[0]+p2[0])/2, (p1[1]+p2[1])/2
         width = p2[0] - p1[0] - 2*self.ts - 40
         bar_h = self.ts
@@ -417,8 +466,8 @@ class DisplayManager:
         pct_red = red/full*100
         pct_blue = blue/full*100
         
-        ox, oy = mgr.WIDTH/2 - game.WIDTH/2*self.ts, mgr.HEIGHT/2 - game.HEIGHT/2*self.ts
-        p1, p2 = [ox, oy], [ox + game.WIDTH*self.ts, oy]
+        rect = self.get_view()[2]
+        p1, p2 = [rect[0], rect[1]], [rect[0] + rect[2], rect[1]]
         mx, my = (p1[0]+p2[0])/2, (p1[1]+p2[1])/2
         width = p2[0] - p1[0] - 2*self.ts - 40
         bar_h = self.ts
@@ -461,7 +510,7 @@ class DisplayManager:
         ])
         
         # Bonus scores
-        bonus_scores = mgr.get_bonus_scores()
+        ledger = game.ledger
         cur = mgr.time()
         step = int( (cur-mgr.breakdown_start)//mgr.BREAKDOWN_INTERVAL )
         x1, x2 = p1[0], p2[0]
@@ -469,11 +518,12 @@ class DisplayManager:
         
         ys = p1[1]+100
         ye = mgr.HEIGHT*6/7
-        h = (ye-ys)/len(bonus_scores)
+        h = (ye-ys)/len(ledger.NAMES)
         
         font = FontManager.get("arial", 30)
-        for i in range(min(step, len(bonus_scores))):
-            name, red, blue = bonus_scores[i]
+        for i in range(min(step, len(ledger.NAMES))):
+            name = ledger.NAMES[i]
+            red, blue = ledger.scores[i]  # One column per player, see Game.N_PLAYERS
             y = ys + i*h + h/2
             txtName = font.render(name, True, self.BONUS_SCORE_COLOR)
             txtRed = font.render(str(red), True, self.BONUS_SCORE_COLOR)
@@ -488,6 +538,6 @@ class DisplayManager:
             if blue >= red:
                 pygame.draw.circle(surf, Player.COLORS[1], [x2, y], (x2-x1)/16, 2)
 
-        if step > len(bonus_scores) and not mgr.gui.visible:
+        if step > len(ledger.NAMES) and not mgr.gui.visible:
             mgr.gui.set_menu("breakdown")
             mgr.gui.visible = True
\ No newline at end of file
@@ -0,0 +1,104 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import struct
+
+class FrameBuffer:
+    """Receive buffer splitting a TCP stream into length-prefixed frames.
+    Data is received in place (recv_into, or asyncio.BufferedProtocol),
+    partial frames are kept until the rest arrives and complete frames are
+    handed out as memoryviews of the buffer, without copying
+    """
+
+    HEADER = struct.Struct(">I")  # Length of the frame which follows
+    CAPACITY = 65536  # Initial size of the buffer in bytes
+    MAX_FRAME = 1 << 24  # Maximum length of a frame, longer ones mean the stream is corrupted
+
+    def __init__(self, capacity=CAPACITY):
+        """Initializes a FrameBuffer instance
+
+        Args:
+            capacity (int, optional): initial size of the buffer. Defaults to CAPACITY.
+        """
+
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.start = 0  # Position of the first unread byte
+        self.end = 0  # Position after the last received byte
+        self.pending = 0  # Size of the incomplete frame at start, header included, once known
+
+    def pack(msg):
+        """Prefixes a message with its length
+
+        Args:
+            msg (bytes): the message
+
+        Returns:
+            bytes: the frame
+        """
+        return FrameBuffer.HEADER.pack(len(msg)) + msg
+
+    def reserve(self, size):
+        """Moves the unread bytes to the front of the buffer, growing it if
+        it is smaller than size
+
+        Args:
+            size (int): minimum size of the buffer in bytes
+        """
+
+        unread = self.end - self.start
+        if size > len(self.buffer):
+            buffer = bytearray(max(size, 2*len(self.buffer)))
+            buffer[:unread] = self.view[self.start:self.end]
+            self.buffer, self.view = buffer, memoryview(buffer)
+        elif self.start != 0:
+            self.view[:unread] = self.view[self.start:self.end]
+        self.start, self.end = 0, unread
+
+    def get_buffer(self):
+        """Returns the free part of the buffer, where the next received bytes
+        go. Invalidates the frames handed out so far
+
+        Returns:
+            memoryview: writable view of the free space
+        """
+
+        if self.start == self.end:
+            self.start = self.end = 0
+        needed = max(self.pending, self.end - self.start + 1)
+        if self.start + needed > len(self.buffer):
+            self.reserve(needed)
+        return self.view[self.end:]
+
+    def advance(self, n):
+        """Marks bytes written in the view returned by get_buffer as received
+
+        Args:
+            n (int): number of bytes received
+        """
+        self.end += n
+
+    def frames(self):
+        """Yields the complete frames received so far. Each frame stays valid
+        until the next call to get_buffer
+
+        Raises:
+            ValueError: if a frame is longer than MAX_FRAME
+
+        Yields:
+            memoryview: content of a frame
+        """
+
+        header = self.HEADER.size
+        while self.end - self.start >= header:
+            length, = self.HEADER.unpack_from(self.buffer, self.start)
+            if length > self.MAX_FRAME:
+                raise ValueError(f"Frame of {length} bytes received, the stream is corrupted")
+
+            if self.end - self.start < header + length:
+                self.pending = header + length
+                return
+
+            self.start += header + length
+            yield self.view[self.start-length:self.start]
+        self.pending = 0
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import argparse
+import collections
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from bot import GreedyBot
+from game import Game
+from protocol import Protocol
+from simulation import Simulation
+
+class Endpoint:
+    """Stands for the Manager and the socket of a fuzzed device: keeps its
+    clock, collects the messages its game sends and passes on the ones it
+    receives like Manager.handle_message
+    """
+
+    def __init__(self, host):
+        """Initializes an Endpoint instance
+
+        Args:
+            host (bool): whether the device is the host
+        """
+
+        self.host = host
+        self.now = 0
+        self.quits = 0
+        self.outbox = []
+        self.socket_handler = self
+        self.game = None
+
+    def is_host(self):
+        """Returns whether the device is the host or not
+
+        Returns:
+            bool: True if host, False if guest
+        """
+        return self.host
+
+    def time(self):
+        """Returns the simulated time of the device
+
+        Returns:
+            float: time in seconds
+        """
+        return self.now
+
+    def quit_game(self):
+        """Counts the times the game gave up, which never happens in a sound match"""
+        self.quits += 1
+
+    def send(self, msg):
+        """Collects a message sent by the game
+
+        Args:
+            msg (bytes): the message
+        """
+        self.outbox.append(bytes(msg))
+
+    def receive(self, data):
+        """Passes a message of the other device on to the game
+
+        Args:
+            data (bytes): the message
+        """
+
+        game = self.game
+        type_ = data[0]
+        if type_ == Protocol.TURN_END_HOST:
+            game.receive(game.reconcile, data)
+        elif type_ == Protocol.KEYFRAME:
+            game.load_keyframe(memoryview(data)[1:])
+        elif type_ == Protocol.RESYNC:
+            game.resync()
+        elif type_ == Protocol.INPUT:
+            game.on_input(*Protocol.decode_input(data))
+
+class Peer(Game):
+    """One device of a fuzzed match, running the game's own code. Keeps a
+    snapshot of the start of every turn once it is final: right away on
+    the host and in lockstep mode, once the host answered on the guest
+    """
+
+    def __init__(self, host, seed, width, height, turns):
+        """Initializes a Peer instance
+
+        Args:
+            host (bool): whether this peer is the host (players[0]) or the guest (players[1])
+            seed (int): seed of the random number generator
+            width (int): width of the grid
+            height (int): height of the grid
+            turns (int): number of turns of the match
+        """
+
+        self.turns = turns
+        super().__init__(Endpoint(host), width=width, height=height)
+        self.manager.game = self
+        self.rng.seed(seed)
+        self.started = False
+        if host:
+            self.init_host()
+        else:
+            self.init_guest()
+
+    def reset(self):
+        """Resets the state before a new match"""
+
+        super().reset()
+        self.scheduler.turns = self.turns
+        self.states = {}  # Final snapshots at the start of the turns, by turn
+
+    def start_turn(self):
+        """Starts a new turn, keeping its snapshot when it is final"""
+
+        super().start_turn()
+        if self.is_host() or self.is_lockstep():
+            self.states[self.turn] = self.snapshot()
+
+    def settle(self):
+        """Keeps the guest's snapshot of its current turn once every
+        prediction is answered
+        """
+
+        if len(self.predictions) == 0 and len(self.host_messages) == 0 and self.turn_snapshot is not None:
+            self.states.setdefault(self.turn, self.turn_snapshot)
+
+class Fuzzer:
+    """Plays random matches between a host and a guest running the game's
+    code: scheduled turns, inputs sent with an input delay, the guest's
+    predictions and their reconciliation, keyframes and resyncs, or the
+    lockstep mode. Messages are the real encoded ones, delivered in order
+    after a random lag. Every turn both devices hold as final is compared
+    """
+
+    SIZES = [15, 16, 17, 31, 48]  # Grid widths and heights drawn for each match
+    DASH_CHANCE = 0.3  # Likelihood of a random input asking to dash
+    INPUT_CHANCE = 0.5  # Likelihood of a device giving an input during a frame
+    LOCKSTEP_CHANCE = 0.25  # Likelihood of a match being played in lockstep mode
+    MAX_DELAY = 3  # Maximum input delay in turns drawn for a match
+    MAX_LAG = 6  # Maximum number of frames a message takes to arrive
+    STALL_CHANCE = 0.02  # Likelihood of a frame stalling
+    MAX_STALL = 6  # Maximum duration of a stall, in turns
+    RESYNC_CHANCE = 0.2  # Likelihood of the guest asking for a resync during a match
+    CHUNKSIZE = 8  # Number of matches sent to a worker at once
+    PROGRESS_INTERVAL = 5  # Duration in seconds between two progress lines
+
+    def match_seed(seed, index):
+        """Derives the seed of a match from the run seed and the match index
+
+        Args:
+            seed (int): run seed
+            index (int): match index
+
+        Returns:
+            int: match seed
+        """
+        return int(np.random.SeedSequence([seed, index]).generate_state(1, np.uint64)[0])
+
+    def get_input(peer, player, rng, greedy):
+        """Draws a player's input
+
+        Args:
+            peer (Peer): peer controlling the player
+            player (Player): the player
+            rng (random.Random): random number generator of the inputs
+            greedy (float): likelihood of playing GreedyBot's move rather than a random one
+
+        Returns:
+            tuple[int, bool]: direction and whether to dash
+        """
+
+        if rng.random() < greedy:
+            return GreedyBot.play(peer, player, rng)
+        return (rng.randrange(4), rng.random() < Fuzzer.DASH_CHANCE)
+
+    def boards_equal(a, b):
+        """Returns whether two boards hold the same cells, comparing chunks
+        rather than whole grids
+
+        Args:
+            a (ChunkedBoard): first board
+            b (ChunkedBoard): second board
+
+        Returns:
+            bool: True if every cell is equal, False otherwise
+        """
+
+        for key in a.chunks.keys() | b.chunks.keys():
+            ca, cb = a.chunks.get(key), b.chunks.get(key)
+            if ca is None:
+                ca = a.fill
+            if cb is None:
+                cb = b.fill
+            if not np.all(ca == cb):
+                return False
+        return True
+
+    def compare(host, guest, full=False):
+        """Lists the differences between the host's and the guest's states
+
+        Args:
+            host (Peer): host peer
+            guest (Peer): guest peer
+            full (bool, optional): also recompute the guest's board hash from scratch. Defaults to False.
+
+        Returns:
+            list[str]: descriptions of the differences
+        """
+
+        diffs = []
+        w, h = host.WIDTH, host.HEIGHT
+        for name in ("trails", "drool", "bonuses"):
+            if not Fuzzer.boards_equal(getattr(host, name), getattr(guest, name)):
+                a = getattr(host, name).window(0, 0, w, h)
+                b = getattr(guest, name).window(0, 0, w, h)
+                ys, xs = np.nonzero(a != b)
+                diffs.append(f"{name} differ at {len(xs)} cells, first ({xs[0]}, {ys[0]}): {a[ys[0], xs[0]]} != {b[ys[0], xs[0]]}")
+
+        for hp, gp in zip(host.players, guest.players):
+            a = (hp.x, hp.y, hp.nx, hp.ny, hp.dir, hp.dashscore)
+            b = (gp.x, gp.y, gp.nx, gp.ny, gp.dir, gp.dashscore)
+            if a != b:
+                diffs.append(f"player {hp.i} (x, y, nx, ny, dir, dashscore) differs: {a} != {b}")
+
+        if not np.array_equal(host.ledger.scores, guest.ledger.scores):
+            diffs.append(f"scores differ: {host.ledger.scores.tolist()} != {guest.ledger.scores.tolist()}")
+        if host.bonus_count != guest.bonus_count:
+            diffs.append(f"bonus_count differs: {host.bonus_count} != {guest.bonus_count}")
+        # Collision start times are each device's own clock, only positions are synced
+        if list(host.collide_pos) != list(guest.collide_pos):
+            diffs.append("collision differs")
+        if full and guest.board_hash != guest.compute_board_hash():
+            diffs.append("guest's incremental board hash differs from its recomputation")
+        if host.get_hash() != guest.get_hash():
+            diffs.append(f"hashes differ: {host.get_hash():016x} != {guest.get_hash():016x}")
+        return diffs
+
+    def compare_states(host, guest, scratch):
+        """Compares the turns both peers hold as final, then forgets them and
+        the earlier ones
+
+        Args:
+            host (Peer): host peer
+            guest (Peer): guest peer
+            scratch (tuple[Simulation, Simulation]): simulations the snapshots are restored into
+
+        Returns:
+            tuple[int, list[str]]: last turn compared, or the first one which
+                differs, and the differences. None and [] if no turn was compared
+        """
+
+        common = sorted(host.states.keys() & guest.states.keys())
+        for turn in common:
+            a, b = scratch
+            a.restore(host.states[turn])
+            b.restore(guest.states[turn])
+            diffs = Fuzzer.compare(a, b, full=True)
+            if len(diffs) != 0:
+                return turn, diffs
+        if len(common) == 0:
+            return None, []
+
+        for states in (host.states, guest.states):
+            for turn in [turn for turn in states if turn <= common[-1]]:
+                del states[turn]
+        return common[-1], []
+
+    def play_match(args):
+        """Plays a fuzzed match until its end or its first difference.
+        Runs in a worker process
+
+        Args:
+            args (tuple): match index, run seed, number of turns
+
+        Returns:
+            dict: match index and seed, settings, number of turns played,
+                bytes sent, and the description of the first difference
+                (None if there was none)
+        """
+
+        index, seed, turns = args
+        seed = Fuzzer.match_seed(seed, index)
+        rng = random.Random(seed)
+        width, height = rng.choice(Fuzzer.SIZES), rng.choice(Fuzzer.SIZES)
+        greedy = rng.random()
+        lockstep = rng.random() < Fuzzer.LOCKSTEP_CHANCE
+        # Lockstep needs a delay, see Manager.on_hello
+        delay = rng.randint(1 if lockstep else 0, Fuzzer.MAX_DELAY)
+        lag = rng.randint(0, Fuzzer.MAX_LAG)
+        resync_turn = rng.randrange(turns) if not lockstep and rng.random() < Fuzzer.RESYNC_CHANCE else None
+
+        host = Peer(True, seed, width, height, turns)
+        guest = Peer(False, seed if lockstep else seed+1, width, height, turns)
+        peers = (host, guest)
+        starts = [rng.uniform(0, 2*Simulation.TIMER) for _ in peers]
+        inboxes = [collections.deque(), collections.deque()]  # (frame, message) on their way to each peer
+        for peer in peers:
+            peer.capabilities = Protocol.CAPABILITIES | (Protocol.LOCKSTEP if lockstep else 0)
+            peer.input_delay = delay
+        scratch = (Simulation(width=width, height=height), Simulation(width=width, height=height))
+        result = {
+            "index": index, "seed": seed, "size": [width, height], "mode": "lockstep" if lockstep else "classic",
+            "delay": delay, "lag": lag, "turns": 0, "bytes": 0, "error": None
+        }
+
+        now = 0
+        resyncs = 0
+        compared = -1
+        max_frames = turns * (2*Fuzzer.MAX_LAG + 4) + 100
+        for frame in range(max_frames):
+            now += rng.uniform(0.5, 1.5) * Simulation.TIMER
+            if rng.random() < Fuzzer.STALL_CHANCE:
+                now += rng.randint(1, Fuzzer.MAX_STALL) * Simulation.TIMER
+
+            for i, peer in enumerate(peers):
+                endpoint = peer.manager
+                endpoint.now = now
+                while len(inboxes[i]) != 0 and inboxes[i][0][0] <= frame:
+                    endpoint.receive(inboxes[i].popleft()[1])
+
+                if not peer.started and now >= starts[i]:
+                    peer.started = True
+                    endpoint.now = starts[i]
+                    peer.start()
+                    endpoint.now = now
+                if peer.started and not peer.is_over():
+                    if rng.random() < Fuzzer.INPUT_CHANCE:
+                        peer.give_input(*Fuzzer.get_input(peer, peer.player, rng, greedy))
+                    peer.loop()
+
+                if peer is guest and resync_turn is not None and guest.turn >= resync_turn and not guest.resyncing:
+                    # Goes through the host's full keyframes, as after a desync
+                    resync_turn = None
+                    resyncs += 1
+                    guest.resyncing = True
+                    endpoint.send(bytes([Protocol.RESYNC]))
+
+                # Messages keep their order, like on the real transports, and
+                # the ones sent together, such as a resync's keyframes, arrive together
+                other = inboxes[1-i]
+                arrival = max(frame + rng.randint(0, lag), other[-1][0] if len(other) != 0 else 0)
+                for msg in endpoint.outbox:
+                    other.append((arrival, msg))
+                    result["bytes"] += len(msg)
+                    if peer is guest and msg[0] == Protocol.RESYNC:
+                        resyncs -= 1
+                endpoint.outbox.clear()
+
+            if not lockstep:
+                guest.settle()
+            turn, diffs = Fuzzer.compare_states(host, guest, scratch)
+            if turn is not None and len(diffs) == 0:
+                compared = turn
+            if resyncs < 0:
+                diffs.append("guest's hash differs from the host's answer")
+            if host.manager.quits + guest.manager.quits != 0:
+                diffs.append("the game went out of sync")
+            result["turns"] = min(host.turn, guest.turn)
+            if len(diffs) != 0:
+                result["error"] = f"turn {result['turns'] if turn is None else turn}: " + "; ".join(diffs)
+                return result
+            if host.is_over() and guest.is_over():
+                break
+
+        if not (host.is_over() and guest.is_over()):
+            result["error"] = f"turn {result['turns']}: the match did not end"
+        elif compared != turns:
+            result["error"] = f"turn {result['turns']}: the last turn was not compared"
+        return result
+
+    def run(n_matches, seed, turns, workers, start=0):
+        """Plays fuzzed matches on a process pool and prints the differences
+        as they are found
+
+        Args:
+            n_matches (int): number of matches
+            seed (int): run seed
+            turns (int): number of turns per match
+            workers (int): number of worker processes
+            start (int, optional): index of the first match. Defaults to 0.
+
+        Returns:
+            int: number of matches which ended with a difference
+        """
+
+        tasks = ((i, seed, turns) for i in range(start, start+n_matches))
+        done = total_turns = total_bytes = failures = 0
+        begin = last = time.perf_counter()
+        with multiprocessing.Pool(workers) as pool:
+            for result in pool.imap_unordered(Fuzzer.play_match, tasks, Fuzzer.CHUNKSIZE):
+                done += 1
+                total_turns += result["turns"]
+                total_bytes += result["bytes"]
+                if result["error"] is not None:
+                    failures += 1
+                    print(f"match {result['index']} (seed {result['seed']}, size {result['size']}, {result['mode']}, delay {result['delay']}, lag {result['lag']}): {result['error']}")
+
+                now = time.perf_counter()
+                if now - last >= Fuzzer.PROGRESS_INTERVAL:
+                    last = now
+                    rate = total_turns / (now - begin)
+                    print(f"{done}/{n_matches} matches, {total_turns} turns ({rate:.0f} turns/s), {failures} failures", file=sys.stderr)
+
+        print(f"{done} matches, {total_turns} turns, {failures} failures, {total_bytes / max(total_turns, 1):.1f} bytes per turn")
+        return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks that the host's and the guest's states never diverge on random matches")
+    parser.add_argument("--matches", type=int, default=1000, help="number of matches")
+    parser.add_argument("--turns", type=int, default=round(Simulation.DURATION / Simulation.TIMER), help="turns per match")
+    parser.add_argument("--seed", type=int, default=0, help="run seed")
+    parser.add_argument("--start", type=int, default=0, help="index of the first match, to replay a failure")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    args = parser.parse_args()
+
+    if Fuzzer.run(args.matches, args.seed, args.turns, args.workers, args.start) != 0:
+        sys.exit(1)
@@ -1,58 +1,61 @@
 #Snaildash is a small game created in the scope of a school project
 #Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
 
-from math import ceil, floor
-from random import randint
-import struct
+import collections
 
-import numpy as np
 import pygame
 
-from bonus import Bonus, Bomb, Row, Column, MagicalPotion
-from player import Player
+from prediction import Prediction
+from protocol import Protocol
+from simulation import Simulation
+from turn_scheduler import TurnScheduler
 
-class Game:
-    """Main class managing the game's state"""
-
-    WIDTH = 15  # Width of the grid
-    HEIGHT = 15  # Height of the grid
-    TIMER = 0.25  # Duration in seconds of a turn
-    DURATION = 89  # Duration in seconds of the whole game
-    COLLIDE_DURATION = 1  # Duration in seconds of the collision animation
-    COLLIDE_RADIUS = 4  # Radius in number of tiles of the collision shockwave
+class Game(Simulation):
+    """Main class managing the game's state. Adapts the headless Simulation
+    to the manager's clock, the keyboard and the network. Turns are committed
+    on a fixed schedule, and inputs sent over the network apply input_delay
+    turns later so that they arrive in time. The guest plays its turns ahead
+    of the host's answers and corrects them once they arrive. In lockstep
+    mode, both devices resolve every turn from the two inputs
+    """
+    
+    N_PLAYERS = 2  # One player per device: the network, the inputs and the display only handle two
+    MAX_PREDICTED = 8  # Maximum number of turns the guest plays ahead of the host's answers
+    INPUT_DELAY = 1  # Default number of turns between an input sent over the network and the turn it applies to
     
-    def __init__(self, manager):
-        """Initializes a Game instance
+    def __init__(self, manager, width=None, height=None):
+        """Initializes a Game instance. Unlike Simulation, a game always has
+        N_PLAYERS players
 
         Args:
             manager (Manager): manager instance
+            width (int, optional): width of the grid. Defaults to WIDTH.
+            height (int, optional): height of the grid. Defaults to HEIGHT.
         """
         
         self.manager = manager
-        self.players = [
-            Player(self, 0, 0, 0),
-            Player(self, 1, self.WIDTH-1, self.HEIGHT-1)
-        ]
-        self.player = self.players[0]
-        self.bonus_list = [Bomb, Row, Column, MagicalPotion]
-        self.reset()
+        self.opponent = None
+        self.input_delay = self.INPUT_DELAY  # Agreed with the other device in the hello
+        super().__init__(n_players=self.N_PLAYERS, width=width, height=height)
     
     def reset(self):
         """Resets the state and different values before a new game"""
 
-        self.trails = np.full([self.HEIGHT, self.WIDTH], -1, dtype="int8")
-        self.players[0].reset(0, 0)
-        self.players[1].reset(self.WIDTH-1, self.HEIGHT-1)
-        
-        self.collide_start = 0
-        self.collide_pos = [0,0]
-        self.trail_changes = []
+        super().reset()
         self.remaining = self.TIMER
         self.start_time = 0
         self.turn_start = 0
-
-        self.drool = np.full([self.HEIGHT, self.WIDTH], -1, dtype="int8")
-        self.bonus_dict = {}
+        self.resyncing = False
+        self.scheduler = TurnScheduler(self.TIMER, round(self.DURATION / self.TIMER))
+        self.predictions = collections.deque()  # Turns sent to the host and not answered yet, oldest first
+        self.host_messages = collections.deque()  # Host's (change, args) waiting for the guest to play the turns they follow, oldest first
+        self.turn_snapshot = None  # State at the start of the current turn, on the guest
+        self.input = None  # (direction, dash) given during the current turn, if any
+        self.local_inputs = collections.deque()  # Local player's inputs for the current and next turns
+        self.remote_inputs = collections.deque()  # Opponent's (turn, input, state hash) for the next turns
+        self.received = 0  # Number of inputs received from the opponent
+        self.late_input = Protocol.NO_INPUT  # Guest's last input which missed its turn, on the host
+        self.turn_hashes = {}  # Low 16 bits of the state hash at the start of the recent turns, in lockstep mode
     
     def is_host(self):
         """Returns whether this instance is the host or not
@@ -62,6 +65,44 @@ class Game:
         """
         return self.manager.is_host()
     
+    def is_lockstep(self):
+        """Returns whether the devices only exchange their inputs
+
+        Returns:
+            bool: True in lockstep mode
+        """
+        return self.capabilities & Protocol.LOCKSTEP != 0
+    
+    def get_input_delay(self):
+        """Returns the number of turns between a local input and the turn it
+        applies to. The host's inputs only travel in its answers, which are
+        sent once the turn is resolved
+
+        Returns:
+            int: number of turns
+        """
+
+        if self.is_host() and not self.is_lockstep():
+            return 0
+        return self.input_delay
+    
+    def is_over(self):
+        """Returns whether every turn was played and, on the guest, answered
+        by the host, so that the final scores are the same on both devices
+
+        Returns:
+            bool: True once the game is over
+        """
+        return self.scheduler.committed == self.scheduler.turns and len(self.predictions) == 0
+    
+    def time(self):
+        """Returns the relative time since game start
+
+        Returns:
+            float: time in seconds
+        """
+        return self.manager.time()
+    
     def init_host(self):
         """Initializes the game as the host"""
         self.player = self.players[0]
@@ -70,27 +111,28 @@ class Game:
         """Initializes the game as the guest"""
         self.player = self.players[1]
     
-    def get_trail_count(self):
-        """Returns the number of cells covered in drool for each player
+    def start(self):
+        """Starts the first turn and the turn schedule"""
 
-        Returns:
-            tuple[int, int]: counts for (red, blue)
-        """
-        return (np.count_nonzero(self.trails == 0) + np.count_nonzero(self.trails == 2), \
-        np.count_nonzero(self.trails == 1) + np.count_nonzero(self.trails == 3))
+        self.start_time = self.time()
+        self.scheduler.start(self.start_time)
+        # Nothing was given for the first turns
+        self.local_inputs.extend([Protocol.NO_INPUT] * self.get_input_delay())
+        self.start_turn()
     
     def start_turn(self):
         """Starts a new turn"""
 
-        self.turn_start = self.manager.time()
-        self.player.synced = False
-        self.trail_changes = []
-        for player in self.players:
-            player.lx, player.ly = player.x, player.y
-            player.x, player.y = player.nx, player.ny
-            player.dir %= 4
-            player.dash = False
-            player.reinforced = max(player.reinforced-1, 0)
+        self.turn_start = self.scheduler.get_turn_start()
+        self.input = None
+        super().start_turn()
+        if self.is_lockstep():
+            self.turn_hashes[self.turn] = self.get_hash() & Protocol.HASH_MASK
+            self.turn_hashes.pop(self.turn - self.input_delay - 1, None)
+        elif not self.is_host():
+            self.turn_snapshot = self.snapshot()
+        if self.opponent is not None:
+            self.opponent.start_turn()
     
     def handle_key(self, event):
         """Handles a pygame.KEYDOWN event
@@ -111,248 +153,317 @@ class Game:
         
         elif event.key == pygame.K_d or event.key == pygame.K_RIGHT:
             ndir = 0
-        if ((event.mod & pygame.KMOD_LSHIFT or event.key == pygame.K_SPACE) and self.player.candash()) or self.player.dash:
-            if not self.player.dash:
-                self.player.dash = True
-                self.player.usedash()
-            ndir += 4
-        self.player.dir = ndir
+        dash = bool(event.mod & pygame.KMOD_LSHIFT or event.key == pygame.K_SPACE)
+        self.give_input(ndir, dash)
+    
+    def give_input(self, dir_, dash=False):
+        """Records the local player's input for the current turn. It applies
+        right away, unless it waits for the input delay
+
+        Args:
+            dir_ (int): direction (0, 1, 2, 3 -> right, down, left, up)
+            dash (bool, optional): whether the player wants to dash. Defaults to False.
+        """
+
+        if self.input is not None:
+            dash = dash or self.input[1]
+        self.input = (dir_, dash)
+        if self.get_input_delay() == 0:
+            self.set_input(self.player, dir_, dash)
+    
+    def apply_input(self, player, input_):
+        """Gives a player an input
+
+        Args:
+            player (Player): the player
+            input_ (int): direction, plus 4 when dashing, or Protocol.NO_INPUT
+        """
+
+        if input_ != Protocol.NO_INPUT:
+            self.set_input(player, input_ % 4, input_ > 3)
+    
+    def loop(self):
+        """Main game loop (executed on every frame). Ends the turns which are due"""
+
+        now = self.time()
+        for _ in range(self.scheduler.get_due(now)):
+            if not self.end_turn():
+                break
+        self.remaining = self.turn_start+self.TIMER - now
     
     def end_turn(self):
-        """Finalizes the current turn"""
-
-        if self.manager.is_host():
-            for player in self.players:
-                player.synced = False
-                dx, dy = Player.OFFSETS[player.dir]
-                x, y = player.x, player.y
-                x2, y2 = x+dx, y+dy
-                x2 = max(0, min(self.WIDTH-1, x2))
-                y2 = max(0, min(self.HEIGHT-1, y2))
-                
-                player.nx, player.ny = x2, y2
-                if player.dir > 3:
-                    player.dashed_count += 1
-                    dx, dy = Player.OFFSETS[player.dir%4]
-                    for i in range(Player.DASH_SIZE):
-                        tx, ty = x+dx*i, y+dy*i
-                        if 0 <= tx < self.WIDTH and 0 <= ty < self.HEIGHT:
-                            t = player.i
-                            if player.reinforced > 0:
-                                t += 2
-                            self.set_trail(tx, ty, t)
-                else:
-                    t = player.i
-                    if player.reinforced > 0:
-                        t += 2
-                    self.set_trail(x, y, t)
-            
-            self.check_collsion()
-            
-            for player in self.players:
-                if self.trails[player.ny, player.nx] == player.i or self.trails[player.ny, player.nx] == player.i+2:
-                    player.add_dashscore()
-                pos = (player.nx, player.ny)
-                if pos in self.bonus_dict:
-                    self.bonus_list[self.bonus_dict[pos]].apply(*pos, self, player)
-                    self.bonus_dict.pop(pos)
-            for x, y, i in self.trail_changes:
-                self.trails[y, x] = -1 if i == 255 else i
-                self.drool[y, x] = randint(0,15)
-            
-            Bonus.try_spawn(self)
+        """Ends the current turn and starts the next one
+
+        Returns:
+            bool: False if the turn waits for the other device
+        """
+
+        if self.is_lockstep():
+            remote = self.take_remote_input()
+            if remote is None:
+                # A missing input can't be replaced without the devices diverging
+                return False
+            input_, state_hash = remote
+            if state_hash is not None and state_hash != self.turn_hashes[self.turn - self.input_delay]:
+                # Both devices own the whole state, there is nothing to resync from
+                self.manager.quit_game()
+                return False
+
+            self.send_input()
+            self.apply_input(self.player, self.local_inputs.popleft())
+            # The opponent, as games have N_PLAYERS = 2 players
+            self.apply_input(self.players[1 - self.player.i], input_)
+            super().end_turn()
 
+        elif self.is_host():
+            if self.opponent is not None:
+                # The local AI answers where the guest's input would arrive
+                self.opponent.play()
+            else:
+                self.apply_input(self.players[1 - self.player.i], self.take_guest_input())
+            super().end_turn()
             self.send_sync()
-            pygame.event.post(pygame.event.Event(pygame.USEREVENT))
-            
+
         else:
-            self.send_sync()
-            
-    def check_collsion(self):
-        """Checks the movements of each player to process collisions"""
-
-        p1, p2 = self.players
-        if p1.dir <=3:
-            if p2.dir <=3:
-                if (p1.nx == p2.nx and p1.ny == p2.ny) or (p1.x == p2.nx and p1.y == p2.ny and p2.x == p1.nx and p2.y == p1.ny):
-                    center = (p1.nx, p1.ny) if p1.nx == p2.nx else ((p1.x + p2.y)/2, (p1.y + p2.y)/2)
-                    p1.nx, p1.ny = p1.x, p1.y
-                    p2.nx, p2.ny = p2.x, p2.y
-                    self.collide(center)
-            else:
-                dx, dy = Player.OFFSETS[p2.dir%4]
-                p2_cells = [ (p2.x + dx*i, p2.y + dy*i) for i in range(1, Player.DASH_SIZE+1)]
-                if (p1.nx, p1.ny) in p2_cells:
-                    center = (p1.nx, p1.ny)
-                    p2.nx, p2.ny = p1.nx - dx, p1.ny - dy
-                    p1.nx, p1.ny = p1.x, p1.y
-                    self.collide(center)
-                for cell in p2_cells:
-                    if cell in self.bonus_dict:
-                        self.bonus_list[self.bonus_dict[cell]].apply(*cell, self, p2)
-                        self.bonus_dict.pop(cell)
+            if len(self.predictions) >= self.MAX_PREDICTED:
+                return False  # Too far ahead of the host, wait for its answers
+            self.send_input()
+            self.predict_turn(self.local_inputs.popleft())
+
+        self.scheduler.commit()
+        self.start_turn()
+        self.apply_host_messages()
+        return True
+
+    def send_input(self):
+        """Queues the input given during the current turn for the turn
+        input_delay later, and sends it to the other device
+        """
+
+        input_ = Protocol.NO_INPUT
+        if self.input is not None:
+            input_ = self.input[0] + 4*self.input[1]
+        self.local_inputs.append(input_)
+
+        state_hash = None
+        if self.is_lockstep() and self.capabilities & Protocol.HASH:
+            state_hash = self.turn_hashes[self.turn]
+        self.manager.socket_handler.send(Protocol.encode_input(input_, state_hash))
+
+    def on_input(self, input_, state_hash=None):
+        """Stores the opponent's input. The n-th one applies to the turn
+        n + input_delay
+
+        Args:
+            input_ (int): direction, plus 4 when dashing, or Protocol.NO_INPUT
+            state_hash (int, optional): low 16 bits of the opponent's state hash, input_delay turns before. Defaults to None.
+        """
+
+        turn = self.received + self.input_delay
+        self.received += 1
+        if turn < self.turn:
+            # Its turn was already played, the direction is kept for the next one
+            if input_ != Protocol.NO_INPUT:
+                self.late_input = input_ % 4
+            return
+        self.remote_inputs.append((turn, input_, state_hash))
+
+    def take_remote_input(self):
+        """Removes the opponent's input for the current turn
+
+        Returns:
+            tuple[int, int]: input and state hash (None if not sent), None if
+                the input did not arrive yet
+        """
+
+        if self.turn < self.input_delay:
+            return Protocol.NO_INPUT, None  # Nothing was sent for the first turns
+        if len(self.remote_inputs) == 0 or self.remote_inputs[0][0] != self.turn:
+            return None
+        return self.remote_inputs.popleft()[1:]
+
+    def take_guest_input(self):
+        """Returns the guest's input for the current turn, on the host. When
+        it is late, the guest keeps the direction of its last late input,
+        without dashing
+
+        Returns:
+            int: direction, plus 4 when dashing, or Protocol.NO_INPUT
+        """
+
+        remote = self.take_remote_input()
+        input_ = Protocol.NO_INPUT if remote is None else remote[0]
+        if input_ == Protocol.NO_INPUT:
+            input_ = self.late_input
+        self.late_input = Protocol.NO_INPUT
+        return input_
+
+    def predict_turn(self, input_):
+        """Resolves the guest's turn right away with the host's rules,
+        instead of waiting a round-trip for the answer
+
+        Args:
+            input_ (int): guest's input for the turn
+        """
+
+        prediction = Prediction(self.turn_snapshot, input_)
+        self.predictions.append(prediction)
+        self.resolve(prediction)
+
+    def resolve(self, prediction):
+        """Plays a predicted turn. The guest's input is the one sent, the
+        host's player is assumed to keep its direction without dashing
+
+        Args:
+            prediction (Prediction): the turn, filled with the predicted results
+        """
+
+        scores = self.ledger.scores[self.SYNCED_SCORES]
+        collision = (self.collide_start, *self.collide_pos)
+        self.apply_input(self.player, prediction.input)
+        # Random draws are left to the host
+        super().end_turn(spawn=False)
+
+        prediction.starts = [(p.x, p.y) for p in self.players]
+        prediction.players = [(p.nx, p.ny, p.dir, p.dashscore) for p in self.players]
+        prediction.state_hash = self.get_hash() & Protocol.HASH_MASK
+        prediction.score_changes = self.ledger.scores[self.SYNCED_SCORES] - scores
+        if (self.collide_start, *self.collide_pos) != collision:
+            prediction.collision = tuple(self.collide_pos)
         else:
-            if p2.dir <=3:
-                dx, dy = Player.OFFSETS[p1.dir%4]
-                p1_cells = [(p1.x + dx*i, p1.y + dy*i) for i in range(1, Player.DASH_SIZE+1)]
-                if (p2.nx, p2.ny) in p1_cells:
-                    center = (p2.nx, p2.ny)
-                    p1.nx, p1.ny = p2.nx - dx, p2.ny - dy
-                    p2.nx, p2.ny = p2.x, p2.y
-                    self.collide(center)
-                for cell in p1_cells:
-                    if cell in self.bonus_dict:
-                        self.bonus_list[self.bonus_dict[cell]].apply(*cell, self, p1)
-                        self.bonus_dict.pop(cell)
-            else:
-                #double dash
-                dx_1, dy_1 = Player.OFFSETS[p1.dir%4]
-                dx_2, dy_2 = Player.OFFSETS[p2.dir%4]
-                for i in range(1, Player.DASH_SIZE):
-                    cx1, cy1 = p1.x + dx_1*i, p1.y + dy_1*i
-                    cx2, cy2 = p2.x + dx_2*i, p2.y + dy_2*i
-                    if (cx1, cy1) in self.bonus_dict:
-                        self.bonus_list[self.bonus_dict[(cx1, cy1)]].apply(cx1, cy1, self, p1)
-                        self.bonus_dict.pop((cx1, cy1))
-                    if (cx2, cy2) in self.bonus_dict:
-                        self.bonus_list[self.bonus_dict[(cx2, cy2)]].apply(cx2, cy2, self, p2)
-                        self.bonus_dict.pop((cx2, cy2))
-                    if (cx1, cy1) == (cx2, cy2):
-                        center = (cx1, cy1)
-                        p1.nx, p1.ny = cx1 -dx_1, cy1 -dy_1
-                        p2.nx, p2.ny = cx2 -dx_2, cy2 -dy_2
-                        self.collide(center)
-                        break
-        
-    def collide(self, center):
-        """Process a collision
+            prediction.collision = None
+
+    def replay(self):
+        """Plays the predicted turns again on top of the state at the start
+        of the oldest one, then gives the current turn its input back
+        """
+
+        for prediction in self.predictions:
+            prediction.snapshot = self.snapshot()
+            self.resolve(prediction)
+            super().start_turn()
+        self.turn_snapshot = self.snapshot()
+        if self.input is not None and self.get_input_delay() == 0:
+            self.set_input(self.player, *self.input)
+
+    def reconcile(self, data):
+        """Applies the host's answer to the oldest predicted turn. The turns
+        played since are only rolled back and replayed if the answer differs
+        from the prediction
 
         Args:
-            center (tuple[int, int]): position in tiles of the collision's center
+            data (bytes): host's end of turn message
         """
 
-        for p in self.players:
-            if not (p.dir == 0 and p.x == self.WIDTH-1) and not (p.dir == 1 and p.y == self.HEIGHT-1) and not (p.dir == 2 and p.x == 0) and not (p.dir == 3 and p.y== 0):
-                p.dir = (p.dir%4+2)%4
-        
-        ox, oy = center
-        
-        self.collide_start = self.manager.time()
-        self.collide_pos = [int(ox), int(oy)]
-        
-        x1, y1 = floor(ox-2), floor(oy-2)
-        x2, y2 = ceil(ox+2), ceil(oy+2)
-        
-        x1, x2 = max(0, min(self.WIDTH-1, x1)), max(0, min(self.WIDTH-1, x2))
-        y1, y2 = max(0, min(self.HEIGHT-1, y1)), max(0, min(self.HEIGHT-1, y2))
-        for y in range(y1, y2+1):
-            for x in range(x1, x2+1):
-                self.set_trail(x,y,255)
+        prediction = self.predictions.popleft()
+        # Positions are decoded relative to the start of the answered turn
+        info = self.decode_sync(data, prediction.starts)
+        if prediction.matches(info):
+            return
 
-    def loop(self):
-        """Main game loop (executed on every frame)"""
+        self.restore(prediction.snapshot)
+        self.sync(**info)
+        self.turn += 1
+        super().start_turn()
+        self.replay()
 
-        self.remaining = self.turn_start+self.TIMER - self.manager.time()
-        
-        if self.remaining <= 0:
-            if not self.player.synced:
-                if not self.manager.is_host():
-                    self.player.synced = True
-                    self.end_turn()
+    def receive(self, function, *args):
+        """Applies a message of the host once the guest has played the turns
+        it follows. Messages keep their order, so a keyframe sent after the
+        answer to a turn is loaded after that answer
+
+        Args:
+            function (callable): reconcile, or the change applied by rebase
+            *args: its arguments
+        """
+
+        self.host_messages.append((function, args))
+        self.apply_host_messages()
+
+    def apply_host_messages(self):
+        """Applies the host's messages in order, up to the first answer to a
+        turn the guest has not played yet: the host's schedule can be ahead
+        """
+
+        while len(self.host_messages) != 0:
+            function, args = self.host_messages[0]
+            if function == self.reconcile and len(self.predictions) == 0:
+                return
+            self.host_messages.popleft()
+            function(*args)
+
+    def rebase(self, function, *args):
+        """Applies a change of the host's state under the predicted turns:
+        to the start of the oldest one, which the host has reached too
+
+        Args:
+            function (callable): the change
+            *args: its arguments
+        """
+
+        if len(self.predictions) != 0:
+            self.restore(self.predictions[0].snapshot)
+        else:
+            self.restore(self.turn_snapshot)
+        function(*args)
+        self.replay()
+
+    def load_keyframe(self, data):
+        """Loads a keyframe sent by the host, under the predicted turns
+
+        Args:
+            data (bytes): keyframe made by get_keyframes
+        """
+        self.receive(self.rebase, super().load_keyframe, data)
     
-    def sync(self, x1, y1, d1, ds1, x2, y2, d2, ds2, trails=None, bonus_dict=None, col_start=0, col_x=0, col_y=0):
+    def sync(self, players, trails=None, bonuses=None, col_start=None, col_x=None, col_y=None, score_changes=None, state_hash=None):
         """Process synchronization info received from the other device
 
         Args:
-            x1 (int): x position of player 1
-            y1 (int): y position of player 1
-            d1 (int): direction of player 1
-            ds1 (int): dashscore of player 1
-            x2 (int): x position of player 2
-            y2 (int): y position of player 2
-            d2 (int): direction of player 2
-            ds2 (int): dashscore of player 2
-            trails (list[tuple[int, int, int]], optional): list of trail changes. Defaults to None.
-            bonus_dict (dict[tuple[int, int], int], optional): dictionary of placed bonuses. Defaults to None.
-            col_start (float, optional): start time of collision. Defaults to 0.
-            col_x (int, optional): x position of the collision. Defaults to 0.
-            col_y (int, optional): y position of the collision. Defaults to 0.
+            players (list[tuple[int, int, int, int]]): (x, y, direction, dashscore) of each player
+            trails (np.ndarray, optional): (n, 3) array of trail changes. Defaults to None.
+            bonuses (np.ndarray, optional): (n, 3) array of bonus changes. Defaults to None.
+            col_start (float, optional): start time of a new collision. Defaults to None.
+            col_x (int, optional): x position of the new collision. Defaults to None.
+            col_y (int, optional): y position of the new collision. Defaults to None.
+            score_changes (np.ndarray, optional): changes of the host's synced scores. Defaults to None.
+            state_hash (int, optional): low 16 bits (Protocol.HASH_MASK) of the host's state hash after the turn. Defaults to None.
         """
         
-        if self.player.i == 1 or not self.manager.is_host():
-            self.players[0].lx = self.players[0].x
-            self.players[0].ly = self.players[0].y
-            self.players[0].nx = x1
-            self.players[0].ny = y1
-            self.players[0].dir = d1
-            self.players[0].dashscore = ds1
+        self.apply_sync(players, trails, bonuses, col_start, col_x, col_y, score_changes)
         
-        if self.player.i == 0 or not self.manager.is_host():
-            self.players[1].lx = self.players[1].x
-            self.players[1].ly = self.players[1].y
-            self.players[1].nx = x2
-            self.players[1].ny = y2
-            self.players[1].dir = d2
-            self.players[1].dashscore = ds2
-        
-        if trails is not None:
-            for x, y, i in trails:
-                self.trails[y, x] = -1 if i == 255 else i
-                self.drool[y, x] = randint(0,15)
-                
-            self.bonus_dict = bonus_dict
-            self.collide_start = col_start
-            self.collide_pos = [col_x, col_y]
-                
-    def send_sync(self):
-        """Sends synchronization info to the other device"""
+        if state_hash is not None and not self.resyncing and state_hash != self.get_hash() & Protocol.HASH_MASK:
+            self.resyncing = True
+            self.manager.socket_handler.send(bytes([Protocol.RESYNC]))
+    
+    def resync(self):
+        """Handles a resync message. The host answers a guest's request with
+        keyframes of the whole board, the guest clears its board to receive them
+        """
         
-        x1 = self.players[0].nx
-        y1 = self.players[0].ny
-        d1 = self.players[0].dir
-        ds1 = self.players[0].dashscore
-        x2 = self.players[1].nx
-        y2 = self.players[1].ny
-        d2 = self.players[1].dir
-        ds2 = self.players[1].dashscore
+        if self.is_host():
+            self.manager.socket_handler.send(bytes([Protocol.RESYNC]))
+            for keyframe in self.get_keyframes(full=True):
+                self.manager.socket_handler.send(bytes([Protocol.KEYFRAME]) + keyframe)
         
-        if self.manager.is_host():
-            msg = b"turnEndHost" + struct.pack(">BBBBBBBBBB", x1,y1,d1,ds1,x2,y2,d2,ds2,len(self.trail_changes),len(self.bonus_dict))
-            for x, y, i in self.trail_changes:
-                msg += struct.pack(">BBB", x,y,i)
-            
-            for (x, y), i in self.bonus_dict.items():
-                msg += struct.pack(">BBB", x,y,i)
-            
-            msg += struct.pack(">dBB", self.collide_start, self.collide_pos[0], self.collide_pos[1])
-            bonus_scores = self.manager.get_bonus_scores()
-            msg += struct.pack(">B", len(bonus_scores))
-            for n, r, b in bonus_scores:
-                msg += struct.pack(">II", r, b)
-            
         else:
-            msg = b"turnEnd" + struct.pack(">BBBBBBBB", x1,y1,d1,ds1,x2,y2,d2,ds2)
-        
-        self.manager.socket_handler.send(msg)
-    
-    def set_trail(self, x, y, i):
-        """Sets the drool at a given position
+            self.receive(self.rebase, self.restart_sync)
 
-        Args:
-            x (int): x coordinate
-            y (int): y coordinate
-            i (int): drool id (0:red, 1:blue, 2:reinf. red, 3:reinf. blue, -1/255:none)
+    def restart_sync(self):
+        """Clears the boards before the host's full keyframes load, and lets
+        the guest request a resync again
         """
+
+        self.clear_boards()
+        self.resyncing = False
+                
+    def send_sync(self):
+        """Sends synchronization info to the other device"""
         
-        if i != -1 and i != 255:
-            cur = self.trails[y,x]
-            if i == cur: return
-            if i%2 == cur%2:
-                if i < cur: return
-            elif cur > 1:
-                i = cur-2
-        
-        if i > 1 and i != 255:
-            self.players[i%2].reinforced_placed += 1
-        
-        self.trail_changes.append((x,y,i))
+        if self.opponent is not None:
+            return
+        self.manager.socket_handler.send(self.encode_sync())
+
+        if self.is_host() and self.capabilities & Protocol.KEYFRAMES and self.turn % self.KEYFRAME_INTERVAL == 0:
+            for keyframe in self.get_keyframes():
+                self.manager.socket_handler.send(bytes([Protocol.KEYFRAME]) + keyframe)
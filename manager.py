@@ -3,16 +3,21 @@
 
 import json
 import os
+import random
 import requests
-import struct
 import time
 import webbrowser
 
 import pygame
 
+from ai import AIOpponent
 from display_manager import DisplayManager
 from game import Game
 from gui import GUI
+from message_queue import MessageQueue
+from network_process import NetworkProcess
+from protocol import Protocol
+from score_ledger import ScoreLedger
 from socket_handler import SocketHandler
 from sound_manager import SoundManager
 from stage import Stage
@@ -38,13 +43,32 @@ class Manager:
         pygame.display.set_caption("Snaildash")
         self.clock = pygame.time.Clock()
         self.stage = Stage.MAIN_MENU
-        self.socket_handler = SocketHandler(self)
-        self.game = Game(self)
+        self.load_config()
+        self.handlers = {
+            Protocol.QUIT: self.on_quit,
+            Protocol.HELLO: self.on_hello,
+            Protocol.KEYFRAME: self.on_keyframe,
+            Protocol.RESYNC: self.on_resync,
+            Protocol.TURN_END_HOST: self.on_turn_end,
+            Protocol.INPUT: self.on_input
+        }  # Message handlers by type byte
+        self.inbox = MessageQueue()  # Events from the network thread, run once per frame
+        self.inbox_overflow = False
+        self.capabilities = Protocol.CAPABILITIES  # Capabilities offered to the opponent
+        if self.config.get("lockstep", False):
+            self.capabilities |= Protocol.LOCKSTEP
+        self.seed = 0  # Random seed sent in the hello
+        self.input_delay = self.config.get("input_delay", Game.INPUT_DELAY)  # Input delay in turns offered to the opponent
+        if self.config.get("network_process", False):
+            self.socket_handler = NetworkProcess(self)
+        else:
+            self.socket_handler = SocketHandler(self)
+        width, height = self.config.get("board_size", [Game.WIDTH, Game.HEIGHT])
+        self.game = Game(self, width=width, height=height)
         self.gui = GUI()
         self.tutorial = Tutorial(self)
         self.display_manager = DisplayManager(self)
         self._is_host = False
-        self.load_config()
         self.ousername = "player2"
         
         self.startup_time = time.time()
@@ -85,14 +109,16 @@ class Manager:
         """
         
         if send:
-            self.socket_handler.send(b"quit")
+            self.socket_handler.send(bytes([Protocol.QUIT]))
         self.socket_handler.quit()
+        self.stop_opponent()
         self.stage = Stage.STOP
     
     def quit_game(self):
         """Quits a running game and returns to main menu"""
         
         self.socket_handler.quit()
+        self.stop_opponent()
         self.gui.set_menu("main")
         self.gui.visible = True
         self.stage = Stage.MAIN_MENU
@@ -102,16 +128,82 @@ class Manager:
         """Main loop, calls logic and rendering related methods"""
         
         while self.stage != Stage.STOP:
-            pygame.display.set_caption(f"Snaildash - {self.clock.get_fps():.2f}fps")
+            pygame.display.set_caption(self.get_caption())
             events = pygame.event.get()
+            self.process_inbox()
             self.handle_events(events)
             self.display_manager.render(self.win)
             pygame.display.flip()
             self.clock.tick(self.FPS)
     
+    def get_caption(self):
+        """Returns the window title, showing the frame rate and, during
+        online games, how many network events wait for each frame
+
+        Returns:
+            str: the title
+        """
+        
+        caption = f"Snaildash - {self.clock.get_fps():.2f}fps"
+        if self.game.opponent is None and self.stage in (Stage.COUNTDOWN, Stage.IN_GAME):
+            stats = self.inbox.get_stats()
+            caption += f" - inbox {stats['depth']}/{stats['max_depth']} events, {stats['mean_wait_ms']:.1f}/{stats['max_wait_ms']:.1f}ms"
+            if stats["dropped"] != 0:
+                caption += f", {stats['dropped']} dropped"
+        return caption
+    
+    def process_inbox(self):
+        """Runs the events queued by the network thread since the previous
+        frame, so that the game state only changes on the main thread
+        """
+        
+        if self.inbox_overflow:
+            # Messages were lost, the game can't stay in sync
+            self.inbox_overflow = False
+            self.quit_game()
+        
+        for function, *args in self.inbox.drain():
+            function(*args)
+    
+    def post(self, function, *args):
+        """Queues a call for the next frame. Called by the network thread
+
+        Args:
+            function (callable): the method to call
+            *args: its arguments
+        """
+        
+        if not self.inbox.put(function, *args):
+            self.inbox_overflow = True
+    
+    def on_paired(self, is_host, ousername):
+        """Called by the network thread once the server paired the players
+
+        Args:
+            is_host (bool): whether this device is the host
+            ousername (str): name of the opponent
+        """
+        self.post(self.handle_paired, is_host, ousername)
+    
+    def on_connected(self):
+        """Called by the network thread once the connection is established"""
+        self.post(self.handle_connected)
+    
+    def on_receive(self, data):
+        """Called by the network thread with each message from the other device
+
+        Args:
+            data (bytes): received data, only valid during the call
+        """
+        self.post(self.handle_message, bytes(data))
+    
+    def on_lost(self):
+        """Called by the network thread when the connection is lost"""
+        self.post(self.quit_game)
+    
     def time(self):
         """Returns the relative time since game start"""
-        return time.time()-self.time_origin
+        return time.perf_counter()-self.time_origin
     
     def handle_events(self, events):
         """Handles pygame events
@@ -145,9 +237,6 @@ class Manager:
             elif event.type == pygame.MOUSEBUTTONUP:
                 self.on_mouse_up(event)
             
-            elif event.type == pygame.USEREVENT:
-                self.game.start_turn()
-            
             elif event.type == pygame.USEREVENT+1:
                 SoundManager.get(["click.wav"]).play()
                 
@@ -166,10 +255,18 @@ class Manager:
                     self.musername = self.gui.get_menu().components[1].txt
                     if self.musername == "":
                         continue
+                    self.game.capabilities = 0  # Until the opponent's hello arrives
+                    self.inbox.reset_stats()
                     self.socket_handler.connect()
                     self.gui.set_menu("waiting")
                     self.stage = Stage.WAITING_OPPONENT
                 
+                elif name == "nameinput.solo":
+                    self.musername = self.gui.get_menu().components[1].txt
+                    if self.musername == "":
+                        continue
+                    self.play_solo()
+                
                 elif name == "main.tutorial":
                     self.tutorial.start_time = time.time()
                     self.tutorial.slide = 0
@@ -186,7 +283,7 @@ class Manager:
                     self.gui.set_menu("main")
                     self.stage = Stage.MAIN_MENU
                     if name == "waiting.main":
-                        self.socket_handler.running = False
+                        self.socket_handler.quit()
                     
                     elif name == "breakdown.main":
                         self.socket_handler.quit()
@@ -199,11 +296,11 @@ class Manager:
                     self.tutorial.next_slide()
         
         if self.stage == Stage.COUNTDOWN:
-            cur_time = time.time()
+            cur_time = time.perf_counter()
             rem = self.countdown_start+self.COUNTDOWN_DUR-cur_time
             
             if cur_time-self.last_ping > 0.1:
-                self.socket_handler.send(b"ping")  # keep tunnel open
+                self.socket_handler.send(bytes([Protocol.PING]))  # keep tunnel open
                 self.last_ping = cur_time
                 
             if rem <= 0:
@@ -211,14 +308,14 @@ class Manager:
                 pygame.mixer.music.load(os.path.join("assets", "musics", "game.wav"))
                 pygame.mixer.music.set_volume(0.5)
                 pygame.mixer.music.play()
-                self.game.start_time = self.time()
-                self.game.start_turn()
+                self.game.start()
 
         elif self.stage == Stage.IN_GAME:
             self.game.loop()
-            rem = self.game.start_time+self.game.DURATION-self.time()
-            if rem <= 0:
-                self.send_score()
+            # Both devices end on the same turn, even when one had to wait for the other
+            if self.game.is_over():
+                if self.game.opponent is None:
+                    self.send_score()
                 self.stage = Stage.GAME_TO_BREAKDOWN
                 self.game_to_breakdown_start = self.time()
         
@@ -228,6 +325,7 @@ class Manager:
                 self.stage = Stage.BREAKDOWN_BAR
                 self.breakdown_bar_start = self.time()
                 self.socket_handler.quit()
+                self.stop_opponent()
         
         elif self.stage == Stage.BREAKDOWN_BAR:
             rem = self.breakdown_bar_start+self.BREAKDOWN_BAR_DUR-self.time()
@@ -251,65 +349,129 @@ class Manager:
         """
         self.gui.on_mouse_up(event)
     
-    def on_connected(self):
+    def handle_paired(self, is_host, ousername):
+        """Takes the role given by the server
+
+        Args:
+            is_host (bool): whether this device is the host
+            ousername (str): name of the opponent
+        """
+        
+        self.ousername = ousername
+        if is_host:
+            self.init_host()
+        else:
+            self.init_guest()
+    
+    def handle_connected(self):
         """Starts game when an opponent is found and the connection is established"""
         
         if self.stage == Stage.WAITING_OPPONENT:
+            self.seed = random.getrandbits(64)
+            self.socket_handler.send(Protocol.encode_hello(self.capabilities, self.seed, self.input_delay))
             self.play()
     
-    def on_receive(self, data):
-        """Processes data received from the other device
+    def handle_message(self, data):
+        """Processes data received from the other device, dispatching it on
+        its type byte
 
         Args:
             data (bytes): received data
         """
         
-        if data == b"quit":
+        handler = self.handlers.get(data[0])
+        if handler is not None:
+            handler(data)
+    
+    def on_quit(self, data):
+        """Leaves the game when the other device did
+
+        Args:
+            data (bytes): quit message
+        """
+        self.quit_game()
+    
+    def on_hello(self, data):
+        """Checks the other device's protocol version and keeps the capabilities both devices share
+
+        Args:
+            data (bytes): hello message
+        """
+        
+        version, capabilities, seed, input_delay = Protocol.decode_hello(data)
+        if version != Protocol.VERSION:
             self.quit_game()
             return
+        self.game.capabilities = capabilities & self.capabilities
+        if self.game.is_lockstep():
+            # Both devices draw the same bonuses
+            self.game.rng.seed(self.seed ^ seed)
+        # The longer delay covers both directions
+        delay = max(self.input_delay, input_delay)
+        if self.game.is_lockstep():
+            # Each device must have sent its input for a turn before waiting for the other's
+            delay = max(delay, 1)
+        self.game.input_delay = delay
+    
+    def on_keyframe(self, data):
+        """Loads a keyframe sent by the host
 
-        if self.stage == Stage.IN_GAME:
-            if data.startswith(b"turnEnd"):
-                if data.startswith(b"turnEndHost"):
-                    x1, y1, d1, ds1, x2, y2, d2, ds2, trails_count, bonus_count = struct.unpack(">BBBBBBBBBB", data[11:21])
-                    data = data[21:]
-                    trails = []
-                    for j in range(trails_count):
-                        x, y, i = struct.unpack(">BBB", data[3*j:3*j+3])
-                        trails.append((x, y, i))
+        Args:
+            data (bytes): keyframe message
+        """
+        
+        # The host's countdown may end first
+        if self.stage in (Stage.COUNTDOWN, Stage.IN_GAME):
+            self.game.load_keyframe(memoryview(data)[1:])
+    
+    def on_input(self, data):
+        """Passes on the opponent's input
 
-                    data = data[3*trails_count:]
-                    
-                    bonus_dict = {}
-                    for j in range(bonus_count):
-                        x, y, i = struct.unpack(">BBB", data[3*j:3*j+3])
-                        bonus_dict[(x, y)] = i
-                    
-                    data = data[3*bonus_count:]
-                    col_start, col_x, col_y, bonus_scores_count = struct.unpack(">dBBB", data[:11])
-                    data = data[11:]
-                    bonus_scores = []
-                    for i in range(bonus_scores_count):
-                        r, b = struct.unpack(">II", data[8*i:8*i+8])
-                        bonus_scores.append([r,b])
-                    
-                    for i in range(2):
-                        self.game.players[i].reinforced_placed = bonus_scores[1][i]
-                        self.game.players[i].dashed_count = bonus_scores[2][i]
-                        self.game.players[i].used_bonus = bonus_scores[3][i]
+        Args:
+            data (bytes): input message
+        """
+        
+        # The opponent's countdown may end first
+        if self.stage in (Stage.COUNTDOWN, Stage.IN_GAME):
+            self.game.on_input(*Protocol.decode_input(data))
+    
+    def on_resync(self, data):
+        """Answers or applies a resync
 
-                else:
-                    x1, y1, d1, ds1, x2, y2, d2, ds2 = struct.unpack(">BBBBBBBB", data[7:])
-                    trails = None
-                    bonus_dict = None
-                    col_start, col_x, col_y = 0, 0, 0
-                
-                self.game.sync(x1, y1, d1, ds1, x2, y2, d2, ds2, trails, bonus_dict, col_start, col_x, col_y)
-                if self.is_host():
-                    self.game.end_turn()
-                
-                else:
-                    pygame.event.post(pygame.event.Event(pygame.USEREVENT))
+        Args:
+            data (bytes): resync message
+        """
+        
+        # The other device's countdown may end first
+        if self.stage in (Stage.COUNTDOWN, Stage.IN_GAME):
+            self.game.resync()
+    
+    def on_turn_end(self, data):
+        """Applies the host's answer to a turn
+
+        Args:
+            data (bytes): turnEndHost message
+        """
+        
+        # The host's countdown may end first
+        if self.stage in (Stage.COUNTDOWN, Stage.IN_GAME) and not self.is_host():
+            self.game.receive(self.game.reconcile, data)
+    
+    def play_solo(self):
+        """Starts a game against the local AI, without connecting to the server"""
+        
+        self.ousername = AIOpponent.NAME
+        self.init_host()
+        self.game.capabilities = Protocol.CAPABILITIES
+        self.game.opponent = AIOpponent(self.game, self.game.players[1])
+        self.play()
+    
+    def stop_opponent(self):
+        """Stops the local AI, if any"""
+        
+        if self.game.opponent is not None:
+            self.game.opponent.stop()
+            self.game.opponent = None
     
     def play(self, send=False):
         """Starts the game
@@ -323,30 +485,12 @@ class Manager:
         
         self.game.reset()
         
-        self.countdown_start = time.time()
+        self.countdown_start = time.perf_counter()
         self.stage = Stage.COUNTDOWN
-        self.time_origin = time.time()
+        self.time_origin = time.perf_counter()
         self.gui.visible = False
         pygame.mixer.music.stop()
     
-    def get_bonus_scores(self):
-        """Returns a list of bonus scores for each player
-
-        Returns:
-            list[list[str, int, int]]: list of bonus scores
-        """
-        
-        p1, p2 = self.game.players
-        scores = [
-            ["Zone couverte", *self.game.get_trail_count()],
-            ["Bave renforcée", p1.reinforced_placed, p2.reinforced_placed],
-            ["Dash", p1.dashed_count, p2.dashed_count],
-            ["Bonus", p1.used_bonus, p2.used_bonus]
-        ]
-
-        scores.append(["Total", sum(map(lambda s: s[1], scores)), sum(map(lambda s: s[2], scores))])
-        return scores
-    
     def load_config(self):
         """Loads configuration file"""
         
@@ -365,6 +509,6 @@ class Manager:
         
         data = {
             "name": self.musername,
-            "score": self.get_bonus_scores()[-1][self.game.player.i + 1]
+            "score": int(self.game.ledger.get(ScoreLedger.TOTAL, self.game.player.i))
         }
         requests.post(self.config["score_url"], data)
\ No newline at end of file
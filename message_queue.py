@@ -0,0 +1,96 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import collections
+import time
+
+class MessageQueue:
+    """Bounded single-producer single-consumer queue handing events from the
+    network thread to the main loop, which drains it once per frame. deque's
+    append and popleft are atomic, so neither side takes a lock. Keeps
+    counters of the queue depth and of the time events wait
+    """
+
+    CAPACITY = 1024  # Maximum number of waiting events
+
+    def __init__(self, capacity=CAPACITY):
+        """Initializes a MessageQueue instance
+
+        Args:
+            capacity (int, optional): maximum number of waiting events. Defaults to CAPACITY.
+        """
+
+        self.capacity = capacity
+        self.items = collections.deque()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Resets the counters"""
+
+        self.count = 0  # Number of events drained
+        self.dropped = 0  # Number of events refused because the queue was full
+        self.drains = 0  # Number of non-empty drains
+        self.depth = 0  # Number of events in the last non-empty drain
+        self.max_depth = 0  # Largest number of events in a drain
+        self.total_wait = 0  # Sum of the durations in seconds events waited
+        self.max_wait = 0  # Longest duration in seconds an event waited
+
+    def put(self, *item):
+        """Adds an event. Must only be called by the producer
+
+        Args:
+            *item: content of the event
+
+        Returns:
+            bool: False if the queue is full and the event was dropped
+        """
+
+        if len(self.items) >= self.capacity:
+            self.dropped += 1
+            return False
+        self.items.append((time.perf_counter(), item))
+        return True
+
+    def drain(self):
+        """Removes the events added so far. Events added meanwhile wait for
+        the next drain. Must only be called by the consumer
+
+        Returns:
+            list[tuple]: the events, oldest first
+        """
+
+        n = len(self.items)
+        if n == 0:
+            return []
+
+        now = time.perf_counter()
+        items = []
+        for _ in range(n):
+            added, item = self.items.popleft()
+            wait = now - added
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            items.append(item)
+
+        self.count += n
+        self.drains += 1
+        self.depth = n
+        self.max_depth = max(self.max_depth, n)
+        return items
+
+    def get_stats(self):
+        """Returns the counters
+
+        Returns:
+            dict: events drained and dropped, drains, last and maximum depth, mean and maximum wait in milliseconds
+        """
+
+        return {
+            "count": self.count,
+            "dropped": self.dropped,
+            "drains": self.drains,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "mean_wait_ms": self.total_wait / max(self.count, 1) * 1e3,
+            "max_wait_ms": self.max_wait * 1e3
+        }
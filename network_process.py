@@ -0,0 +1,250 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import multiprocessing
+import threading
+import time
+
+from ring_buffer import RingBuffer
+from socket_handler import SocketHandler
+
+class NetworkProcess:
+    """Drop-in replacement for SocketHandler running the transport in a
+    child process, so that acknowledgements and retransmissions are not
+    delayed by the render loop holding the GIL. Messages go through two
+    shared memory RingBuffers, one per direction. A pipe per direction
+    wakes the consumer up, so that neither side polls
+    """
+
+    SEND = 1  # To the child: message to send to the opponent
+    QUIT = 2  # To the child: close the connection and exit
+
+    RECEIVE = 1  # To the parent: message received from the opponent
+    INIT_HOST = 2  # To the parent: paired as host, with the opponent's name
+    INIT_GUEST = 3  # To the parent: paired as guest, with the opponent's name
+    CONNECTED = 4  # To the parent: the connection is established
+    LOST = 5  # To the parent: the connection was lost
+
+    FULL_WAIT = 0.001  # Duration in seconds between two attempts to add to a full ring buffer, in the child
+
+    def __init__(self, manager):
+        """Initializes a NetworkProcess instance
+
+        Args:
+            manager (Manager): manager instance
+        """
+
+        self.manager = manager
+        self.running = False
+        self.process = None
+
+    def connect(self):
+        """Starts the child process, which connects to the match-making
+        server and waits for an opponent
+        """
+
+        self.running = True
+        self.to_child = RingBuffer()
+        self.to_parent = RingBuffer()
+        child_bell, self.bell = multiprocessing.Pipe(False)
+        self.bell_in, parent_bell = multiprocessing.Pipe(False)
+
+        context = multiprocessing.get_context("spawn")
+        self.process = context.Process(
+            target=NetworkProcess.child_main,
+            args=(self.to_child.name, self.to_parent.name, child_bell, parent_bell, self.manager.config, self.manager.musername),
+            daemon=True
+        )
+        self.process.start()
+        # Only the child keeps its ends, so that its exit closes the pipe
+        child_bell.close()
+        parent_bell.close()
+        args = (self.process, self.to_child, self.to_parent, self.bell_in, self.bell)
+        threading.Thread(target=self.listen, args=args, daemon=True).start()
+
+    def listen(self, process, to_child, to_parent, bell_in, bell):
+        """Passes the child's notifications on to the manager until the child
+        exits, then frees the ring buffers. Runs in a thread of the main process
+
+        Args:
+            process (multiprocessing.Process): the child process
+            to_child (RingBuffer): parent to child ring buffer
+            to_parent (RingBuffer): child to parent ring buffer
+            bell_in (multiprocessing.connection.Connection): rung by the child after each notification
+            bell (multiprocessing.connection.Connection): rung after each command
+        """
+
+        while True:
+            try:
+                bell_in.recv_bytes()
+            except EOFError:
+                break
+
+            while (item := to_parent.get()) is not None:
+                kind, msg = item
+                # Ignore what comes after quit, or from a previous connection's process
+                if not self.running or self.process is not process:
+                    continue
+
+                if kind == self.RECEIVE:
+                    self.manager.on_receive(msg)
+
+                elif kind in (self.INIT_HOST, self.INIT_GUEST):
+                    self.manager.on_paired(kind == self.INIT_HOST, msg.decode("utf-8"))
+
+                elif kind == self.CONNECTED:
+                    self.manager.on_connected()
+
+                elif kind == self.LOST:
+                    self.manager.on_lost()
+
+        process.join()
+        bell_in.close()
+        bell.close()
+        to_child.close(True)
+        to_parent.close(True)
+
+    def post(self, kind, msg=b""):
+        """Sends a command to the child process. Must only be called by the
+        main thread
+
+        Args:
+            kind (int): SEND or QUIT
+            msg (bytes, optional): message to send. Defaults to b"".
+
+        Returns:
+            bool: False if the ring buffer is full
+        """
+
+        if not self.to_child.put(kind, msg):
+            return False
+        try:
+            self.bell.send_bytes(b"")
+        except OSError:
+            pass  # The child exited
+        return True
+
+    def send(self, msg):
+        """Sends a message to the opponent
+
+        Args:
+            msg (bytes): data to send
+        """
+
+        if not self.running: return
+        if not self.post(self.SEND, msg):
+            # The child process stopped reading long ago
+            self.manager.quit_game()
+
+    def quit(self):
+        """Makes the child process close the connection and exit"""
+
+        if self.running:
+            self.running = False
+            self.post(self.QUIT)
+
+    def child_main(to_child, to_parent, bell_in, bell, config, musername):
+        """Runs the transport until the parent quits. Runs in the child process
+
+        Args:
+            to_child (str): name of the parent to child ring buffer
+            to_parent (str): name of the child to parent ring buffer
+            bell_in (multiprocessing.connection.Connection): rung by the parent after each command
+            bell (multiprocessing.connection.Connection): rung after each notification
+            config (dict): game configuration
+            musername (str): name of the local player
+        """
+
+        to_child, to_parent = RingBuffer(to_child), RingBuffer(to_parent)
+        manager = ManagerProxy(to_parent, bell, config, musername)
+        handler = manager.socket_handler = SocketHandler(manager)
+        handler.connect()
+
+        running = True
+        while running:
+            try:
+                bell_in.recv_bytes()
+            except EOFError:
+                handler.quit()
+                break
+
+            while (item := to_child.get()) is not None:
+                kind, msg = item
+                if kind == NetworkProcess.SEND:
+                    handler.send(msg)
+                elif kind == NetworkProcess.QUIT:
+                    handler.quit()
+                    running = False
+                    break
+
+        handler.thread.join()
+        to_child.close()
+        to_parent.close()
+
+class ManagerProxy:
+    """Stands for the Manager in the network process: the SocketHandler's
+    calls are forwarded to the main process through a RingBuffer
+    """
+
+    def __init__(self, ring, bell, config, musername):
+        """Initializes a ManagerProxy instance
+
+        Args:
+            ring (RingBuffer): child to parent ring buffer
+            bell (multiprocessing.connection.Connection): rung after each notification
+            config (dict): game configuration
+            musername (str): name of the local player
+        """
+
+        self.ring = ring
+        self.bell = bell
+        self.config = config
+        self.musername = musername
+        self.socket_handler = None
+
+    def notify(self, kind, msg=b""):
+        """Sends a notification to the main process, waiting for room if the
+        ring buffer is full
+
+        Args:
+            kind (int): one of NetworkProcess's notification types
+            msg (bytes, optional): content of the notification. Defaults to b"".
+        """
+
+        while not self.ring.put(kind, msg):
+            time.sleep(NetworkProcess.FULL_WAIT)
+        try:
+            self.bell.send_bytes(b"")
+        except OSError:
+            pass  # The parent exited
+
+    def on_paired(self, is_host, ousername):
+        """Forwards the role and the opponent's name
+
+        Args:
+            is_host (bool): whether this device is the host
+            ousername (str): name of the opponent
+        """
+
+        kind = NetworkProcess.INIT_HOST if is_host else NetworkProcess.INIT_GUEST
+        self.notify(kind, ousername.encode("utf-8"))
+
+    def on_connected(self):
+        """Forwards the establishment of the connection"""
+        self.notify(NetworkProcess.CONNECTED)
+
+    def on_receive(self, data):
+        """Forwards a message received from the opponent
+
+        Args:
+            data (bytes): the message
+        """
+        self.notify(NetworkProcess.RECEIVE, data)
+
+    def on_lost(self):
+        """Forwards the loss of the connection. The connection closes, the
+        process exits once the main process quits too
+        """
+
+        self.notify(NetworkProcess.LOST)
+        self.socket_handler.quit()
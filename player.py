@@ -1,11 +1,32 @@
 #Snaildash is a small game created in the scope of a school project
 #Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
 
+import operator
+
+import numpy as np
+
+from score_ledger import ScoreLedger
+
 class Player:
     """Class representing a player"""
     
-    COLORS = [(255,100,0), (0,100,255)]
-    TRAIL_COLORS = [(255,150,100), (100,150,255)]
+    __slots__ = (
+        "game", "i", "x", "y", "lx", "ly", "nx", "ny",
+        "dir", "dashscore", "reinforced", "dash", "synced"
+    )
+
+    COLORS = [
+        (255,100,0), (0,100,255), (60,200,60), (230,200,0),
+        (180,60,255), (0,210,200), (255,60,160), (140,90,40),
+        (255,255,255), (120,120,120), (150,255,0), (255,150,200),
+        (0,60,160), (160,0,40), (255,190,120), (90,160,130)
+    ]
+    TRAIL_COLORS = [
+        (255,150,100), (100,150,255), (130,230,130), (240,225,110),
+        (210,140,255), (110,235,230), (255,140,200), (190,150,110),
+        (230,230,230), (170,170,170), (200,255,110), (255,200,225),
+        (90,130,210), (210,90,120), (255,215,170), (150,200,180)
+    ]
     MAX_DASHSCORE = 4  # Maximum dash tank value
     DASH_COST = 2  # Cost for one dash
     DASH_SIZE = 3  # Length of dash in tiles
@@ -13,8 +34,13 @@ class Player:
         (1,0),(0,1),(-1,0),(0,-1),
         (DASH_SIZE,0),(0,DASH_SIZE),(-DASH_SIZE,0),(0,-DASH_SIZE)
     ]
+    STATE_DTYPE = np.dtype([
+        ("x", "<i4"), ("y", "<i4"), ("lx", "<i4"), ("ly", "<i4"), ("nx", "<i4"), ("ny", "<i4"),
+        ("dir", "i1"), ("dashscore", "i1"), ("reinforced", "<i2"), ("dash", "?"), ("synced", "?")
+    ])  # Layout of a player's state in snapshots
+    STATE_GETTER = operator.attrgetter(*STATE_DTYPE.names)
 
-    def __init__(self, game, i, x, y):
+    def __init__(self, game, i, x, y, dir_):
         """Initializes a Player instance
 
         Args:
@@ -22,6 +48,7 @@ class Player:
             i (int): player id
             x (int): initial x position
             y (int): initial y position
+            dir_ (int): initial direction
         """
         
         self.game = game
@@ -30,31 +57,50 @@ class Player:
         self.y = y
         self.lx, self.ly = x, y
         self.nx, self.ny = x, y
-        self.dir = i*2  # 0, 1, 2, 3 -> right, down, left, up
+        self.dir = dir_  # 0, 1, 2, 3 -> right, down, left, up
         self.synced = False
         self.dashscore = 0
         self.dash = False
+        self.reinforced = 0
 
-    def reset(self, x, y):
+    def reset(self, x, y, dir_):
         """Resets all values
 
         Args:
             x (int): initial x position
             y (int): initial y position
+            dir_ (int): initial direction
         """
         
         self.x = x
         self.y = y
         self.lx, self.ly = x, y
         self.nx, self.ny = x, y
-        self.dir = self.i*2
+        self.dir = dir_
         self.synced = False
         self.dashscore = 0
         self.dash = False
         self.reinforced = 0
-        self.reinforced_placed = 0
-        self.used_bonus = 0
-        self.dashed_count = 0
+
+    def get_state(self):
+        """Returns the player's state
+
+        Returns:
+            tuple: field values, in STATE_DTYPE order
+        """
+        return Player.STATE_GETTER(self)
+
+    def set_state(self, state):
+        """Overwrites the player's state
+
+        Args:
+            state (tuple): field values, in STATE_DTYPE order
+        """
+
+        (
+            self.x, self.y, self.lx, self.ly, self.nx, self.ny,
+            self.dir, self.dashscore, self.reinforced, self.dash, self.synced
+        ) = state
 
     def candash(self):
         """Returns whether the player can dash or not
@@ -74,4 +120,4 @@ class Player:
     
     def use_bonus(self):
         """Records the use of a bonus"""
-        self.used_bonus += 1
\ No newline at end of file
+        self.game.ledger.add(ScoreLedger.BONUSES, self.i)
\ No newline at end of file
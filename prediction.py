@@ -0,0 +1,46 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import numpy as np
+
+class Prediction:
+    """Turn the guest resolved locally before the host's answer arrived.
+    Keeps what is needed to check the answer and to play the turn again
+    """
+
+    __slots__ = ("snapshot", "input", "starts", "players", "state_hash", "score_changes", "collision")
+
+    def __init__(self, snapshot, input_):
+        """Initializes a Prediction instance
+
+        Args:
+            snapshot (Snapshot): state at the start of the turn
+            input_ (int): guest's input for the turn: direction, plus 4 when dashing, or Protocol.NO_INPUT
+        """
+
+        self.snapshot = snapshot
+        self.input = input_
+        self.starts = None  # Positions the players left during the turn
+        self.players = None  # Predicted (x, y, direction, dashscore) of each player after the turn
+        self.state_hash = None  # Low 16 bits (Protocol.HASH_MASK) of the predicted state hash after the turn
+        self.score_changes = None  # Predicted changes of the synced scores
+        self.collision = None  # Predicted position of a new collision, None if there was none
+
+    def matches(self, info):
+        """Returns whether the host's answer leads to the predicted state
+
+        Args:
+            info (dict): host's end of turn message, decoded by decode_sync
+
+        Returns:
+            bool: True if the turn needs no correction. False when the answer
+                differs or has no hash to compare with
+        """
+
+        # The hash is short, the players are compared too
+        if info.get("state_hash") != self.state_hash or info["players"] != self.players:
+            return False
+        if np.any(self.score_changes != info.get("score_changes", 0)):
+            return False
+        collision = (info["col_x"], info["col_y"]) if "col_start" in info else None
+        return collision == self.collision
@@ -0,0 +1,218 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import struct
+
+import numpy as np
+
+from codec import Writer
+
+class Protocol:
+    """Static class describing the binary messages exchanged by the two
+    devices. Every message starts with a one-byte type. Integers are LEB128
+    varints and parts which did not change since the previous message are
+    left out, which the reliable, ordered transport makes safe
+    """
+
+    VERSION = 2  # Version of the message formats
+
+    HELLO = 1  # Version, capabilities, seed and input delay, sent by both devices once connected
+    TURN_END_HOST = 3  # Host's turn resolution
+    KEYFRAME = 4  # Trail and bonus chunks
+    RESYNC = 5  # Resync request (guest) or answer (host)
+    PING = 6  # Keeps the connection open
+    QUIT = 7  # The other device left
+    INPUT = 8  # Player's input for a turn, sent by the guest and by both devices in lockstep mode
+
+    HASH = 1  # Capability: turnEndHost carries the state hash
+    KEYFRAMES = 2  # Capability: the host sends periodic keyframes
+    LOCKSTEP = 4  # Capability: the devices only exchange their inputs and both resolve turns, only offered when enabled in the configuration
+    CAPABILITIES = HASH | KEYFRAMES  # Capabilities of this version, offered by default
+
+    HAS_TRAILS = 1  # turnEndHost flag: trail changes follow
+    HAS_BONUSES = 2  # turnEndHost flag: bonus changes follow
+    HAS_SCORES = 4  # turnEndHost flag: score changes follow
+    HAS_COLLISION = 8  # turnEndHost flag: a new collision follows
+    HAS_HASH = 16  # turnEndHost flag: the state hash follows
+
+    HELLO_STRUCT = struct.Struct(">BBB")  # Type, version and capabilities
+    HELLO_EXTRA_STRUCT = struct.Struct(">QB")  # Random seed after the hello, combined with the other device's in lockstep mode, and input delay in turns
+    INPUT_STRUCT = struct.Struct(">BB")  # Type and input
+    TIME_STRUCT = struct.Struct(">d")  # Collision start time
+    HASH_STRUCT = struct.Struct(">H")  # Low 16 bits of the state hash, enough to notice a lasting desync within a few turns
+    HASH_MASK = 0xffff
+    MOVED = 64  # Player state bit: the next position differs from the plain move and follows
+    NO_INPUT = 8  # Input value: the player keeps its direction. Other values are the direction, plus 4 when dashing
+
+    def encode_hello(capabilities=CAPABILITIES, seed=0, input_delay=0):
+        """Encodes the hello message
+
+        Args:
+            capabilities (int, optional): capabilities to offer. Defaults to CAPABILITIES.
+            seed (int, optional): 64-bit random seed. Defaults to 0.
+            input_delay (int, optional): number of turns between an input and the turn it applies to. Defaults to 0.
+
+        Returns:
+            bytes: the message
+        """
+        return Protocol.HELLO_STRUCT.pack(Protocol.HELLO, Protocol.VERSION, capabilities) + Protocol.HELLO_EXTRA_STRUCT.pack(seed, input_delay)
+
+    def decode_hello(data):
+        """Parses a hello message
+
+        Args:
+            data (bytes): the message
+
+        Returns:
+            tuple[int, int, int, int]: version, capabilities, seed and input
+                delay of the other device. The seed and delay are 0 if the
+                message has none
+        """
+
+        version, capabilities = Protocol.HELLO_STRUCT.unpack_from(data)[1:]
+        seed = input_delay = 0
+        if len(data) >= Protocol.HELLO_STRUCT.size + Protocol.HELLO_EXTRA_STRUCT.size:
+            seed, input_delay = Protocol.HELLO_EXTRA_STRUCT.unpack_from(data, Protocol.HELLO_STRUCT.size)
+        return version, capabilities, seed, input_delay
+
+    def encode_input(input_, state_hash=None):
+        """Encodes an input message
+
+        Args:
+            input_ (int): direction, plus 4 when dashing, or NO_INPUT
+            state_hash (int, optional): low 16 bits of the sender's state hash, input delay turns before the one the input applies to. Defaults to None (not sent).
+
+        Returns:
+            bytes: the message
+        """
+
+        msg = Protocol.INPUT_STRUCT.pack(Protocol.INPUT, input_)
+        if state_hash is not None:
+            msg += Protocol.HASH_STRUCT.pack(state_hash)
+        return msg
+
+    def decode_input(data):
+        """Parses an input message
+
+        Args:
+            data (bytes): the message
+
+        Returns:
+            tuple[int, int]: input and state hash (None if not sent)
+        """
+
+        input_ = Protocol.INPUT_STRUCT.unpack_from(data)[1]
+        state_hash = None
+        if len(data) >= Protocol.INPUT_STRUCT.size + Protocol.HASH_STRUCT.size:
+            state_hash, = Protocol.HASH_STRUCT.unpack_from(data, Protocol.INPUT_STRUCT.size)
+        return input_, state_hash
+
+    def zigzag(values):
+        """Maps signed integers to non-negative ones: 0, -1, 1, -2... -> 0, 1, 2, 3...
+
+        Args:
+            values (np.ndarray): signed integers
+
+        Returns:
+            np.ndarray: non-negative integers
+        """
+
+        values = np.asarray(values, dtype=np.int64)
+        return (values << 1) ^ (values >> 63)
+
+    def unzigzag(values):
+        """Reverses zigzag
+
+        Args:
+            values (np.ndarray): non-negative integers
+
+        Returns:
+            np.ndarray: signed integers
+        """
+        return (values >> 1) ^ -(values & 1)
+
+    def write_changes(writer, changes, width):
+        """Writes trail or bonus changes as runs of consecutive cells (in
+        y*width + x order) receiving the same id: the run count, then the gap
+        before each run, then each run's length minus one, then each run's id.
+        When a cell appears several times, the last change wins
+
+        Args:
+            writer (Writer): writer of the message
+            changes (np.ndarray): (n, 3) array of (x, y, id) changes
+            width (int): width of the grid
+        """
+
+        if len(changes) < Writer.SMALL:
+            last = {}
+            for x, y, id_ in changes.tolist():
+                last[y*width + x] = id_
+            gaps, lengths, ids = [], [], []
+            end = 0
+            for cell in sorted(last):
+                if len(ids) != 0 and cell == end and last[cell] == ids[-1]:
+                    lengths[-1] += 1
+                else:
+                    gaps.append(cell - end)
+                    lengths.append(0)
+                    ids.append(last[cell])
+                end = cell + 1
+
+            writer.varint(len(ids))
+            writer.varints(gaps)
+            writer.varints(lengths)
+            for id_ in ids:
+                writer.byte(id_ & 0xff)
+            return
+
+        cells = changes[:, 1].astype(np.int64)*width + changes[:, 0]
+        cells, last = np.unique(cells[::-1], return_index=True)
+        ids = changes[len(changes)-1-last, 2]
+        new_run = np.ones(len(cells), dtype=bool)
+        new_run[1:] = (cells[1:] != cells[:-1]+1) | (ids[1:] != ids[:-1])
+        starts = np.flatnonzero(new_run)
+        lengths = np.diff(np.append(starts, len(cells)))
+        gaps = np.diff(cells[starts], prepend=0)
+        gaps[1:] -= lengths[:-1]
+
+        writer.varint(len(starts))
+        writer.varints(gaps)
+        writer.varints(lengths-1)
+        writer.array(ids[starts])
+
+    def read_changes(reader, width, dtype):
+        """Reads changes written by write_changes
+
+        Args:
+            reader (Reader): reader of the message
+            width (int): width of the grid
+            dtype (type): numpy type of the change array
+
+        Returns:
+            np.ndarray: (n, 3) array of (x, y, id) changes
+        """
+
+        runs = reader.varint()
+        if runs < Writer.SMALL:
+            gaps = [reader.varint() for _ in range(runs)]
+            lengths = [reader.varint() + 1 for _ in range(runs)]
+            changes = []
+            cell = 0
+            for gap, length, id_ in zip(gaps, lengths, reader.array(runs).tolist()):
+                cell += gap
+                for cell in range(cell, cell+length):
+                    changes.append((cell % width, cell // width, id_))
+                cell += 1
+            return np.array(changes, dtype=dtype).reshape([-1, 3])
+
+        gaps = reader.varints(runs)
+        lengths = reader.varints(runs) + 1
+        ids = reader.array(runs)
+
+        ends = np.cumsum(gaps + lengths)
+        run = np.repeat(np.arange(runs), lengths)
+        cells = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths) + (ends - lengths)[run]
+        changes = np.empty([len(cells), 3], dtype=dtype)
+        changes[:, 0], changes[:, 1] = cells % width, cells // width
+        changes[:, 2] = ids[run]
+        return changes
@@ -0,0 +1,120 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import struct
+from multiprocessing.shared_memory import SharedMemory
+
+class RingBuffer:
+    """Single-producer single-consumer message queue in shared memory,
+    usable by two processes without locks. The producer only moves the head
+    index and the consumer only the tail index, each written after the data
+    it publishes or frees. Indices only grow, their difference is the number
+    of bytes in use. This relies on aligned 8-byte stores being atomic and
+    seen by the other process in program order, as on x86
+    """
+
+    CAPACITY = 1 << 20  # Default size in bytes of the message area
+    INDEX_SPACING = 64  # Bytes between the head and tail indices, so that they sit on different cache lines
+    HEADER = struct.Struct(">IB")  # Length and kind of the message which follows
+
+    def __init__(self, name=None, capacity=CAPACITY):
+        """Initializes a RingBuffer instance, creating the shared memory or
+        attaching to an existing one
+
+        Args:
+            name (str, optional): name of the shared memory to attach to. Defaults to None (create it).
+            capacity (int, optional): size of the message area, when creating. Defaults to CAPACITY.
+        """
+
+        if name is None:
+            self.shm = SharedMemory(create=True, size=2*self.INDEX_SPACING + capacity)
+        else:
+            self.shm = SharedMemory(name)
+        self.name = self.shm.name
+        self.indices = self.shm.buf[:2*self.INDEX_SPACING].cast("Q")
+        self.data = self.shm.buf[2*self.INDEX_SPACING:]
+        self.capacity = len(self.data)
+        self.tail_index = self.INDEX_SPACING // self.indices.itemsize
+
+    def write(self, pos, data):
+        """Copies bytes into the message area, wrapping around its end
+
+        Args:
+            pos (int): index of the first byte
+            data (bytes): the bytes
+        """
+
+        pos %= self.capacity
+        first = min(len(data), self.capacity - pos)
+        self.data[pos:pos+first] = data[:first]
+        self.data[:len(data)-first] = data[first:]
+
+    def read(self, pos, size):
+        """Copies bytes out of the message area, wrapping around its end
+
+        Args:
+            pos (int): index of the first byte
+            size (int): number of bytes
+
+        Returns:
+            bytes: the bytes
+        """
+
+        pos %= self.capacity
+        if pos + size <= self.capacity:
+            return bytes(self.data[pos:pos+size])
+        return bytes(self.data[pos:]) + bytes(self.data[:pos+size-self.capacity])
+
+    def put(self, kind, msg=b""):
+        """Appends a message. Must only be called by the producer
+
+        Args:
+            kind (int): type of the message, between 0 and 255
+            msg (bytes, optional): the message. Defaults to b"".
+
+        Raises:
+            ValueError: if the message is larger than the whole buffer
+
+        Returns:
+            bool: False if the buffer is full and the message was not added
+        """
+
+        msg = memoryview(msg)
+        head, tail = self.indices[0], self.indices[self.tail_index]
+        size = self.HEADER.size + len(msg)
+        if size > self.capacity:
+            raise ValueError(f"Message of {len(msg)} bytes larger than the ring buffer")
+        if size > self.capacity - (head - tail):
+            return False
+        self.write(head, self.HEADER.pack(len(msg), kind))
+        self.write(head + self.HEADER.size, msg)
+        self.indices[0] = head + size
+        return True
+
+    def get(self):
+        """Removes the oldest message. Must only be called by the consumer
+
+        Returns:
+            tuple[int, bytes]: kind and content of the message, None if the buffer is empty
+        """
+
+        head, tail = self.indices[0], self.indices[self.tail_index]
+        if head == tail:
+            return None
+        length, kind = self.HEADER.unpack(self.read(tail, self.HEADER.size))
+        msg = self.read(tail + self.HEADER.size, length)
+        self.indices[self.tail_index] = tail + self.HEADER.size + length
+        return kind, msg
+
+    def close(self, unlink=False):
+        """Detaches from the shared memory
+
+        Args:
+            unlink (bool, optional): also destroy it, for the creating process. Defaults to False.
+        """
+
+        self.indices.release()
+        self.data.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
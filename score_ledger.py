@@ -0,0 +1,80 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import numpy as np
+
+class ScoreLedger:
+    """Keeps each player's score breakdown up to date as the board changes,
+    so that reading the scores never requires scanning the grid
+    """
+
+    NAMES = ["Zone couverte", "Bave renforcée", "Dash", "Bonus", "Total"]
+    COVERED = 0  # Number of cells covered by the player's drool
+    REINFORCED = 1  # Number of reinforced drool cells placed
+    DASHES = 2  # Number of dashes
+    BONUSES = 3  # Number of bonuses used
+    TOTAL = 4  # Sum of all the above
+
+    def __init__(self, n_players):
+        """Initializes a ScoreLedger instance
+
+        Args:
+            n_players (int): number of players
+        """
+
+        self.n_players = n_players
+        self.scores = np.zeros([len(self.NAMES), n_players], dtype="int64")
+
+    def reset(self):
+        """Resets all scores to 0"""
+        self.scores.fill(0)
+
+    def add(self, field, i, n=1):
+        """Adds points to one of a player's scores
+
+        Args:
+            field (int): score index (COVERED, REINFORCED, DASHES or BONUSES)
+            i (int): player id
+            n (int, optional): number of points to add. Defaults to 1.
+        """
+
+        self.scores[field, i] += n
+        self.scores[self.TOTAL, i] += n
+
+    def set(self, field, values):
+        """Overwrites one score for all players
+
+        Args:
+            field (int): score index (COVERED, REINFORCED, DASHES or BONUSES)
+            values (list[int]): new value for each player
+        """
+
+        delta = np.asarray(values) - self.scores[field]
+        self.scores[field] += delta
+        self.scores[self.TOTAL] += delta
+
+    def move_cells(self, old, new):
+        """Updates covered cell counts when cells change owner
+
+        Args:
+            old (np.ndarray): previous drool ids of the cells (-1: none)
+            new (np.ndarray): new drool ids of the cells (-1: none)
+        """
+
+        n = self.n_players
+        delta = np.bincount(new[new >= 0] % n, minlength=n)
+        delta -= np.bincount(old[old >= 0] % n, minlength=n)
+        self.scores[self.COVERED] += delta
+        self.scores[self.TOTAL] += delta
+
+    def get(self, field, i):
+        """Returns one of a player's scores
+
+        Args:
+            field (int): score index
+            i (int): player id
+
+        Returns:
+            int: the score
+        """
+        return self.scores[field, i]
@@ -0,0 +1,817 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+from math import ceil, floor
+import random
+import struct
+
+import numpy as np
+
+from board import ChunkedBoard
+from codec import Reader, Writer
+from bonus import Bonus, Bomb, Row, Column, MagicalPotion
+from player import Player
+from protocol import Protocol
+from score_ledger import ScoreLedger
+from snapshot import Snapshot
+from zobrist import Zobrist
+
+class Simulation:
+    """Headless game state and rules, independent from pygame and the network.
+    The host's authoritative turn resolution lives here so that matches can be
+    simulated, tested and benchmarked without a window or a second device
+    """
+
+    WIDTH = 15  # Width of the grid
+    HEIGHT = 15  # Height of the grid
+    TIMER = 0.25  # Duration in seconds of a turn
+    DURATION = 89  # Duration in seconds of the whole game
+    COLLIDE_DURATION = 1  # Duration in seconds of the collision animation
+    COLLIDE_RADIUS = 4  # Radius in number of tiles of the collision shockwave
+    CHANGE_DTYPE = np.int32  # Type of the (x, y, id) trail change arrays
+    SYNCED_SCORES = [ScoreLedger.REINFORCED, ScoreLedger.DASHES, ScoreLedger.BONUSES]  # Scores sent by the host, the guest counts covered cells itself
+    KEYFRAME_INTERVAL = 20  # Number of turns between two keyframes sent by the host
+    KEYFRAME_CHUNKS = 4  # Maximum number of chunks per keyframe message
+    KEYFRAME_HEADER = struct.Struct(">H")  # Size of the trail part of a keyframe
+
+    def __init__(self, seed=None, n_players=2, width=None, height=None):
+        """Initializes a Simulation instance
+
+        Args:
+            seed (int, optional): seed of the random number generator. Defaults to None.
+            n_players (int, optional): number of players, up to len(Player.COLORS). Defaults to 2.
+            width (int, optional): width of the grid. Defaults to WIDTH.
+            height (int, optional): height of the grid. Defaults to HEIGHT.
+                Grids are stored in chunks, so both can go up to 65536.
+        """
+
+        if width is not None:
+            self.WIDTH = width
+        if height is not None:
+            self.HEIGHT = height
+        self.rng = random.Random(seed)
+        self.n_players = n_players
+        self.players = [
+            Player(self, i, *self.get_spawn(i))
+            for i in range(n_players)
+        ]
+        self.player = self.players[0]
+        self.bonus_list = [Bomb, Row, Column, MagicalPotion]
+        self.ledger = ScoreLedger(len(self.players))
+        self.capabilities = Protocol.CAPABILITIES
+        self.writer = Writer()
+        self.reset()
+
+    def reset(self):
+        """Resets the state and different values before a new game"""
+
+        self.trails = ChunkedBoard(self.WIDTH, self.HEIGHT)
+        for player in self.players:
+            player.reset(*self.get_spawn(player.i))
+        self.ledger.reset()
+
+        self.collide_start = 0
+        self.collide_pos = [0,0]
+        self.trail_changes = []
+        self.turn = 0
+
+        self.drool = ChunkedBoard(self.WIDTH, self.HEIGHT)
+        self.bonuses = ChunkedBoard(self.WIDTH, self.HEIGHT)
+        self.bonus_count = 0
+        self.bonus_changes = []
+        self.board_hash = 0
+        self.sent_scores = np.zeros([len(self.SYNCED_SCORES), self.n_players], dtype="int64")
+        self.sent_collision = (self.collide_start, *self.collide_pos)
+
+    def snapshot(self):
+        """Copies the current state. Must be called between two turns
+
+        Returns:
+            Snapshot: the copy
+        """
+
+        header = np.array((
+            self.WIDTH, self.HEIGHT, self.n_players, self.turn, self.bonus_count,
+            self.collide_start, self.collide_pos[0], self.collide_pos[1], self.board_hash
+        ), dtype=Snapshot.HEADER_DTYPE)
+        players = np.array([p.get_state() for p in self.players], dtype=Player.STATE_DTYPE)
+        boards = [self.trails.copy_chunks(), self.drool.copy_chunks(), self.bonuses.copy_chunks()]
+        return Snapshot(header, players, self.ledger.scores.copy(), boards, self.rng.getstate())
+
+    def restore(self, snapshot):
+        """Restores a state copied by snapshot. The snapshot stays unchanged
+        and can be restored again
+
+        Args:
+            snapshot (Snapshot): the copy
+
+        Raises:
+            ValueError: if the snapshot was taken on another grid size or number of players
+        """
+
+        header = snapshot.header
+        if (header["width"], header["height"], header["n_players"]) != (self.WIDTH, self.HEIGHT, self.n_players):
+            raise ValueError("Snapshot does not match the grid size or number of players")
+
+        self.turn = int(header["turn"])
+        self.bonus_count = int(header["bonus_count"])
+        self.collide_start = float(header["collide_start"])
+        self.collide_pos = [int(header["collide_x"]), int(header["collide_y"])]
+        for player, state in zip(self.players, snapshot.players.tolist()):
+            player.set_state(state)
+        self.ledger.scores[...] = snapshot.scores
+
+        for board, (keys, data) in zip((self.trails, self.drool, self.bonuses), snapshot.boards):
+            board.restore_chunks(keys, data)
+        self.rng.setstate(snapshot.rng_state)
+        self.board_hash = int(header["board_hash"])
+        self.trail_changes = []
+        self.bonus_changes = []
+
+    def is_host(self):
+        """Returns whether this instance resolves turns authoritatively
+
+        Returns:
+            bool: always True for a standalone simulation
+        """
+        return True
+
+    def time(self):
+        """Returns the simulated time since game start
+
+        Returns:
+            float: time in seconds
+        """
+        return self.turn * self.TIMER
+
+    def get_spawn(self, i):
+        """Returns the starting position of a player. Players are spread evenly
+        along the border of the grid, facing clockwise
+
+        Args:
+            i (int): player id
+
+        Returns:
+            tuple[int, int, int]: x, y and direction
+        """
+
+        w, h = self.WIDTH-1, self.HEIGHT-1
+        d = (i * 2*(w+h)) // self.n_players
+        if d < w:
+            return (d, 0, 0)
+        d -= w
+        if d < h:
+            return (w, d, 1)
+        d -= h
+        if d < w:
+            return (w-d, h, 2)
+        return (0, h-(d-w), 3)
+
+    def get_trail_id(self, player):
+        """Returns the id of the drool a player currently leaves
+
+        Args:
+            player (Player): the player
+
+        Returns:
+            int: player.i, or player.i + n_players when reinforced
+        """
+
+        if player.reinforced > 0:
+            return player.i + self.n_players
+        return player.i
+
+    def get_trail_count(self):
+        """Returns the number of cells covered in drool for each player
+
+        Returns:
+            tuple[int, ...]: counts for each player (red, blue, ...)
+        """
+        return tuple(self.ledger.scores[ScoreLedger.COVERED])
+
+    def start_turn(self):
+        """Starts a new turn"""
+
+        self.trail_changes = []
+        self.bonus_changes = []
+        for player in self.players:
+            player.lx, player.ly = player.x, player.y
+            player.x, player.y = player.nx, player.ny
+            player.dir %= 4
+            player.dash = False
+            player.reinforced = max(player.reinforced-1, 0)
+
+    def set_input(self, player, dir_, dash=False):
+        """Sets a player's input for the current turn
+
+        Args:
+            player (Player): player giving the input
+            dir_ (int): direction (0, 1, 2, 3 -> right, down, left, up)
+            dash (bool, optional): whether the player wants to dash. Defaults to False.
+        """
+
+        if (dash and player.candash()) or player.dash:
+            if not player.dash:
+                player.dash = True
+                player.usedash()
+            dir_ += 4
+        player.dir = dir_
+
+    def step(self, inputs):
+        """Plays a whole turn with the given inputs
+
+        Args:
+            inputs (list[tuple[int, bool]]): (direction, dash) for each player
+        """
+
+        for player, (dir_, dash) in zip(self.players, inputs):
+            self.set_input(player, dir_, dash)
+        self.end_turn()
+        self.start_turn()
+
+    def end_turn(self, spawn=True):
+        """Resolves the current turn: moves, trails, collisions, bonuses
+
+        Args:
+            spawn (bool, optional): whether new bonuses may be drawn. Defaults to True.
+        """
+
+        for player in self.players:
+            dx, dy = Player.OFFSETS[player.dir]
+            x, y = player.x, player.y
+            x2, y2 = x+dx, y+dy
+            x2 = max(0, min(self.WIDTH-1, x2))
+            y2 = max(0, min(self.HEIGHT-1, y2))
+
+            player.nx, player.ny = x2, y2
+            if player.dir > 3:
+                self.ledger.add(ScoreLedger.DASHES, player.i)
+                dx, dy = Player.OFFSETS[player.dir%4]
+                steps = np.arange(Player.DASH_SIZE)
+                tx, ty = x+dx*steps, y+dy*steps
+                inside = (0 <= tx) & (tx < self.WIDTH) & (0 <= ty) & (ty < self.HEIGHT)
+                self.set_trail_cells(tx[inside], ty[inside], self.get_trail_id(player))
+            else:
+                self.set_trail(x, y, self.get_trail_id(player))
+
+        self.check_collsion()
+
+        for player in self.players:
+            t = self.trails[player.ny, player.nx]
+            if t != -1 and t % self.n_players == player.i:
+                player.add_dashscore()
+            self.take_bonus(player.nx, player.ny, player)
+        self.apply_trail_changes(self.get_trail_changes())
+
+        if spawn:
+            Bonus.try_spawn(self)
+        self.turn += 1
+
+    def check_collsion(self):
+        """Checks the movements of each player to process collisions.
+        Moves are hashed by cell, so the cost grows linearly with the number
+        of players. Collisions involving a walking player are resolved first,
+        then dashes advance step by step, picking up bonuses before colliding.
+        BatchSimulation.check_collisions mirrors these rules and must change
+        with them, tests/test_batch_simulation.py checks that both agree
+        """
+
+        walkers = [p for p in self.players if p.dir <= 3]
+        dashers = [p for p in self.players if p.dir > 3]
+        collided = set()
+
+        # Walkers heading to the same cell
+        dests = {}
+        for p in walkers:
+            dests.setdefault((p.nx, p.ny), []).append(p)
+
+        starts = {(p.x, p.y): p for p in walkers}
+        for (nx, ny), group in list(dests.items()):
+            if len(group) > 1:
+                for p in group:
+                    p.nx, p.ny = p.x, p.y
+                collided.update(group)
+                self.collide((nx, ny), group)
+
+        # Walkers swapping cells
+        for p in walkers:
+            q = starts.get((p.nx, p.ny))
+            if q is None or q is p or p in collided or q in collided:
+                continue
+            if (q.nx, q.ny) == (p.x, p.y):
+                if p.x == q.x:
+                    center = (p.nx, p.ny)  # Vertical swaps collide on the first player's destination
+                else:
+                    center = ((p.x + q.x)/2, (p.y + q.y)/2)
+                p.nx, p.ny = p.x, p.y
+                q.nx, q.ny = q.x, q.y
+                collided.update((p, q))
+                self.collide(center, [p, q])
+
+        # Walkers standing in a dash's way
+        paths = []
+        for p in dashers:
+            xs, ys = self.get_dash_path(p, Player.DASH_SIZE)
+            paths.append((p, xs.tolist(), ys.tolist(), self.has_bonus(xs, ys)))
+            dx, dy = Player.OFFSETS[p.dir%4]
+            for x, y in zip(xs.tolist(), ys.tolist()):
+                hit = [q for q in dests.get((x, y), []) if q not in collided]
+                if len(hit) != 0:
+                    p.nx, p.ny = x - dx, y - dy
+                    for q in hit:
+                        q.nx, q.ny = q.x, q.y
+                    collided.add(p)
+                    collided.update(hit)
+                    self.collide((x, y), [p] + hit)
+                    break
+
+        # Dashes crossing each other on the same step
+        steps = {}
+        for p, xs, ys, found in paths:
+            for k in range(Player.DASH_SIZE-1):
+                steps.setdefault((k, xs[k], ys[k]), []).append(p)
+
+        limits = {p: Player.DASH_SIZE for p in dashers}
+        for k in range(Player.DASH_SIZE):
+            for p, xs, ys, found in paths:
+                if found[k] and k < limits[p]:
+                    self.take_bonus(xs[k], ys[k], p)
+
+            if k == Player.DASH_SIZE-1:
+                break
+            for p, xs, ys, found in paths:
+                group = [q for q in steps[(k, xs[k], ys[k])] if q not in collided]
+                if len(group) > 1:
+                    for q in group:
+                        dx, dy = Player.OFFSETS[q.dir%4]
+                        q.nx, q.ny = xs[k] - dx, ys[k] - dy
+                        limits[q] = k+1
+                    collided.update(group)
+                    self.collide((xs[k], ys[k]), group)
+
+    def get_dash_path(self, player, length):
+        """Returns the cells crossed by a dashing player, excluding its start
+
+        Args:
+            player (Player): dashing player
+            length (int): number of cells
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: x and y coordinates, which may lie outside the grid
+        """
+
+        dx, dy = Player.OFFSETS[player.dir%4]
+        steps = np.arange(1, length+1)
+        return player.x + dx*steps, player.y + dy*steps
+
+    def has_bonus(self, xs, ys):
+        """Looks up the bonus layer on several cells at once
+
+        Args:
+            xs (np.ndarray): x coordinates, possibly outside the grid
+            ys (np.ndarray): y coordinates, possibly outside the grid
+
+        Returns:
+            np.ndarray: boolean array, True where a bonus lies
+        """
+
+        inside = (0 <= xs) & (xs < self.WIDTH) & (0 <= ys) & (ys < self.HEIGHT)
+        found = np.zeros(len(xs), dtype=bool)
+        found[inside] = self.bonuses[ys[inside], xs[inside]] != -1
+        return found
+
+    def place_bonus(self, x, y, i):
+        """Places a bonus on the grid
+
+        Args:
+            x (int): x coordinate
+            y (int): y coordinate
+            i (int): bonus id (index in bonus_list)
+        """
+
+        self.bonuses[y, x] = i
+        self.bonus_count += 1
+        self.bonus_changes.append((x, y, i))
+        self.board_hash ^= Zobrist.cells_hash(Zobrist.BONUSES, y*self.WIDTH + x, i)
+
+    def take_bonus(self, x, y, player):
+        """Applies and removes the bonus at the given position, if any
+
+        Args:
+            x (int): x coordinate
+            y (int): y coordinate
+            player (Player): player picking up the bonus
+        """
+
+        i = self.bonuses[y, x]
+        if i == -1:
+            return
+        self.bonuses[y, x] = -1
+        self.bonus_count -= 1
+        self.bonus_changes.append((x, y, 255))
+        self.board_hash ^= Zobrist.cells_hash(Zobrist.BONUSES, y*self.WIDTH + x, i)
+        self.bonus_list[i].apply(x, y, self, player)
+
+    def get_bonus_changes(self):
+        """Returns the bonus cells which changed during this turn
+
+        Returns:
+            np.ndarray: (n, 3) array of (x, y, id) changes (id 255: removed)
+        """
+        return np.array(self.bonus_changes, dtype=self.CHANGE_DTYPE).reshape([-1, 3])
+
+    def apply_bonus_changes(self, changes):
+        """Writes bonus changes on the bonus layer
+
+        Args:
+            changes (np.ndarray): (n, 3) array of (x, y, id) changes (id 255: removed)
+        """
+
+        xs, ys, ids = changes[:, 0], changes[:, 1], changes[:, 2]
+        cells, old, new = [], [], []
+        for x, y, i in zip(xs.tolist(), ys.tolist(), ids.tolist()):
+            cells.append(y*self.WIDTH + x)
+            old.append(self.bonuses[y, x])
+            if i == 255:
+                if self.bonuses[y, x] != -1:
+                    self.bonus_count -= 1
+                self.bonuses[y, x] = -1
+            else:
+                if self.bonuses[y, x] == -1:
+                    self.bonus_count += 1
+                self.bonuses[y, x] = i
+            new.append(self.bonuses[y, x])
+
+        if len(cells) != 0:
+            self.board_hash ^= Zobrist.cells_hash(Zobrist.BONUSES, cells, old)
+            self.board_hash ^= Zobrist.cells_hash(Zobrist.BONUSES, cells, new)
+
+    def collide(self, center, players):
+        """Process a collision
+
+        Args:
+            center (tuple[int, int]): position in tiles of the collision's center
+            players (list[Player]): players involved in the collision
+        """
+
+        for p in players:
+            if not (p.dir == 0 and p.x == self.WIDTH-1) and not (p.dir == 1 and p.y == self.HEIGHT-1) and not (p.dir == 2 and p.x == 0) and not (p.dir == 3 and p.y== 0):
+                p.dir = (p.dir%4+2)%4
+
+        ox, oy = center
+
+        self.collide_start = self.time()
+        self.collide_pos = [int(ox), int(oy)]
+
+        x1, y1 = floor(ox-2), floor(oy-2)
+        x2, y2 = ceil(ox+2), ceil(oy+2)
+
+        x1, x2 = max(0, min(self.WIDTH-1, x1)), max(0, min(self.WIDTH-1, x2))
+        y1, y2 = max(0, min(self.HEIGHT-1, y1)), max(0, min(self.HEIGHT-1, y2))
+        self.set_trail_region(x1, y1, x2+1, y2+1, 255)
+
+    def set_trail(self, x, y, i):
+        """Sets the drool at a given position
+
+        Args:
+            x (int): x coordinate
+            y (int): y coordinate
+            i (int): drool id (player id, + n_players if reinforced, -1/255:none)
+        """
+
+        n = self.n_players
+        if i != -1 and i != 255:
+            cur = self.trails[y,x]
+            if i == cur: return
+            if i%n == cur%n:
+                if i < cur: return
+            elif cur >= n:
+                i = cur-n
+
+        if i >= n and i != 255:
+            self.ledger.add(ScoreLedger.REINFORCED, i%n)
+
+        self.trail_changes.append(np.array([[x, y, 255 if i == -1 else i]], dtype=self.CHANGE_DTYPE))
+
+    def set_trail_cells(self, xs, ys, i):
+        """Sets the drool on several cells at once, following the same priority
+        rules as set_trail. Cells are evaluated against the board as it was at
+        the start of the turn, and must not contain duplicates
+
+        Args:
+            xs (np.ndarray): x coordinates
+            ys (np.ndarray): y coordinates
+            i (int): drool id (player id, + n_players if reinforced, -1/255:none)
+
+        Returns:
+            np.ndarray: (n, 3) array of the recorded (x, y, id) changes
+        """
+
+        if i == -1 or i == 255:
+            ids = np.full(len(xs), 255, dtype=self.CHANGE_DTYPE)
+
+        else:
+            n = self.n_players
+            cur = self.trails[ys, xs].astype(self.CHANGE_DTYPE)
+            ids = np.full(len(xs), i, dtype=self.CHANGE_DTYPE)
+            same = cur%n == i%n
+            keep = (cur != i) & ~(same & (i < cur))
+            weakened = ~same & (cur >= n)
+            ids[weakened] = cur[weakened]-n
+            xs, ys, ids = xs[keep], ys[keep], ids[keep]
+
+            if i >= n:
+                self.ledger.add(ScoreLedger.REINFORCED, i%n, np.count_nonzero(ids >= n))
+
+        changes = np.empty([len(ids), 3], dtype=self.CHANGE_DTYPE)
+        changes[:, 0], changes[:, 1], changes[:, 2] = xs, ys, ids
+        if len(changes) != 0:
+            self.trail_changes.append(changes)
+        return changes
+
+    def set_trail_region(self, x1, y1, x2, y2, i):
+        """Sets the drool on a rectangular region (end coordinates excluded)
+
+        Args:
+            x1 (int): left coordinate
+            y1 (int): top coordinate
+            x2 (int): right coordinate (excluded)
+            y2 (int): bottom coordinate (excluded)
+            i (int): drool id (player id, + n_players if reinforced, -1/255:none)
+
+        Returns:
+            np.ndarray: (n, 3) array of the recorded (x, y, id) changes
+        """
+
+        ys, xs = np.mgrid[y1:y2, x1:x2]
+        return self.set_trail_cells(xs.ravel(), ys.ravel(), i)
+
+    def get_trail_changes(self):
+        """Returns all the trail changes recorded during this turn
+
+        Returns:
+            np.ndarray: (n, 3) array of (x, y, id) changes, in order
+        """
+
+        if len(self.trail_changes) == 0:
+            return np.empty([0, 3], dtype=self.CHANGE_DTYPE)
+        return np.concatenate(self.trail_changes)
+
+    def apply_trail_changes(self, changes):
+        """Writes trail changes on the board and updates covered cell counts.
+        When a cell appears several times, the last change wins
+
+        Args:
+            changes (np.ndarray): (n, 3) array of (x, y, id) changes
+        """
+
+        xs, ys, ids = changes[:, 0], changes[:, 1], changes[:, 2]
+        cells = ys.astype(np.int64)*self.WIDTH + xs
+        if len(changes) > 1:
+            _, last = np.unique(cells[::-1], return_index=True)
+            last = len(cells)-1-last
+            xs, ys, ids, cells = xs[last], ys[last], ids[last], cells[last]
+
+        ids = np.where(ids == 255, -1, ids)
+        old = self.trails[ys, xs]
+        self.ledger.move_cells(old, ids)
+        keys = Zobrist.cell_keys(Zobrist.TRAILS, np.concatenate([cells, cells]), np.concatenate([old, ids]))
+        self.board_hash ^= int(np.bitwise_xor.reduce(keys))
+        self.trails[ys, xs] = ids
+        self.drool[ys, xs] = Zobrist.drool_variants(keys[len(ids):])
+
+    def get_move(self, x, y, dir_):
+        """Returns where a direction leads a player, inside the grid, before
+        collisions. Sync messages only carry next positions which differ
+
+        Args:
+            x (int): x position of the player
+            y (int): y position of the player
+            dir_ (int): direction, plus 4 when dashing
+
+        Returns:
+            tuple[int, int]: next position
+        """
+
+        dx, dy = Player.OFFSETS[dir_]
+        return (max(0, min(self.WIDTH-1, x+dx)), max(0, min(self.HEIGHT-1, y+dy)))
+
+    def encode_sync(self):
+        """Encodes the host's end of turn message, which only carries what
+        changed since its previous one. Fields are written in place in a
+        buffer reused from one turn to the next
+
+        Returns:
+            bytes: the message
+        """
+
+        writer = self.writer
+        writer.reset()
+        writer.byte(Protocol.TURN_END_HOST)
+        writer.byte(0)  # Flags, written once known
+
+        positions = []
+        for player in self.players:
+            state = player.dir | player.dashscore << 3
+            # Positions which follow from the direction are left out
+            if (player.nx, player.ny) != self.get_move(player.x, player.y, player.dir):
+                state |= Protocol.MOVED
+                positions += [player.nx, player.ny]
+            writer.byte(state)
+        writer.varints(positions)
+
+        flags = 0
+        trail_changes = self.get_trail_changes()
+        if len(trail_changes) != 0:
+            flags |= Protocol.HAS_TRAILS
+            Protocol.write_changes(writer, trail_changes, self.WIDTH)
+
+        bonus_changes = self.get_bonus_changes()
+        if len(bonus_changes) != 0:
+            flags |= Protocol.HAS_BONUSES
+            Protocol.write_changes(writer, bonus_changes, self.WIDTH)
+
+        scores = self.ledger.scores[self.SYNCED_SCORES]
+        deltas = (scores - self.sent_scores).ravel()
+        changed = np.flatnonzero(deltas)
+        if len(changed) != 0:
+            flags |= Protocol.HAS_SCORES
+            self.sent_scores = scores.copy()
+            writer.varint(len(changed))
+            writer.varints(changed)
+            writer.varints(Protocol.zigzag(deltas[changed]))
+
+        collision = (self.collide_start, *self.collide_pos)
+        if collision != self.sent_collision:
+            flags |= Protocol.HAS_COLLISION
+            self.sent_collision = collision
+            writer.pack(Protocol.TIME_STRUCT, self.collide_start)
+            writer.varints(self.collide_pos)
+
+        if self.capabilities & Protocol.HASH:
+            flags |= Protocol.HAS_HASH
+            writer.pack(Protocol.HASH_STRUCT, self.get_hash() & Protocol.HASH_MASK)
+
+        writer.buffer[1] = flags
+        return writer.getvalue()
+
+    def decode_sync(self, data, starts=None):
+        """Parses an end of turn message made by encode_sync, without copying it
+
+        Args:
+            data (bytes): the message
+            starts (list[tuple[int, int]], optional): positions the players leave
+                in the decoded turn. Defaults to their current positions.
+
+        Returns:
+            dict: keyword arguments of Game.sync
+        """
+
+        n = self.n_players
+        reader = Reader(data)
+        reader.byte()  # Type
+        flags = reader.byte()
+        states = reader.array(n).tolist()
+        moved = [state & Protocol.MOVED != 0 for state in states]
+        positions = iter(reader.varints(2*sum(moved)).tolist())
+        if starts is None:
+            starts = [(player.x, player.y) for player in self.players]
+        players = []
+        for (x, y), state, m in zip(starts, states, moved):
+            pos = (next(positions), next(positions)) if m else self.get_move(x, y, state & 7)
+            players.append((*pos, state & 7, state >> 3 & 7))
+
+        info = {"players": players}
+        for flag, key in ((Protocol.HAS_TRAILS, "trails"), (Protocol.HAS_BONUSES, "bonuses")):
+            if flags & flag:
+                info[key] = Protocol.read_changes(reader, self.WIDTH, self.CHANGE_DTYPE)
+            else:
+                info[key] = np.empty([0, 3], dtype=self.CHANGE_DTYPE)
+
+        if flags & Protocol.HAS_SCORES:
+            count = reader.varint()
+            changed = reader.varints(count)
+            deltas = reader.varints(count)
+            score_changes = np.zeros(len(self.SYNCED_SCORES)*n, dtype="int64")
+            score_changes[changed] = Protocol.unzigzag(deltas)
+            info["score_changes"] = score_changes.reshape([-1, n])
+
+        if flags & Protocol.HAS_COLLISION:
+            info["col_start"], = reader.unpack(Protocol.TIME_STRUCT)
+            info["col_x"], info["col_y"] = reader.varint(), reader.varint()
+
+        if flags & Protocol.HAS_HASH:
+            info["state_hash"], = reader.unpack(Protocol.HASH_STRUCT)
+        return info
+
+    def apply_sync(self, players, trails=None, bonuses=None, col_start=None, col_x=None, col_y=None, score_changes=None):
+        """Applies an end of turn message decoded by decode_sync
+
+        Args:
+            players (list[tuple[int, int, int, int]]): (x, y, direction, dashscore) of each player
+            trails (np.ndarray, optional): (n, 3) array of trail changes. Defaults to None.
+            bonuses (np.ndarray, optional): (n, 3) array of bonus changes. Defaults to None.
+            col_start (float, optional): start time of a new collision. Defaults to None.
+            col_x (int, optional): x position of the new collision. Defaults to None.
+            col_y (int, optional): y position of the new collision. Defaults to None.
+            score_changes (np.ndarray, optional): changes of the SYNCED_SCORES fields. Defaults to None.
+        """
+
+        for player, (x, y, d, ds) in zip(self.players, players):
+            player.lx = player.x
+            player.ly = player.y
+            player.nx = x
+            player.ny = y
+            player.dir = d
+            player.dashscore = ds
+
+        if score_changes is not None:
+            for field, changes in zip(self.SYNCED_SCORES, score_changes):
+                self.ledger.set(field, self.ledger.scores[field] + changes)
+
+        if trails is not None:
+            self.apply_trail_changes(trails)
+            self.apply_bonus_changes(bonuses)
+        if col_start is not None:
+            self.collide_start = col_start
+            self.collide_pos = [col_x, col_y]
+
+    def get_keyframes(self, full=False):
+        """Encodes the trail and bonus chunks written since the last keyframe.
+        Chunks are split in groups of KEYFRAME_CHUNKS so that each keyframe
+        fits in a single message
+
+        Args:
+            full (bool, optional): encode every allocated chunk instead. Defaults to False.
+
+        Returns:
+            list[bytes]: encoded keyframes
+        """
+
+        trails_keys = set(self.trails.chunks) if full else self.trails.take_dirty()
+        bonuses_keys = set(self.bonuses.chunks) if full else self.bonuses.take_dirty()
+        keys = sorted(trails_keys | bonuses_keys)
+
+        keyframes = []
+        for j in range(0, len(keys), self.KEYFRAME_CHUNKS):
+            group = keys[j:j+self.KEYFRAME_CHUNKS]
+            trails = self.trails.encode([k for k in group if k in trails_keys])
+            bonuses = self.bonuses.encode([k for k in group if k in bonuses_keys])
+            keyframes.append(self.KEYFRAME_HEADER.pack(len(trails)) + trails + bonuses)
+        return keyframes
+
+    def load_keyframe(self, data):
+        """Overwrites trail and bonus chunks with the content of a keyframe
+
+        Args:
+            data (bytes): keyframe made by get_keyframes. A memoryview avoids copying it
+        """
+
+        data = memoryview(data)
+        size, = self.KEYFRAME_HEADER.unpack_from(data)
+        start = self.KEYFRAME_HEADER.size
+        for key, chunk in self.trails.decode(data[start:start+size]):
+            old = self.trails.set_chunk(key, chunk)
+            cells = self.trails.get_chunk_cells(key)
+            self.ledger.move_cells(old.ravel(), chunk.ravel())
+            keys = Zobrist.cell_keys(Zobrist.TRAILS, cells, chunk)
+            self.board_hash ^= Zobrist.cells_hash(Zobrist.TRAILS, cells, old) ^ int(np.bitwise_xor.reduce(keys, axis=None))
+            self.drool.set_chunk(key, Zobrist.drool_variants(keys))
+
+        for key, chunk in self.bonuses.decode(data[start+size:]):
+            old = self.bonuses.set_chunk(key, chunk)
+            cells = self.bonuses.get_chunk_cells(key)
+            self.bonus_count += np.count_nonzero(chunk != -1) - np.count_nonzero(old != -1)
+            self.board_hash ^= Zobrist.cells_hash(Zobrist.BONUSES, cells, old) ^ Zobrist.cells_hash(Zobrist.BONUSES, cells, chunk)
+
+    def clear_boards(self):
+        """Empties the trail and bonus layers, before loading keyframes of the whole board"""
+
+        self.trails.clear()
+        self.drool.clear()
+        self.bonuses.clear()
+        self.bonus_count = 0
+        self.ledger.set(ScoreLedger.COVERED, np.zeros(self.n_players, dtype="int64"))
+        self.board_hash = 0
+
+    def compute_board_hash(self):
+        """Computes the hash of the trail and bonus layers from scratch
+
+        Returns:
+            int: hash of the layers
+        """
+
+        h = 0
+        for layer, board in ((Zobrist.TRAILS, self.trails), (Zobrist.BONUSES, self.bonuses)):
+            for key, chunk in board.chunks.items():
+                h ^= Zobrist.cells_hash(layer, board.get_chunk_cells(key), chunk)
+        return h
+
+    def get_hash(self):
+        """Returns the hash of the synchronized state: trails, bonuses and
+        the players' next positions, directions and dash scores
+
+        Returns:
+            int: 64-bit hash
+        """
+        return self.board_hash ^ Zobrist.players_hash(self.players)
@@ -0,0 +1,116 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import math
+import struct
+
+import numpy as np
+
+from board import ChunkedBoard
+from player import Player
+
+class Snapshot:
+    """Copy of a simulation's state between two turns, kept in a few
+    contiguous arrays so that it can be taken, restored and serialized quickly
+    """
+
+    MAGIC = b"SDSS"
+    VERSION = 2
+    HEADER_DTYPE = np.dtype([
+        ("width", "<u4"), ("height", "<u4"), ("n_players", "u1"),
+        ("turn", "<u4"), ("bonus_count", "<u4"),
+        ("collide_start", "<f8"), ("collide_x", "<u4"), ("collide_y", "<u4"),
+        ("board_hash", "<u8")
+    ])  # Layout of the scalar game state
+    SCORES_DTYPE = np.dtype("<i8")  # Type of the score ledger
+    RNG_SIZE = 625  # Number of words in the random generator's state
+    PREFIX = struct.Struct("<4sB")  # Magic and version
+    COUNT = struct.Struct("<I")  # Number of chunks of a board
+    GAUSS = struct.Struct("<d")  # Random generator's pending gaussian value (NaN: none)
+
+    def __init__(self, header, players, scores, boards, rng_state):
+        """Initializes a Snapshot instance
+
+        Args:
+            header (np.ndarray): HEADER_DTYPE record
+            players (np.ndarray): Player.STATE_DTYPE records, one per player
+            scores (np.ndarray): copy of the score ledger
+            boards (list[tuple[np.ndarray, np.ndarray]]): trail, drool and bonus chunks, as made by ChunkedBoard.copy_chunks
+            rng_state (tuple): state of the random generator
+        """
+
+        self.header = header
+        self.players = players
+        self.scores = scores
+        self.boards = boards
+        self.rng_state = rng_state
+
+    def to_bytes(self):
+        """Serializes the snapshot. The format only depends on VERSION
+
+        Returns:
+            bytes: serialized snapshot
+        """
+
+        version, words, gauss = self.rng_state
+        parts = [
+            self.PREFIX.pack(self.MAGIC, self.VERSION),
+            self.header.tobytes(),
+            self.players.tobytes(),
+            self.scores.astype(self.SCORES_DTYPE).tobytes(),
+            np.array(words, dtype="<u4").tobytes(),
+            self.GAUSS.pack(math.nan if gauss is None else gauss)
+        ]
+        for keys, data in self.boards:
+            parts.append(self.COUNT.pack(len(keys)))
+            parts.append(keys.astype("<u4").tobytes())
+            parts.append(data.tobytes())
+        return b"".join(parts)
+
+    def from_bytes(data):
+        """Parses a snapshot serialized by to_bytes
+
+        Args:
+            data (bytes): serialized snapshot
+
+        Raises:
+            ValueError: if the data is not a snapshot of this version
+
+        Returns:
+            Snapshot: the snapshot
+        """
+
+        magic, version = Snapshot.PREFIX.unpack_from(data)
+        if magic != Snapshot.MAGIC or version != Snapshot.VERSION:
+            raise ValueError("Unsupported snapshot format")
+        offset = Snapshot.PREFIX.size
+
+        header = np.frombuffer(data, dtype=Snapshot.HEADER_DTYPE, count=1, offset=offset)[0].copy()
+        offset += Snapshot.HEADER_DTYPE.itemsize
+        n = int(header["n_players"])
+
+        players = np.frombuffer(data, dtype=Player.STATE_DTYPE, count=n, offset=offset).copy()
+        offset += Player.STATE_DTYPE.itemsize * n
+
+        scores = np.frombuffer(data, dtype=Snapshot.SCORES_DTYPE, count=5*n, offset=offset)
+        scores = scores.reshape([5, n]).astype("int64")
+        offset += Snapshot.SCORES_DTYPE.itemsize * 5*n
+
+        words = np.frombuffer(data, dtype="<u4", count=Snapshot.RNG_SIZE, offset=offset)
+        offset += 4 * Snapshot.RNG_SIZE
+        gauss = Snapshot.GAUSS.unpack_from(data, offset)[0]
+        offset += Snapshot.GAUSS.size
+        rng_state = (3, tuple(words.tolist()), None if math.isnan(gauss) else gauss)
+
+        boards = []
+        c = ChunkedBoard.CHUNK_SIZE
+        for _ in range(3):
+            count = Snapshot.COUNT.unpack_from(data, offset)[0]
+            offset += Snapshot.COUNT.size
+            keys = np.frombuffer(data, dtype="<u4", count=count, offset=offset).astype("int64")
+            offset += 4 * count
+            chunks = np.frombuffer(data, dtype="int8", count=c*c*count, offset=offset)
+            boards.append((keys, chunks.reshape([count, c, c]).copy()))
+            offset += c*c * count
+
+        return Snapshot(header, players, scores, boards, rng_state)
@@ -1,290 +1,266 @@
 #Snaildash is a small game created in the scope of a school project
 #Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
 
+import asyncio
 import socket
 import threading
-import time
+
+from transport import ArqProtocol, StreamProtocol
 
 class SocketHandler:
-    """Class handling communication between the two devices"""
-    
-    SEND_INTERVAL = 0.1  # interval in seconds between send loops
+    """Class handling communication between the two devices. The match-making
+    connection, the handshake, the transport timers and the receive handling
+    all run on a single asyncio event loop in a background thread. The
+    manager is called from that thread:
+    - on_paired(is_host, ousername) once the server paired the players
+    - on_connected() once messages can be sent
+    - on_receive(data) with each message, in order. data is a bytes-like
+      object only valid during the call
+    - on_lost() when the connection is lost
+    """
+
     LAN = 0
     WAN = 1
-    MSG_SEP = b"<->"
-    
+    RECV_SIZE = 2048  # Maximum size of a match-making server message
+    CLOSE_TIMEOUT = 1  # Maximum duration in seconds spent flushing the last messages when quitting
+
     def __init__(self, manager):
         """Initializes a SocketHandler instance
 
         Args:
             manager (Manager): manager instance
         """
-        
+
         self.manager = manager
         self.running = False
-        self.sock = None
-        self.in_thread = None
-        self.out_thread = None
-        self.connect_s = None
+        self.loop = None
+        self.thread = None
         self.type = None
-    
+        self.reset()
+
     def reset(self):
-        """Resets messages state"""
-        
-        self._msgs = {}
-        self._last_recv = -1
-        self._latest = -1
-        self._msg_id = 0
+        """Resets connection state"""
+
+        self.protocol = None
+        self._task = None
         self.type = None
-    
+        self.is_host = False
+
     def connect(self):
-        """Connects to the match-making server and waits for opponent"""
-        
+        """Starts the event loop thread, which connects to the match-making
+        server and waits for an opponent
+        """
+
         self.reset()
         self.running = True
-        
-        if self.connect_s is None:
-            self.connect_s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.connect_s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            
-            config = self.manager.config["connection_server"]
-            self.connect_s.connect((config["url"], config["port"]))
-            self.connect_s.settimeout(2)
-
-            local_ip, local_port = self.connect_s.getsockname()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run_loop, args=(self.loop,), daemon=True)
+        self.thread.start()
+
+    def run_loop(self, loop):
+        """Runs the event loop until the connection ends. Runs in the network thread
+
+        Args:
+            loop (asyncio.AbstractEventLoop): the event loop
+        """
+
+        asyncio.set_event_loop(loop)
+        try:
+            self._task = loop.create_task(self.main())
+            loop.run_until_complete(self._task)
+        finally:
+            loop.close()
+
+    async def main(self):
+        """Connects to the opponent, then keeps the connection open until quit"""
+
+        try:
+            await self.wait_for_opponent()
+            await asyncio.Future()  # Until cancelled by quit
+
+        except asyncio.CancelledError:
+            pass
+
+        except (OSError, ValueError):
+            # Unreachable server or opponent, or malformed pairing message
+            self.on_lost()
+
+        finally:
+            if self.protocol is not None:
+                self.protocol.close()
+                if isinstance(self.protocol, StreamProtocol):
+                    # Let the last messages, such as quit, reach the opponent
+                    try:
+                        await asyncio.wait_for(self.protocol.closed, self.CLOSE_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        pass
+
+    async def wait_for_opponent(self):
+        """Registers on the match-making server and waits for an opponent"""
+
+        loop = asyncio.get_running_loop()
+        config = self.manager.config["connection_server"]
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setblocking(False)
+        reader = writer = None
+        connected = False
+        try:
+            host, port = config["url"], config["port"]
+            addr = (await loop.getaddrinfo(host, port, family=socket.AF_INET, type=socket.SOCK_STREAM))[0][4]
+            await loop.sock_connect(sock, addr)
+            reader, writer = await asyncio.open_connection(sock=sock)
+
+            local_ip, local_port = sock.getsockname()
             musername = self.manager.musername
-            msg = f"{local_ip}|{local_port}|{musername}"
             self.local_addr = (local_ip, local_port)
-            self.connect_s.sendall(msg.encode("utf-8"))
-            self.connect_thread = threading.Thread(target=self.wait_for_opponent)
-            self.connect_thread.start()
-        
-    
-    def wait_for_opponent(self):
-        """Waits for opponent asynchronously"""
-        
-        connected = False
-        while self.running:
-            try:
-                data = self.connect_s.recv(2048)
-            
-            except socket.timeout:
-                continue
-            
+            writer.write(f"{local_ip}|{local_port}|{musername}".encode("utf-8"))
+
+            while True:
+                data = await reader.read(self.RECV_SIZE)
+                if data == b"":
+                    raise ConnectionError("The match-making server closed the connection")
+                if not data.startswith(b"ping"):
+                    break
+
+            is_host, is_lan, pub_ip, pub_port, priv_ip, priv_port, ousername = data.decode("utf-8").split("|", 6)
+            is_host, is_lan, pub_port, priv_port = bool(int(is_host)), bool(int(is_lan)), int(pub_port), int(priv_port)
+
+            self.type = self.LAN if is_lan else self.WAN
+            self.is_host = is_host
+            self.manager.on_paired(is_host, ousername)
+
+            self.pub_addr = (pub_ip, pub_port)
+            self.priv_addr = (priv_ip, priv_port)
+
+            if self.type == self.WAN:
+                await self.finalize_wan_connection()
+
             else:
-                if data.startswith(b"ping"): continue
-                
-                is_host, is_lan, pub_ip, pub_port, priv_ip, priv_port, self.manager.ousername = data.decode("utf-8").split("|", 6)
-                is_host, is_lan, pub_port, priv_port = bool(int(is_host)), bool(int(is_lan)), int(pub_port), int(priv_port)
-
-                self.type = self.LAN if is_lan else self.WAN
-
-                if is_host:
-                    self.manager.init_host()
-                else:
-                    self.manager.init_guest()
-                
-                self.pub_addr = (pub_ip, pub_port)
-                self.priv_addr = (priv_ip, priv_port)
-                
-                if self.type == self.WAN:
-                    self.finalize_wan_connection()
-                
-                else:
-                    self.finalize_lan_connection()
-                
-                connected = True
-                break
-        
-        if not connected:
-            self.connect_s.sendall(b"cancel")
-        
-        self.connect_s.close()
-        self.connect_s = None
-    
-    def finalize_wan_connection(self):
-        """Establishes the connection with the opponent (WAN)"""
-        
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        #self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
-        self.sock.bind(self.local_addr)
-        self.sock.settimeout(0.1)
-
-        while self.running:
-            self.sock.sendto(b"handshake-priv|0", self.priv_addr)
-            self.sock.sendto(b"handshake-pub|0", self.pub_addr)
-            try:
-                data = self.sock.recv(2048)
-            except socket.timeout:
-                data = b""
-            
-            if data == b"handshake-priv|1":
-                self.sock.connect(self.priv_addr)
-                self.type = self.LAN
-                break
-            
-            elif data == b"handshake-pub|1":
-                self.sock.connect(self.pub_addr)
-                self.type = self.WAN
-                break
-                
-            elif data == b"handshake-priv|0":
-                self.sock.sendto(b"handshake-priv|1", self.priv_addr)
-                
-            elif data == b"handshake-pub|0":
-                self.sock.sendto(b"handshake-pub|1", self.pub_addr)
-        
-        if self.running:
-            m = f"handshake-{['priv', 'pub'][self.type]}|1"
-            self._msgs[-1] = [m, False]
-        
-        self.sock.settimeout(1)
-        self.in_thread = threading.Thread(target=self.listen_loop)
-        self.out_thread = threading.Thread(target=self.send_loop)
-        
-        self.in_thread.start()
-        self.out_thread.start()
-        
+                await self.finalize_lan_connection()
+
+            connected = True
+
+        finally:
+            if writer is None:
+                sock.close()
+            else:
+                if not connected:
+                    writer.write(b"cancel")
+                writer.close()
+
         self.manager.on_connected()
-    
-    def finalize_lan_connection(self):
+
+    def make_socket(self, type_):
+        """Creates a non-blocking socket bound to the match-making connection's
+        local address, which the server told the opponent
+
+        Args:
+            type_ (int): socket.SOCK_STREAM or socket.SOCK_DGRAM
+
+        Returns:
+            socket.socket: the socket
+        """
+
+        sock = socket.socket(socket.AF_INET, type_)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        #sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(self.local_addr)
+        sock.setblocking(False)
+        return sock
+
+    async def finalize_wan_connection(self):
+        """Establishes the connection with the opponent (WAN)"""
+
+        loop = asyncio.get_running_loop()
+        sock = self.make_socket(socket.SOCK_DGRAM)
+        transport, protocol = await loop.create_datagram_endpoint(
+            lambda: ArqProtocol(self.on_message, self.on_lost),
+            sock=sock
+        )
+        self.protocol = protocol
+        # Whichever address answered, messages go through the ARQ
+        self.type = [self.LAN, self.WAN][await protocol.punch([self.priv_addr, self.pub_addr])]
+
+    async def finalize_lan_connection(self):
         """Establishes the connection with the opponent (LAN)"""
-        
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        #self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
-        self.sock.bind(self.local_addr)
-        
-        if self.manager.is_host():
-            self.sock.listen(1)
-            conn, addr = self.sock.accept()
-            self.sock.close()
-            self.sock = conn
-        
-        else:
-            self.sock.connect(self.priv_addr)
-        
-        self.sock.settimeout(1)
-        
-        if self.type == self.WAN:
-            self.in_thread = threading.Thread(target=self.listen_loop_wan)
-        
-        else:
-            self.in_thread = threading.Thread(target=self.listen_loop_lan)
-        self.in_thread.start()
-        
-        self.manager.on_connected()
 
-    def sock_send(self, msg):
-        """Sends a message through the socket. If the socket is closed,
-        the message will silently be ignored
+        loop = asyncio.get_running_loop()
+        sock = self.make_socket(socket.SOCK_STREAM)
+        try:
+            if self.is_host:
+                sock.listen(1)
+                conn, addr = await loop.sock_accept(sock)
+                sock.close()
+                sock = conn
+
+            else:
+                await loop.sock_connect(sock, self.priv_addr)
+
+        except BaseException:
+            sock.close()
+            raise
+
+        transport, protocol = await loop.create_connection(
+            lambda: StreamProtocol(self.on_message, self.on_lost),
+            sock=sock
+        )
+        self.protocol = protocol
+
+    def on_message(self, data):
+        """Passes a received message on to the manager. Runs in the network thread
 
         Args:
-            msg (str or bytes): the message to send
+            data (bytes): the message
         """
-        
-        if not self.running or self.sock is None: return
-        if isinstance(msg, str):
-            msg = msg.encode("utf-8")
-        
-        msg += self.MSG_SEP
-        self.sock.sendall(msg)
-
-    def listen_loop_wan(self):
-        """Listens for incoming messages asynchronously and responds accordingly.
-        This method implements TCP features over UDP
+
+        if self.running:
+            self.manager.on_receive(data)
+
+    def on_lost(self):
+        """Leaves the game when the connection is lost. Runs in the network thread"""
+
+        if self.running:
+            self.manager.on_lost()
+
+    def deliver(self, msg):
+        """Sends a message through the transport. Runs in the network thread
+
+        Args:
+            msg (bytes): the message
         """
-        
-        while self.running:
-            try:
-                data = self.sock.recv(2048)
-            except:
-                continue
-            
-            msgs = data.split(self.MSG_SEP)
-
-            for data in msgs:
-                if data == "": continue
-                if data.startswith(b"handshake"): continue
-                
-                data = data.split(b"|", 2)
-                type_, id_ = data[:2]
-                id_ = int(id_.decode("utf-8"))
-                
-                # Message
-                if type_ == b"msg":
-                    if id_ > self._last_recv+1:
-                        self._latest = max(self._latest, id_)
-                        self.sock_send(f"res|{self._last_recv+1}")
-                    
-                    elif id_ <= self._last_recv:
-                        self.sock_send(f"ack|{id_}")
-                        
-                    else:
-                        self.manager.on_receive(data[2])
-                        if id_ < self._latest:
-                            self.sock_send(f"res|{id_+1}")
-                        
-                        else:
-                            self._latest = id_
-                        
-                        self._last_recv = id_
-                
-                # Acknowledge
-                elif type_ == b"ack":
-                    self._msgs[id_][1] = True
-                
-                # Resend
-                elif type_ == b"res":
-                    self.sock_send(self._msgs[id_][0])
-    
-    def listen_loop_lan(self):
-        """Listens for incoming messages asynchronously over TCP."""
-        
-        while self.running:
-            try:
-                data = self.sock.recv(2048)
-            except:
-                continue
-            
-            msgs = data.split(self.MSG_SEP)
-
-            for data in msgs:
-                if data == "": continue
-                self.manager.on_receive(data)
-
-    def send_loop(self):
-        """Sends un-acknowledged messages asynchronously every SEND_INTERVAL seconds"""
-        
-        while self.running:
-            msgs = self._msgs.copy()
-            for id_, [msg, ack] in msgs.items():
-                if not ack:
-                    self.sock_send(msg)
-            
-            time.sleep(self.SEND_INTERVAL)
+
+        if self.protocol is not None:
+            self.protocol.send(msg)
 
     def send(self, msg):
-        """Adds a msg to the send queue
+        """Sends a message to the opponent. Messages sent before the
+        connection is established are dropped
 
         Args:
             msg (bytes): data to send
         """
-        
-        if self.type == self.WAN:
-            m = f"msg|{self._msg_id}|"
-            msg = m.encode("utf-8")+msg
-            self._msgs[self._msg_id] = [msg, False]
-            self._msg_id += 1
-        
-        self.sock_send(msg)
-    
+
+        if not self.running or self.loop is None: return
+        try:
+            self.loop.call_soon_threadsafe(self.deliver, msg)
+        except RuntimeError:
+            pass  # The event loop is closed
+
     def quit(self):
-        """Closes the socket and stops the listening thread"""
-        
+        """Closes the connection once the messages already sent are flushed,
+        and stops the event loop thread
+        """
+
         if self.running:
             self.running = False
-            if self.sock:
-                self.sock.close()
-                self.sock = None
\ No newline at end of file
+            try:
+                self.loop.call_soon_threadsafe(self.cancel)
+            except RuntimeError:
+                pass  # The event loop is closed
+
+    def cancel(self):
+        """Cancels the connection task. Runs in the network thread"""
+
+        if self._task is not None:
+            self._task.cancel()
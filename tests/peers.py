@@ -0,0 +1,144 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import collections
+import random
+import types
+
+import pygame
+
+from game import Game
+from manager import Manager
+from message_queue import MessageQueue
+from protocol import Protocol
+from stage import Stage
+
+KEYS = [pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_SPACE]
+
+class Link:
+    """One direction of an in-memory connection, delivering messages in
+    order after a fixed latency
+    """
+
+    def __init__(self, peer, latency):
+        self.peer = peer
+        self.latency = latency
+        self.messages = collections.deque()
+        self.sent = 0
+
+    def send(self, msg):
+        self.messages.append((self.peer.now + self.latency, bytes(msg)))
+        self.sent += len(msg)
+
+    def deliver(self, now):
+        while len(self.messages) != 0 and self.messages[0][0] <= now:
+            self.peer.other.manager.on_receive(self.messages.popleft()[1])
+
+class Peer:
+    """Manager without window or sound, driven by a simulated clock"""
+
+    def __init__(self, is_host, latency, capabilities, input_delay, seed):
+        self.now = 0
+        self.quits = 0
+        self.other = None
+        self.started = False
+        self.manager = manager = Manager.__new__(Manager)
+        manager.stage = Stage.COUNTDOWN
+        manager._is_host = is_host
+        manager.time_origin = 0
+        manager.time = lambda: self.now
+        manager.quit_game = self.quit_game
+        manager.send_score = lambda: None
+        manager.inbox = MessageQueue()
+        manager.inbox_overflow = False
+        manager.handlers = {
+            Protocol.QUIT: manager.on_quit,
+            Protocol.HELLO: manager.on_hello,
+            Protocol.KEYFRAME: manager.on_keyframe,
+            Protocol.RESYNC: manager.on_resync,
+            Protocol.TURN_END_HOST: manager.on_turn_end,
+            Protocol.INPUT: manager.on_input
+        }
+        manager.capabilities = capabilities
+        manager.seed = seed
+        manager.input_delay = input_delay
+        manager.socket_handler = Link(self, latency)
+        manager.game = Game(manager)
+        if is_host:
+            manager.game.init_host()
+        else:
+            manager.game.init_guest()
+
+    @property
+    def game(self):
+        return self.manager.game
+
+    def quit_game(self):
+        self.quits += 1
+        self.manager.stage = Stage.MAIN_MENU
+
+    def step(self, now, start, rng=None):
+        """Runs a frame: delivers the messages due, starts the game once
+        the countdown is over and presses random keys
+        """
+
+        self.now = now
+        self.other.manager.socket_handler.deliver(now)
+        self.manager.process_inbox()
+        if not self.started and now >= start:
+            self.started = True
+            self.manager.stage = Stage.IN_GAME
+            self.now = start
+            self.game.start()
+            self.now = now
+        if self.manager.stage == Stage.IN_GAME:
+            scheduler = self.game.scheduler
+            if rng is not None and rng.random() < 0.05 and scheduler.committed < scheduler.turns - 1:
+                self.game.handle_key(types.SimpleNamespace(key=rng.choice(KEYS), mod=0))
+            self.manager.handle_events([])
+
+def make_pair(latency=0.05, lockstep=False, input_delay=Game.INPUT_DELAY, seed=0):
+    """Returns a connected host and guest which exchanged their hellos"""
+
+    capabilities = Protocol.CAPABILITIES
+    if lockstep:
+        capabilities |= Protocol.LOCKSTEP
+    rng = random.Random(seed)
+    host = Peer(True, latency, capabilities, input_delay, rng.getrandbits(64))
+    guest = Peer(False, latency, capabilities, input_delay, rng.getrandbits(64))
+    host.other, guest.other = guest, host
+    host.game.rng.seed(seed)
+    for peer in (host, guest):
+        peer.manager.socket_handler.send(Protocol.encode_hello(capabilities, peer.manager.seed, input_delay))
+    for peer in (host, guest):
+        peer.other.manager.socket_handler.deliver(latency)
+        peer.manager.process_inbox()
+    return host, guest
+
+def run(host, guest, starts=(1, 1.05), duration=None, seed=0, stall=0.02, dt=1/60, on_frame=None):
+    """Plays a match with random keys and frame stalls until both devices
+    left the game, or until duration seconds passed
+    """
+
+    rng = random.Random(seed)
+    now = 0
+    while host.manager.stage in (Stage.COUNTDOWN, Stage.IN_GAME) or guest.manager.stage in (Stage.COUNTDOWN, Stage.IN_GAME):
+        now += dt
+        if rng.random() < stall:
+            now += 0.5
+        for peer, start in zip((host, guest), starts):
+            if peer.manager.stage in (Stage.COUNTDOWN, Stage.IN_GAME):
+                peer.step(now, start, rng)
+        if on_frame is not None:
+            on_frame(now)
+        if duration is not None and now >= duration:
+            break
+    return now
+
+def get_state(game):
+    """Returns the parts of a game's state both devices must agree on"""
+
+    return (
+        game.turn, game.board_hash, game.get_hash(), game.ledger.scores.tolist(),
+        [(p.x, p.y, p.nx, p.ny, p.dir, p.dashscore, p.reinforced) for p in game.players]
+    )
@@ -0,0 +1,38 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import numpy as np
+import pytest
+
+from batch_simulation import BatchSimulation
+from simulation import Simulation
+
+@pytest.mark.parametrize("width, height", [(15, 15), (8, 6)])
+def test_batch_follows_simulation(width, height):
+    """Each match of a batch evolves like the Simulation with its seed,
+    given the same random inputs
+    """
+
+    seeds = list(range(40))
+    rng = np.random.default_rng(width)
+    sims = [Simulation(seed=seed, width=width, height=height) for seed in seeds]
+    for sim in sims:
+        sim.reset()
+    batch = BatchSimulation(seeds, width, height)
+
+    for turn in range(300):
+        actions = np.stack([rng.integers(0, 4, [len(seeds), 2]), rng.random([len(seeds), 2]) < 0.2], axis=-1)
+        batch.step(actions)
+        for k, sim in enumerate(sims):
+            for player, (dir_, dash) in zip(sim.players, actions[k].tolist()):
+                sim.set_input(player, dir_, bool(dash))
+            sim.end_turn()
+            sim.start_turn()
+
+            where = f"seed {seeds[k]}, turn {turn}"
+            assert np.array_equal(sim.trails.window(0, 0, width, height), batch.trails[k]), where
+            assert np.array_equal(sim.bonuses.window(0, 0, width, height), batch.bonuses[k]), where
+            players = [(p.x, p.y, p.nx, p.ny, p.dir, p.dashscore, p.reinforced) for p in sim.players]
+            assert players == list(zip(*(getattr(batch, name)[k].tolist() for name in ("x", "y", "nx", "ny", "dir", "dashscore", "reinforced")))), where
+            assert np.array_equal(sim.ledger.scores, batch.scores[k]), where
+            assert (sim.collide_start, *sim.collide_pos) == (batch.collide_start[k], *batch.collide_pos[k].tolist()), where
@@ -0,0 +1,51 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import pytest
+
+from frame_buffer import FrameBuffer
+
+def receive(buffer, data, chunk):
+    """Feeds a stream to a buffer chunk by chunk, each filling at most the
+    free space as recv_into would, and returns the frames it handed out
+    """
+
+    frames = []
+    for i in range(0, len(data), chunk):
+        part = data[i:i+chunk]
+        while len(part) != 0:
+            view = buffer.get_buffer()
+            n = min(len(part), len(view))
+            view[:n] = part[:n]
+            buffer.advance(n)
+            part = part[n:]
+            frames += [bytes(frame) for frame in buffer.frames()]
+    return frames
+
+@pytest.mark.parametrize("chunk", [1, 3, 7, 1000])
+def test_frames_survive_any_split(chunk):
+    msgs = [b"", b"a", b"hello", bytes(range(256))*3]
+    stream = b"".join(FrameBuffer.pack(msg) for msg in msgs)
+    assert receive(FrameBuffer(capacity=16), stream, chunk) == msgs
+
+def test_buffer_grows_for_large_frames():
+    buffer = FrameBuffer(capacity=8)
+    msg = bytes(range(256))*100
+    assert receive(buffer, FrameBuffer.pack(msg), 4096) == [msg]
+    assert len(buffer.buffer) >= len(msg)
+
+def test_partial_frame_is_kept():
+    buffer = FrameBuffer()
+    frame = FrameBuffer.pack(b"abcdef")
+    assert receive(buffer, frame[:-1], 100) == []
+    assert receive(buffer, frame[-1:], 100) == [b"abcdef"]
+    assert buffer.start == buffer.end
+
+def test_oversized_length_is_rejected():
+    buffer = FrameBuffer()
+    view = buffer.get_buffer()
+    header = FrameBuffer.HEADER.pack(FrameBuffer.MAX_FRAME + 1)
+    view[:len(header)] = header
+    buffer.advance(len(header))
+    with pytest.raises(ValueError):
+        list(buffer.frames())
@@ -0,0 +1,80 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import pytest
+
+from peers import get_state, make_pair, run
+from protocol import Protocol
+from simulation import Simulation
+
+def test_keyframes_during_a_backlog_load_at_their_turn(monkeypatch):
+    """The host starts a second earlier, so its answers and keyframes reach
+    the guest before it played the turns they follow
+    """
+
+    host, guest = make_pair(latency=0, seed=3)
+    host.game.KEYFRAME_INTERVAL = 5
+    sent, loaded, backlogs = [], [], []
+
+    get_keyframes = Simulation.get_keyframes
+    def record_sent(game, full=False):
+        sent.append(game.turn)
+        return get_keyframes(game, full)
+    monkeypatch.setattr(host.game, "get_keyframes", record_sent.__get__(host.game))
+
+    load_keyframe = Simulation.load_keyframe
+    def record_loaded(game, data):
+        if game is guest.game:
+            loaded.append(game.turn)
+        return load_keyframe(game, data)
+    monkeypatch.setattr(Simulation, "load_keyframe", record_loaded)
+
+    def on_frame(now):
+        game = guest.game
+        backlogs.append(len(game.host_messages))
+        if 20 <= now < 20 + 1/60 and not game.resyncing:
+            # A full resync requested while answers wait for the guest
+            game.resyncing = True
+            guest.manager.socket_handler.send(bytes([Protocol.RESYNC]))
+
+    run(host, guest, starts=(1, 2), stall=0, on_frame=on_frame)
+
+    assert max(backlogs) >= 4
+    assert len(sent) > 20
+    # Each keyframe is loaded where the host took it, whatever the number of chunks
+    assert sorted(set(loaded)) == sorted(set(sent))
+    assert loaded == sorted(loaded)
+    assert host.quits == guest.quits == 0
+    assert get_state(host.game) == get_state(guest.game)
+
+def test_late_lockstep_match_ends_on_the_last_turn():
+    """With a 0.2 second latency and one turn of input delay, lockstep
+    waits for inputs and ends well after DURATION
+    """
+
+    host, guest = make_pair(latency=0.2, lockstep=True, input_delay=1, seed=4)
+    end = run(host, guest, seed=4)
+
+    assert end > 1.05 + host.game.DURATION + 10
+    for peer in (host, guest):
+        assert peer.game.turn == peer.game.scheduler.turns
+    assert host.quits == guest.quits == 0
+    assert get_state(host.game) == get_state(guest.game)
+
+@pytest.mark.parametrize("lockstep", [False, True])
+def test_loopback_match_ends_in_agreement(lockstep):
+    """Both devices play a whole match of random keys over an in-memory
+    link with latency and frame stalls, and end with the same board and scores
+    """
+
+    host, guest = make_pair(latency=0.08, lockstep=lockstep, input_delay=2, seed=5)
+    # Bounded, so that a stalled match fails instead of running forever
+    run(host, guest, seed=5, stall=0.05, duration=host.game.DURATION + 60)
+
+    for peer in (host, guest):
+        assert peer.game.scheduler.committed == peer.game.scheduler.turns
+        assert len(peer.game.predictions) == 0
+    assert host.quits == guest.quits == 0
+    assert host.game.board_hash == guest.game.board_hash
+    assert host.game.ledger.scores.tolist() == guest.game.ledger.scores.tolist()
+    assert get_state(host.game) == get_state(guest.game)
@@ -0,0 +1,71 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import numpy as np
+
+from peers import get_state, make_pair
+from prediction import Prediction
+from protocol import Protocol
+
+def make_prediction():
+    prediction = Prediction(None, Protocol.NO_INPUT)
+    prediction.starts = [(1, 1), (5, 5)]
+    prediction.players = [(2, 1, 0, 0), (5, 6, 1, 2)]
+    prediction.state_hash = 1234
+    prediction.score_changes = np.zeros([2, 2], dtype="int64")
+    prediction.collision = None
+    return prediction
+
+def make_answer(**changes):
+    info = {"players": [(2, 1, 0, 0), (5, 6, 1, 2)], "state_hash": 1234}
+    info.update(changes)
+    return info
+
+def test_same_answer_matches():
+    assert make_prediction().matches(make_answer())
+
+def test_answer_without_hash_never_matches():
+    info = make_answer()
+    del info["state_hash"]
+    assert not make_prediction().matches(info)
+
+def test_players_are_compared_despite_equal_hashes():
+    # The hash only keeps 16 bits, a collision must not hide another move
+    assert not make_prediction().matches(make_answer(players=[(2, 1, 0, 0), (5, 4, 3, 2)]))
+    assert not make_prediction().matches(make_answer(players=[(2, 1, 0, 0), (5, 6, 1, 0)]))
+
+def test_scores_and_collisions_are_compared():
+    prediction = make_prediction()
+    scores = np.zeros([2, 2], dtype="int64")
+    scores[0, 1] = 3
+    assert not prediction.matches(make_answer(score_changes=scores))
+    assert not prediction.matches(make_answer(col_start=1.0, col_x=2, col_y=1))
+    prediction.collision = (2, 1)
+    assert prediction.matches(make_answer(col_start=1.0, col_x=2, col_y=1))
+    assert not prediction.matches(make_answer())
+
+def test_wrong_prediction_is_rolled_back(monkeypatch):
+    host, guest = make_pair(latency=0.2)
+    rollbacks = []
+    restore = guest.game.restore
+    monkeypatch.setattr(guest.game, "restore", lambda snapshot: rollbacks.append(snapshot) or restore(snapshot))
+
+    host_states = {}
+    compared = []
+    now = 0
+    while guest.game.turn < 40:
+        now += 1/60
+        for peer in (host, guest):
+            peer.step(now, 1)
+        # States at the start of the turns, before the host's input
+        host_states.setdefault(host.game.turn, get_state(host.game))
+        if host.game.turn == 10 and len(rollbacks) == 0 and host.game.input is None:
+            # The host's player turns, the guest predicts it keeps going
+            host.game.give_input((host.game.player.dir + 1) % 4)
+        settled = len(guest.game.predictions) == 0 and len(guest.game.host_messages) == 0
+        if settled and guest.game.turn in host_states:
+            assert get_state(guest.game) == host_states[guest.game.turn]
+            compared.append(guest.game.turn)
+
+    assert len(rollbacks) != 0
+    assert max(compared) > 12
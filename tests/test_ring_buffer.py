@@ -0,0 +1,48 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import pytest
+
+from ring_buffer import RingBuffer
+
+@pytest.fixture
+def ring():
+    ring = RingBuffer(capacity=64)
+    yield ring
+    ring.close(unlink=True)
+
+def test_messages_keep_their_order_and_kind(ring):
+    assert ring.get() is None
+    assert ring.put(1, b"abc")
+    assert ring.put(2)
+    assert ring.get() == (1, b"abc")
+    assert ring.get() == (2, b"")
+    assert ring.get() is None
+
+def test_messages_wrap_around_the_end(ring):
+    header = RingBuffer.HEADER.size
+    for i in range(ring.capacity):
+        msg = bytes([i % 256])*(i % 20)
+        assert ring.put(i % 256, msg)
+        assert ring.get() == (i % 256, msg)
+    # Indices only grow, their difference is the space in use
+    assert ring.indices[0] == ring.indices[ring.tail_index] > ring.capacity
+    assert ring.indices[0] == sum(header + i % 20 for i in range(ring.capacity))
+
+def test_full_buffer_refuses_messages(ring):
+    msg = bytes(ring.capacity - 2*RingBuffer.HEADER.size)
+    assert ring.put(0, msg[:len(msg)//2])
+    assert not ring.put(1, msg)
+    assert ring.get() == (0, msg[:len(msg)//2])
+    assert ring.put(1, msg)
+    with pytest.raises(ValueError):
+        ring.put(2, bytes(ring.capacity))
+
+def test_other_process_view_shares_the_messages(ring):
+    consumer = RingBuffer(ring.name)
+    try:
+        ring.put(7, b"shared")
+        assert consumer.get() == (7, b"shared")
+        assert ring.indices[ring.tail_index] == ring.indices[0]
+    finally:
+        consumer.close()
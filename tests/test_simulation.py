@@ -0,0 +1,24 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+from simulation import Simulation
+
+def play_swap(first, second):
+    """Plays a turn where two walkers swap cells, from (x, y, direction) starts"""
+    sim = Simulation(seed=0)
+    sim.reset()
+    p1, p2 = sim.players
+    p1.reset(*first)
+    p2.reset(*second)
+    sim.end_turn(spawn=False)
+    return sim, p1, p2
+
+def test_vertical_swap_collides_on_first_destination():
+    sim, p1, p2 = play_swap((5, 5, 1), (5, 6, 3))
+    assert sim.collide_pos == [5, 6]
+    assert (p1.nx, p1.ny, p2.nx, p2.ny) == (5, 5, 5, 6)
+
+def test_horizontal_swap_collides_between_players():
+    sim, p1, p2 = play_swap((5, 5, 0), (6, 5, 2))
+    assert sim.collide_pos == [5, 5]
+    assert (p1.nx, p1.ny, p2.nx, p2.ny) == (5, 5, 6, 5)
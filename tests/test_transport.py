@@ -0,0 +1,125 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import heapq
+import itertools
+
+from transport import ArqProtocol
+
+class Loop:
+    """Event loop with a simulated clock, firing the timers in order"""
+
+    def __init__(self):
+        self.now = 0
+        self.timers = []
+        self.ids = itertools.count()
+
+    def time(self):
+        return self.now
+
+    def call_at(self, when, callback):
+        timer = Timer(callback)
+        heapq.heappush(self.timers, (when, next(self.ids), timer))
+        return timer
+
+    def call_later(self, delay, callback):
+        return self.call_at(self.now + delay, callback)
+
+    def run_until(self, end):
+        while len(self.timers) != 0 and self.timers[0][0] <= end:
+            when, _, timer = heapq.heappop(self.timers)
+            self.now = max(self.now, when)
+            if not timer.cancelled:
+                timer.callback()
+        self.now = end
+
+class Timer:
+    def __init__(self, callback):
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+class Transport:
+    """One direction of a datagram link, with a fixed latency and the
+    packets which drop decides to lose
+    """
+
+    def __init__(self, loop, latency, drop=lambda n: False):
+        self.loop = loop
+        self.latency = latency
+        self.drop = drop
+        self.receiver = None
+        self.packets = 0
+
+    def sendto(self, data, addr):
+        self.packets += 1
+        if not self.drop(self.packets):
+            self.loop.call_later(self.latency, lambda: self.receiver.datagram_received(bytes(data), addr))
+
+def make_pair(latency=0.05, drop=lambda n: False):
+    """Returns the loop, the sending protocol with its transport and the
+    messages received by the other protocol
+    """
+
+    loop = Loop()
+    received = []
+    sender = ArqProtocol(lambda msg: None, lambda: None)
+    receiver = ArqProtocol(lambda msg: received.append(bytes(msg)), lambda: None)
+    forward, backward = Transport(loop, latency, drop), Transport(loop, latency)
+    forward.receiver, backward.receiver = receiver, sender
+    for protocol, transport in ((sender, forward), (receiver, backward)):
+        protocol.transport = transport
+        protocol.loop = loop
+        protocol.peer = ("peer", 0)
+    return loop, sender, forward, received
+
+def test_messages_arrive_in_order_despite_losses():
+    loop, sender, _, received = make_pair(drop=lambda n: n % 3 == 0)
+    msgs = [bytes([i]) for i in range(100)]
+    for msg in msgs:
+        sender.send(msg)
+    loop.run_until(30)
+    assert received == msgs
+    assert len(sender._unacked) == 0
+
+def test_window_limits_unacknowledged_messages():
+    loop, sender, forward, received = make_pair()
+    for i in range(ArqProtocol.WINDOW + 10):
+        sender.send(bytes([i]))
+    assert len(sender._unacked) == ArqProtocol.WINDOW
+    assert len(sender._queue) == 10
+    assert forward.packets == ArqProtocol.WINDOW
+    loop.run_until(1)
+    assert len(received) == ArqProtocol.WINDOW + 10
+
+def test_rto_follows_the_round_trip_time():
+    loop, sender, _, _ = make_pair(latency=0.05)
+    sender.send(b"a")
+    loop.run_until(1)
+    # First sample: srtt = rtt, rttvar = rtt/2, rto = srtt + 4*rttvar
+    assert sender._srtt == 0.1
+    assert abs(sender._rto - 0.3) < 1e-9
+
+    sender.update_rto(0.1)
+    assert sender._srtt == 0.1
+    assert abs(sender._rttvar - 0.0375) < 1e-9
+    sender.update_rto(100)
+    assert sender._rto == ArqProtocol.MAX_RTO
+    for _ in range(100):
+        sender.update_rto(0)
+    assert sender._rto == ArqProtocol.MIN_RTO
+
+def test_timeout_backs_off_and_skips_retransmitted_samples():
+    lost = {1, 2}
+    loop, sender, forward, received = make_pair(latency=0.05, drop=lambda n: n in lost)
+    sender.send(b"a")
+    loop.run_until(ArqProtocol.INITIAL_RTO + 0.01)
+    assert forward.packets == 2
+    assert sender._rto == 2*ArqProtocol.INITIAL_RTO
+    loop.run_until(10)
+    assert received == [b"a"]
+    # Only retransmissions were acknowledged (Karn's algorithm)
+    assert sender._srtt is None
+    assert sender._rto == 4*ArqProtocol.INITIAL_RTO
@@ -0,0 +1,49 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+from turn_scheduler import TurnScheduler
+
+def commit_due(scheduler, now):
+    due = scheduler.get_due(now)
+    for _ in range(due):
+        scheduler.commit()
+    return due
+
+def test_turns_are_due_at_fixed_times():
+    scheduler = TurnScheduler(0.25, 10)
+    scheduler.start(2)
+    assert scheduler.get_due(2.24) == 0
+    assert commit_due(scheduler, 2.25) == 1
+    assert scheduler.get_turn_start() == 2.25
+    assert commit_due(scheduler, 2.3) == 0
+
+def test_late_frames_do_not_push_back_the_schedule():
+    scheduler = TurnScheduler(0.25, 100)
+    scheduler.start(0)
+    # A frame 0.2 s late does not delay the turns which follow
+    assert commit_due(scheduler, 0.45) == 1
+    assert commit_due(scheduler, 0.5) == 1
+    assert scheduler.get_turn_start() == 0.5
+
+def test_catch_up_is_spread_over_frames():
+    scheduler = TurnScheduler(0.25, 100)
+    scheduler.start(0)
+    assert commit_due(scheduler, 2.5) == TurnScheduler.MAX_CATCH_UP
+    assert commit_due(scheduler, 2.5) == TurnScheduler.MAX_CATCH_UP
+    assert commit_due(scheduler, 2.5) == 10 - 2*TurnScheduler.MAX_CATCH_UP
+    assert commit_due(scheduler, 2.5) == 0
+
+def test_schedule_stops_after_the_last_turn():
+    scheduler = TurnScheduler(0.25, 3)
+    scheduler.start(0)
+    while commit_due(scheduler, 100) != 0:
+        pass
+    assert scheduler.committed == 3
+
+def test_restart_resets_the_schedule():
+    scheduler = TurnScheduler(0.25, 10)
+    scheduler.start(0)
+    commit_due(scheduler, 1)
+    scheduler.start(5)
+    assert scheduler.committed == 0
+    assert scheduler.get_due(5.1) == 0
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from bot import RandomBot, GreedyBot
+from score_ledger import ScoreLedger
+from simulation import Simulation
+
+class Tournament:
+    """Plays bot-vs-bot matches on every core and aggregates their results
+    as they finish, so that memory use does not grow with the number of matches
+    """
+
+    BOTS = {"random": RandomBot, "greedy": GreedyBot}  # Bots selectable by name
+    CHUNKSIZE = 4  # Number of matches sent to a worker at once
+    PROGRESS_INTERVAL = 5  # Duration in seconds between two progress lines
+
+    def __init__(self, bots):
+        """Initializes a Tournament instance
+
+        Args:
+            bots (list[str]): names of the competing bots
+        """
+
+        self.bots = bots
+        self.matches = 0
+        self.draws = 0
+        self.stats = {
+            name: {"matches": 0, "wins": 0, "draws": 0, "coverage": 0, "scores": [0] * len(ScoreLedger.NAMES)}
+            for name in bots
+        }
+
+    def match_seed(seed, index):
+        """Derives the seed of a match. It only depends on the tournament seed
+        and the match index, so results do not depend on the number of workers
+        or on which worker plays the match
+
+        Args:
+            seed (int): tournament seed
+            index (int): match index
+
+        Returns:
+            int: match seed
+        """
+        return int(np.random.SeedSequence([seed, index]).generate_state(1, np.uint64)[0])
+
+    def play_match(args):
+        """Plays a whole match. Runs in a worker process
+
+        Args:
+            args (tuple): match index, tournament seed, bot names by seat, grid size
+
+        Returns:
+            dict: match result
+        """
+
+        index, seed, seats, size = args
+        seed = Tournament.match_seed(seed, index)
+        sim = Simulation(seed=seed, n_players=len(seats), width=size, height=size)
+        bots = [Tournament.BOTS[name] for name in seats]
+        rngs = [random.Random(seed + i + 1) for i in range(len(seats))]
+
+        sim.start_turn()
+        for _ in range(round(sim.DURATION / sim.TIMER)):
+            sim.step([
+                bot.play(sim, player, rng)
+                for bot, player, rng in zip(bots, sim.players, rngs)
+            ])
+
+        return {
+            "index": index,
+            "seed": seed,
+            "seats": seats,
+            "scores": sim.ledger.scores.T.tolist(),
+            "cells": sim.WIDTH * sim.HEIGHT
+        }
+
+    def add_result(self, result):
+        """Adds a match result to the totals
+
+        Args:
+            result (dict): match result, from play_match
+        """
+
+        totals = [scores[ScoreLedger.TOTAL] for scores in result["scores"]]
+        best = max(totals)
+        draw = totals.count(best) > 1
+        self.matches += 1
+        self.draws += draw
+
+        for name, scores, total in zip(result["seats"], result["scores"], totals):
+            stats = self.stats[name]
+            stats["matches"] += 1
+            if total == best:
+                stats["draws" if draw else "wins"] += 1
+            stats["coverage"] += scores[ScoreLedger.COVERED] / result["cells"]
+            stats["scores"] = [a+b for a, b in zip(stats["scores"], scores)]
+
+    def get_summary(self):
+        """Returns the aggregated results
+
+        Returns:
+            dict: win rate, draw rate, average coverage and average scores of each bot
+        """
+
+        summary = {"matches": self.matches, "draws": self.draws, "bots": {}}
+        for name, stats in self.stats.items():
+            n = max(stats["matches"], 1)
+            summary["bots"][name] = {
+                "matches": stats["matches"],
+                "win_rate": stats["wins"] / n,
+                "draw_rate": stats["draws"] / n,
+                "coverage": stats["coverage"] / n,
+                "scores": dict(zip(ScoreLedger.NAMES, (s / n for s in stats["scores"])))
+            }
+        return summary
+
+    def run(self, n_matches, seed, n_players, size, workers, output=None):
+        """Plays all matches on a process pool. Seats rotate between matches
+        so that every bot plays from every starting position
+
+        Args:
+            n_matches (int): number of matches
+            seed (int): tournament seed
+            n_players (int): number of players per match
+            size (int): width and height of the grid
+            workers (int): number of worker processes
+            output (file, optional): file receiving each match result as a JSON line. Defaults to None.
+
+        Returns:
+            dict: aggregated results, see get_summary
+        """
+
+        tasks = (
+            (i, seed, [self.bots[(i+s) % len(self.bots)] for s in range(n_players)], size)
+            for i in range(n_matches)
+        )
+        start = last = time.perf_counter()
+        with multiprocessing.Pool(workers) as pool:
+            for result in pool.imap_unordered(Tournament.play_match, tasks, self.CHUNKSIZE):
+                self.add_result(result)
+                if output is not None:
+                    output.write(json.dumps(result) + "\n")
+
+                now = time.perf_counter()
+                if now - last >= self.PROGRESS_INTERVAL:
+                    last = now
+                    rate = self.matches / (now - start)
+                    print(f"{self.matches}/{n_matches} matches ({rate:.1f}/s)", file=sys.stderr)
+        return self.get_summary()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plays Snaildash bot-vs-bot matches on every core")
+    parser.add_argument("--matches", type=int, default=1000, help="number of matches")
+    parser.add_argument("--bots", nargs="+", choices=Tournament.BOTS.keys(), default=["greedy", "random"], help="competing bots, seated in turn")
+    parser.add_argument("--players", type=int, default=2, help="players per match")
+    parser.add_argument("--size", type=int, default=Simulation.WIDTH, help="width and height of the grid")
+    parser.add_argument("--seed", type=int, default=0, help="tournament seed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--results", help="JSON lines file receiving each match result")
+    parser.add_argument("--output", help="JSON file receiving the summary")
+    args = parser.parse_args()
+
+    tournament = Tournament(args.bots)
+    if args.results is not None:
+        with open(args.results, "w", encoding="utf-8") as f:
+            summary = tournament.run(args.matches, args.seed, args.players, args.size, args.workers, f)
+    else:
+        summary = tournament.run(args.matches, args.seed, args.players, args.size, args.workers)
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4)
+
+    print(f"{summary['matches']} matches, {summary['draws']} draws")
+    for name, stats in summary["bots"].items():
+        scores = ", ".join(f"{field}: {value:.1f}" for field, value in stats["scores"].items())
+        print(f"{name}: {stats['win_rate']:.1%} wins, {stats['draw_rate']:.1%} draws, {stats['coverage']:.1%} coverage, {scores}")
@@ -0,0 +1,417 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import asyncio
+import collections
+import struct
+
+from frame_buffer import FrameBuffer
+
+class StreamProtocol(asyncio.BufferedProtocol):
+    """asyncio protocol exchanging length-prefixed messages over TCP (LAN).
+    Data is received straight into a FrameBuffer
+    """
+
+    def __init__(self, on_message, on_lost):
+        """Initializes a StreamProtocol instance
+
+        Args:
+            on_message (callable): called with each received message, a
+                memoryview valid until the callback returns
+            on_lost (callable): called without arguments when the connection is lost
+        """
+
+        self.on_message = on_message
+        self.on_lost = on_lost
+        self.frames = FrameBuffer()
+        self.transport = None
+        self.closed = None
+        self.lost = False
+
+    def connection_made(self, transport):
+        """Called by asyncio once the connection is established
+
+        Args:
+            transport (asyncio.Transport): the connection
+        """
+
+        self.transport = transport
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def connection_lost(self, exc):
+        """Called by asyncio when the connection is closed
+
+        Args:
+            exc (Exception): error which closed the connection, None on a normal close
+        """
+
+        self.closed.set_result(None)
+        if not self.lost:
+            self.lost = True
+            self.on_lost()
+
+    def get_buffer(self, sizehint):
+        """Called by asyncio to get the buffer receiving the next bytes
+
+        Args:
+            sizehint (int): recommended minimum size of the buffer
+
+        Returns:
+            memoryview: free part of the frame buffer
+        """
+        return self.frames.get_buffer()
+
+    def buffer_updated(self, nbytes):
+        """Called by asyncio once bytes were written in the buffer. Passes on
+        every completed frame
+
+        Args:
+            nbytes (int): number of bytes received
+        """
+
+        self.frames.advance(nbytes)
+        try:
+            for frame in self.frames.frames():
+                self.on_message(frame)
+        except ValueError:
+            # The stream lost its framing, nothing after can be trusted
+            self.abort()
+
+    def abort(self):
+        """Drops the connection right away, without flushing, and tells the
+        manager it is lost
+        """
+
+        if not self.lost:
+            self.lost = True
+            self.transport.abort()
+            self.on_lost()
+
+    def send(self, msg):
+        """Sends a message
+
+        Args:
+            msg (bytes): the message
+        """
+        self.transport.write(FrameBuffer.pack(msg))
+
+    def close(self):
+        """Closes the connection once the messages already sent are flushed"""
+        self.transport.close()
+
+class ArqProtocol(asyncio.DatagramProtocol):
+    """asyncio protocol punching a hole to the opponent through UDP, then
+    exchanging reliable, ordered messages with a sliding-window ARQ (WAN).
+    Every packet carries the next expected sequence number and a bitfield of
+    the messages received after it. Retransmissions are scheduled on the
+    event loop rather than polled
+    """
+
+    DATA = 1  # Type of a packet carrying a message
+    ACK = 2  # Type of a packet only carrying acknowledgements
+    HEADER = struct.Struct(">BIII")  # Type, sequence number, next expected sequence number, selective ack bits
+    WINDOW = 32  # Maximum number of unacknowledged messages, covered by the 32 ack bits
+    MAX_QUEUE = 1024  # Maximum number of messages waiting for room in the window
+    INITIAL_RTO = 0.2  # Retransmission timeout in seconds before the first round-trip sample
+    MIN_RTO = 0.02  # Minimum retransmission timeout in seconds
+    MAX_RTO = 1  # Maximum retransmission timeout in seconds
+    RTT_ALPHA = 1/8  # Smoothing factor of the round-trip time (RFC 6298)
+    RTT_BETA = 1/4  # Smoothing factor of the round-trip time variation (RFC 6298)
+    HANDSHAKE_INTERVAL = 0.1  # Interval in seconds between handshakes
+    ADDRESSES = ["priv", "pub"]  # Names of the opponent's candidate addresses in handshakes
+
+    def __init__(self, on_message, on_lost):
+        """Initializes an ArqProtocol instance
+
+        Args:
+            on_message (callable): called with each received message, in order
+            on_lost (callable): called without arguments when the opponent stopped acknowledging
+        """
+
+        self.on_message = on_message
+        self.on_lost = on_lost
+        self.transport = None
+        self.loop = None
+        self.addrs = None  # Candidate addresses of the opponent, while punching
+        self.peer = None  # Address of the opponent which answered
+        self.connected = None  # Future receiving the index of the address which answered
+
+        self._next_seq = 0
+        self._unacked = {}  # seq -> [message, last send time, retransmitted]
+        self._queue = collections.deque()
+        self._recv_next = 0
+        self._recv_buffer = {}
+        self._srtt = None
+        self._rttvar = 0
+        self._rto = self.INITIAL_RTO
+        self._handshake = None
+        self._handshake_timer = None
+        self._timer = None
+
+    def connection_made(self, transport):
+        """Called by asyncio once the socket is ready
+
+        Args:
+            transport (asyncio.DatagramTransport): the socket
+        """
+
+        self.transport = transport
+        self.loop = asyncio.get_running_loop()
+        self.connected = self.loop.create_future()
+
+    def connection_lost(self, exc):
+        """Called by asyncio when the socket is closed
+
+        Args:
+            exc (Exception): error which closed the socket, None on a normal close
+        """
+        self.stop_timers()
+
+    def error_received(self, exc):
+        """Called by asyncio when a send or receive fails, e.g. on an ICMP
+        port unreachable while punching. Lost packets are resent anyway
+
+        Args:
+            exc (OSError): the error
+        """
+        pass
+
+    async def punch(self, addrs):
+        """Sends handshakes to every candidate address of the opponent until
+        one of them answers
+
+        Args:
+            addrs (list[tuple[str, int]]): private and public addresses of the opponent
+
+        Returns:
+            int: index of the address which answered
+        """
+
+        self.addrs = addrs
+        while not self.connected.done():
+            for name, addr in zip(self.ADDRESSES, addrs):
+                self.transport.sendto(f"handshake-{name}|0".encode("utf-8"), addr)
+            try:
+                await asyncio.wait_for(asyncio.shield(self.connected), self.HANDSHAKE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+        i = self.connected.result()
+        self.peer = addrs[i]
+        # Repeated until the opponent's first packet shows it got it
+        self._handshake = f"handshake-{self.ADDRESSES[i]}|1".encode("utf-8")
+        self.repeat_handshake()
+        return i
+
+    def on_handshake(self, data):
+        """Answers the opponent's handshakes and notices its answers
+
+        Args:
+            data (bytes): handshake packet
+        """
+
+        if self.addrs is None:
+            return
+        for i, name in enumerate(self.ADDRESSES):
+            if data == f"handshake-{name}|1".encode("utf-8"):
+                if not self.connected.done():
+                    self.connected.set_result(i)
+            elif data == f"handshake-{name}|0".encode("utf-8"):
+                self.transport.sendto(f"handshake-{name}|1".encode("utf-8"), self.addrs[i])
+
+    def repeat_handshake(self):
+        """Sends the handshake answer every HANDSHAKE_INTERVAL seconds until
+        the opponent's first packet arrives
+        """
+
+        self._handshake_timer = None
+        if self._handshake is not None:
+            self.transport.sendto(self._handshake, self.peer)
+            self._handshake_timer = self.loop.call_later(self.HANDSHAKE_INTERVAL, self.repeat_handshake)
+
+    def stop_timers(self):
+        """Cancels the scheduled handshakes and retransmissions"""
+
+        for timer in (self._handshake_timer, self._timer):
+            if timer is not None:
+                timer.cancel()
+        self._handshake = self._handshake_timer = self._timer = None
+
+    def close(self):
+        """Closes the socket"""
+
+        self.stop_timers()
+        self.transport.close()
+
+    def datagram_received(self, data, addr):
+        """Called by asyncio with each received packet
+
+        Args:
+            data (bytes): the packet
+            addr (tuple[str, int]): address of the sender
+        """
+
+        if data.startswith(b"handshake"):
+            self.on_handshake(data)
+            return
+        if self.peer is None or len(data) < self.HEADER.size:
+            return
+
+        if self._handshake is not None:
+            self._handshake = None
+            self._handshake_timer.cancel()
+            self._handshake_timer = None
+
+        type_, seq, ack, bits = self.HEADER.unpack_from(data)
+        self.on_ack(ack, bits)
+        if type_ == self.DATA:
+            for msg in self.on_data(seq, memoryview(data)[self.HEADER.size:]):
+                self.on_message(msg)
+
+    def send(self, msg):
+        """Queues a message, sent as soon as the window has room
+
+        Args:
+            msg (bytes): the message
+        """
+
+        if len(self._queue) >= self.MAX_QUEUE:
+            # The opponent stopped acknowledging long ago
+            self.on_lost()
+            return
+        self._queue.append(msg)
+        self.fill_window(self.loop.time())
+
+    def send_packet(self, type_, seq=0, msg=b""):
+        """Sends a packet carrying the current acknowledgements
+
+        Args:
+            type_ (int): DATA or ACK
+            seq (int, optional): sequence number of the message. Defaults to 0.
+            msg (bytes, optional): the message. Defaults to b"".
+        """
+
+        bits = 0
+        for s in self._recv_buffer:
+            bits |= 1 << (s - self._recv_next - 1)
+        self.transport.sendto(self.HEADER.pack(type_, seq, self._recv_next, bits) + msg, self.peer)
+
+    def transmit(self, seq, now, retransmit=False):
+        """Sends an unacknowledged message
+
+        Args:
+            seq (int): sequence number of the message
+            now (float): current time
+            retransmit (bool, optional): whether the message was already sent. Defaults to False.
+        """
+
+        entry = self._unacked[seq]
+        entry[1] = now
+        entry[2] |= retransmit
+        self.send_packet(self.DATA, seq, entry[0])
+
+    def fill_window(self, now):
+        """Sends queued messages while the window has room
+
+        Args:
+            now (float): current time
+        """
+
+        while len(self._queue) != 0 and len(self._unacked) < self.WINDOW:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._unacked[seq] = [self._queue.popleft(), now, False]
+            self.transmit(seq, now)
+        self.arm_timer()
+
+    def arm_timer(self):
+        """Schedules on_timeout when the oldest unacknowledged message expires"""
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if len(self._unacked) != 0:
+            sent = min(entry[1] for entry in self._unacked.values())
+            self._timer = self.loop.call_at(sent + self._rto, self.on_timeout)
+
+    def on_timeout(self):
+        """Resends the messages unacknowledged for longer than the
+        retransmission timeout, and backs the timeout off
+        """
+
+        self._timer = None
+        now = self.loop.time()
+        # Same sum as arm_timer, so that rounding cannot leave the timer due with nothing expired
+        expired = [seq for seq, (msg, sent, _) in self._unacked.items() if sent + self._rto <= now]
+        for seq in expired:
+            self.transmit(seq, now, True)
+        if len(expired) != 0:
+            self._rto = min(self.MAX_RTO, self._rto*2)
+        self.arm_timer()
+
+    def update_rto(self, rtt):
+        """Updates the retransmission timeout with a round-trip sample (RFC 6298)
+
+        Args:
+            rtt (float): round-trip time in seconds
+        """
+
+        if self._srtt is None:
+            self._srtt = rtt
+            self._rttvar = rtt/2
+        else:
+            self._rttvar += self.RTT_BETA * (abs(self._srtt - rtt) - self._rttvar)
+            self._srtt += self.RTT_ALPHA * (rtt - self._srtt)
+        self._rto = max(self.MIN_RTO, min(self.MAX_RTO, self._srtt + 4*self._rttvar))
+
+    def on_ack(self, ack, bits):
+        """Drops acknowledged messages, resends the ones the opponent is
+        known to have missed and refills the window
+
+        Args:
+            ack (int): sequence number of the next message the opponent expects
+            bits (int): bit i is set if the opponent received message ack+1+i
+        """
+
+        now = self.loop.time()
+        rtt = None
+        for seq in list(self._unacked):
+            if seq < ack or (seq > ack and bits >> (seq-ack-1) & 1):
+                msg, sent, retransmitted = self._unacked.pop(seq)
+                # Karn's algorithm: retransmitted messages give ambiguous samples
+                if not retransmitted:
+                    rtt = now - sent
+        if rtt is not None:
+            self.update_rto(rtt)
+
+        # Messages after a hole arrived: the hole was lost, resend it
+        # without waiting for the timeout, at most once per round-trip
+        last = ack + bits.bit_length()
+        srtt = self._rto if self._srtt is None else self._srtt
+        for seq, (msg, sent, retransmitted) in self._unacked.items():
+            if seq >= last:
+                break
+            if now - sent >= srtt:
+                self.transmit(seq, now, True)
+
+        self.fill_window(now)
+
+    def on_data(self, seq, msg):
+        """Stores a received message and acknowledges it
+
+        Args:
+            seq (int): sequence number of the message
+            msg (memoryview): the message
+
+        Returns:
+            list[memoryview]: messages now deliverable in order
+        """
+
+        if self._recv_next <= seq < self._recv_next + self.WINDOW:
+            self._recv_buffer[seq] = msg
+        msgs = []
+        while self._recv_next in self._recv_buffer:
+            msgs.append(self._recv_buffer.pop(self._recv_next))
+            self._recv_next += 1
+        self.send_packet(self.ACK)
+        return msgs
@@ -0,0 +1,61 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import math
+
+class TurnScheduler:
+    """Fixed-tick schedule of the turns. Turn n is due period*(n+1) seconds
+    after the start, whenever the previous ones were committed, so a late
+    frame does not push back the following turns and the clock does not
+    drift. Frames which missed several turns catch up a few at a time
+    """
+
+    MAX_CATCH_UP = 4  # Maximum number of turns committed in a single frame
+
+    def __init__(self, period, turns):
+        """Initializes a TurnScheduler instance
+
+        Args:
+            period (float): duration of a turn in seconds
+            turns (int): number of turns in a game
+        """
+
+        self.period = period
+        self.turns = turns
+        self.origin = 0
+        self.committed = 0
+
+    def start(self, now):
+        """Starts the schedule
+
+        Args:
+            now (float): time of the start of the first turn, in seconds
+        """
+
+        self.origin = now
+        self.committed = 0
+
+    def get_turn_start(self):
+        """Returns the scheduled start of the current turn
+
+        Returns:
+            float: time in seconds
+        """
+        return self.origin + self.committed*self.period
+
+    def get_due(self, now):
+        """Returns the number of turns to commit in this frame
+
+        Args:
+            now (float): current time in seconds
+
+        Returns:
+            int: number of turns whose end is past, at most MAX_CATCH_UP
+        """
+
+        ended = min(math.floor((now-self.origin) / self.period), self.turns)
+        return max(0, min(ended - self.committed, self.MAX_CATCH_UP))
+
+    def commit(self):
+        """Marks the current turn as committed"""
+        self.committed += 1
@@ -0,0 +1,97 @@
+#Snaildash is a small game created in the scope of a school project
+#Copyright (C) 2022  Louis HEREDERO & Mathéo BENEY
+
+import numpy as np
+
+class Zobrist:
+    """Static class computing the keys of the incremental state hash. The hash
+    of a state is the XOR of the keys of its non-empty cells and of its players,
+    so a change only costs the keys of the cells it touches. Keys are derived
+    from their position and value with the SplitMix64 finalizer, which avoids
+    storing a table for every cell of very large grids
+    """
+
+    TRAILS = 1  # Layer of drool cells
+    BONUSES = 2  # Layer of bonus cells
+    PLAYERS = 3  # Layer of player states
+
+    def mix(z):
+        """Scrambles 64-bit integers (SplitMix64 finalizer)
+
+        Args:
+            z (np.ndarray): uint64 values
+
+        Returns:
+            np.ndarray: scrambled uint64 values
+        """
+
+        z = z + np.uint64(0x9E3779B97F4A7C15)
+        z ^= z >> np.uint64(30)
+        z *= np.uint64(0xBF58476D1CE4E5B9)
+        z ^= z >> np.uint64(27)
+        z *= np.uint64(0x94D049BB133111EB)
+        z ^= z >> np.uint64(31)
+        return z
+
+    def cell_keys(layer, cells, values):
+        """Returns the keys of cells holding the given values
+
+        Args:
+            layer (int): TRAILS or BONUSES
+            cells (np.ndarray): flat indices (y*width + x) of the cells
+            values (np.ndarray): cell values (-1: empty)
+
+        Returns:
+            np.ndarray: uint64 keys, 0 for empty cells
+        """
+
+        values = np.atleast_1d(values).astype(np.int64)
+        z = np.atleast_1d(cells).astype(np.uint64) << np.uint64(8)
+        z |= (values & 0xff).view(np.uint64)
+        z |= np.uint64(layer << 56)
+        keys = Zobrist.mix(z)
+        keys[values == -1] = 0
+        return keys
+
+    def cells_hash(layer, cells, values):
+        """Returns the XOR of the keys of several cells
+
+        Args:
+            layer (int): TRAILS or BONUSES
+            cells (np.ndarray): flat indices (y*width + x) of the cells
+            values (np.ndarray): cell values (-1: empty)
+
+        Returns:
+            int: combined key
+        """
+        return int(np.bitwise_xor.reduce(Zobrist.cell_keys(layer, cells, values), axis=None))
+
+    def players_hash(players):
+        """Returns the XOR of the keys of the players' synchronized state
+        (next position, direction and dash score)
+
+        Args:
+            players (list[Player]): players
+
+        Returns:
+            int: combined key
+        """
+
+        z = np.array([
+            (((p.i << 16 | p.nx) << 16 | p.ny) << 4 | p.dir) << 4 | p.dashscore
+            for p in players
+        ], dtype=np.uint64)
+        z ^= np.uint64(Zobrist.PLAYERS << 56)
+        return int(np.bitwise_xor.reduce(Zobrist.mix(z)))
+
+    def drool_variants(keys):
+        """Picks the texture variant of drool cells from their keys, so that
+        every device draws the same variant
+
+        Args:
+            keys (np.ndarray): keys of the drool cells, from cell_keys
+
+        Returns:
+            np.ndarray: variants between 0 and 15, -1 for empty cells
+        """
+        return np.where(keys == 0, -1, keys >> np.uint64(60)).astype(np.int8)